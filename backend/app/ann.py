@@ -0,0 +1,81 @@
+from typing import Optional, Tuple
+import numpy as np
+
+from .embedding_store import dot_rows
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest scores, best first"""
+    if k >= len(scores):
+        return np.argsort(-scores, kind="stable")
+    part = np.argpartition(-scores, k - 1)[:k]
+    return part[np.argsort(-scores[part], kind="stable")]
+
+def exact_search(vectors: np.ndarray, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Brute-force cosine search over normalized vectors"""
+    scores = dot_rows(vectors, query)
+    top = _top_k(scores, k)
+    return top, scores[top]
+
+class IVFIndex:
+    """
+    Inverted-file (IVF) approximate nearest-neighbour index over L2-normalized
+    vectors, built with spherical k-means in pure NumPy.
+    Search probes the `nprobe` closest centroids and scores only their lists.
+    int8 matrices are indexed as-is, with their per-row `scales`.
+    """
+
+    def __init__(self, vectors: np.ndarray, ids: Optional[np.ndarray] = None, n_lists: Optional[int] = None,
+                 n_iter: int = 10, sample_size: int = 50000, seed: int = 0, scales: Optional[np.ndarray] = None):
+        self.vectors = vectors
+        self.scales = scales
+        self.ids = np.arange(len(vectors)) if ids is None else np.asarray(ids, dtype=np.int64)
+        n = len(self.ids)
+        self.n_lists = max(1, min(n, n_lists or int(np.sqrt(n))))
+
+        rng = np.random.default_rng(seed)
+        sample = self.ids if n <= sample_size else rng.choice(self.ids, sample_size, replace=False)
+        sample = np.sort(sample)
+        sample_vectors = np.asarray(vectors[sample], dtype=np.float32)
+        if scales is not None:
+            sample_vectors *= scales[sample, None]
+        self.centroids = self._kmeans(sample_vectors, n_iter, rng)
+
+        # Assign every vector to its closest centroid and lay the lists out contiguously
+        assignments = np.empty(n, dtype=np.int64)
+        chunk = 65536
+        for start in range(0, n, chunk):
+            block = np.asarray(vectors[self.ids[start:start + chunk]], dtype=np.float32)
+            assignments[start:start + chunk] = np.argmax(block @ self.centroids.T, axis=1)
+        order = np.argsort(assignments, kind="stable")
+        self.list_ids = self.ids[order]
+        self.offsets = np.concatenate(([0], np.cumsum(np.bincount(assignments, minlength=self.n_lists))))
+
+    def _kmeans(self, sample: np.ndarray, n_iter: int, rng) -> np.ndarray:
+        centroids = sample[rng.choice(len(sample), self.n_lists, replace=False)].copy()
+        for _ in range(n_iter):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            counts = np.bincount(labels, minlength=self.n_lists)
+            empty = counts == 0
+            if empty.any():
+                # Re-seed empty lists with random sample points
+                sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids = sums / norms
+        return centroids.astype(np.float32)
+
+    def search(self, query: np.ndarray, k: int, nprobe: int = 8) -> Tuple[np.ndarray, np.ndarray]:
+        """Approximate top-k ids (rows of the indexed matrix) and their cosine similarity"""
+        query = np.asarray(query, dtype=np.float32)
+        probes = _top_k(self.centroids @ query, min(nprobe, self.n_lists))
+        candidates = np.concatenate([self.list_ids[self.offsets[c]:self.offsets[c + 1]] for c in probes])
+        if not len(candidates):
+            return candidates, np.empty(0, dtype=np.float32)
+        # Sorted gathers read memory-mapped matrices sequentially
+        candidates.sort()
+        scores = dot_rows(self.vectors[candidates], query,
+                          scales=self.scales[candidates] if self.scales is not None else None)
+        top = _top_k(scores, k)
+        return candidates[top], scores[top]
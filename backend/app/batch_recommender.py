@@ -0,0 +1,324 @@
+import asyncio
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import AsyncIterator, List, Optional, Tuple
+import numpy as np
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError
+
+from .config import settings
+from .database import db
+from .catalog import get_catalog
+from .embedding_store import embedding_store
+from .recommendation_cache import REVIEW_REASON
+from .scoring import (
+    ScoringEngine, DIFFICULTY_LEVELS, PARTIAL_SCORE, REASON_OPTIMAL, REASON_FOUNDATION, REASON_LEVEL_MATCH,
+    REASON_NEXT_LEVEL, REASON_RELATED, REASON_SAME_COURSE, REASON_CONTINUE
+)
+
+CHECKPOINT_ID = "batch_recommender"
+
+# (user_id, initial_level, {topic: score}, {video_id: progress doc})
+UserInput = Tuple[str, str, dict, dict]
+
+# ---------- Scoring (runs in worker processes) ----------
+
+_worker_engine: Optional[ScoringEngine] = None
+_worker_embeddings: Optional[np.ndarray] = None
+
+def _init_worker(videos: List[dict]):
+    """Build the catalog engine once per worker, from the shared embedding store when published"""
+    global _worker_engine, _worker_embeddings
+    embedding_store.refresh(force=True)
+    _worker_engine = ScoringEngine(videos, store=embedding_store, ann=False)
+    _worker_embeddings = catalog_embeddings(_worker_engine)
+
+def _score_chunk(users: List[UserInput], catalog_version: int, top_n: int) -> List[dict]:
+    return score_users(_worker_engine, _worker_embeddings, users, catalog_version, top_n)
+
+def catalog_embeddings(engine: ScoringEngine) -> Optional[np.ndarray]:
+    """
+    Float32 embeddings aligned with the catalog rows (int8 scales applied,
+    zero rows for videos without one), built once so each chunk is a single
+    matrix product with no gathers
+    """
+    if engine.embeddings is None:
+        return None
+    known = engine.embedding_rows >= 0
+    matrix = np.zeros((engine.size, engine.embeddings.shape[1]), dtype=np.float32)
+    matrix[known] = engine.embeddings[engine.embedding_rows[known]]
+    if engine.embedding_scales is not None:
+        matrix[known] *= engine.embedding_scales[engine.embedding_rows[known]][:, None]
+    return matrix
+
+def score_users(engine: ScoringEngine, embeddings: Optional[np.ndarray], users: List[UserInput],
+                catalog_version: int, top_n: int) -> List[dict]:
+    """
+    ScoringEngine.score for a chunk of users at once: users x topics mastery
+    and users x videos completion masks combined with the catalog's video x
+    topic incidence and embedding matrices. Scores match the online path
+    except that similarity is exact (no ANN candidate pool on large catalogs).
+    Returns recommendation cache documents.
+    """
+    n_users, n = len(users), engine.size
+    mastery = np.zeros((n_users, len(engine.topics)), dtype=np.float64)
+    has_mastery = np.zeros(n_users, dtype=bool)
+    completed = np.zeros((n_users, n), dtype=bool)
+    partial = np.zeros((n_users, n), dtype=bool)
+    last_rows = np.full(n_users, -1, dtype=np.int64)
+    for u, (_, _, user_mastery, progress) in enumerate(users):
+        has_mastery[u] = bool(user_mastery)
+        for topic, score in user_mastery.items():
+            col = engine.topic_index.get(topic)
+            if col is not None:
+                mastery[u, col] = score
+        for video_id, p in progress.items():
+            row = engine.index.get(video_id)
+            if row is None:
+                continue
+            if p.get('completed', False):
+                completed[u, row] = True
+            else:
+                partial[u, row] = True
+        if progress:
+            last = max(progress.values(), key=lambda x: x.get('timestamp', ''))
+            last_rows[u] = engine.index.get(last['video_id'], -1)
+
+    # 1. Mastery-based scoring: per-video topic sums over the incidence matrix
+    # (each video's entries are contiguous in topic_cols), adding the k-th
+    # topic of every video at step k - the same order bincount sums in.
+    # Summed video-major (videos x users) so every gather reads whole rows
+    has_topics = engine.topic_counts > 0
+    mastery_by_topic = np.ascontiguousarray(mastery.T)
+    totals = np.zeros((n, n_users), dtype=np.float64)
+    offsets = np.cumsum(engine.topic_counts) - engine.topic_counts
+    for k in range(int(engine.topic_counts.max(initial=0))):
+        rows = np.flatnonzero(engine.topic_counts > k)
+        totals[rows] += mastery_by_topic[engine.topic_cols[offsets[rows] + k]]
+    # Videos without topics have a zero total, so their average is 0 as online
+    avg_mastery = np.ascontiguousarray(totals.T) / np.maximum(engine.topic_counts, 1)
+    scored = has_mastery[:, None] & has_topics
+
+    # No mastery data - content at the user's level (difficulty names compared as integer codes)
+    names = {name: code for code, name in enumerate(dict.fromkeys(engine.difficulty.tolist()))}
+    difficulty_codes = np.array([names[name] for name in engine.difficulty.tolist()], dtype=np.int64)
+    level_codes = np.array([names.get(user[1], -1) for user in users], dtype=np.int64)
+    level_match = ~scored & (difficulty_codes[None, :] == level_codes[:, None])
+
+    # The integer terms (mastery, level match, difficulty progression) are
+    # summed exactly in int64, then float terms are added in the online order
+    points = np.where(scored, np.where(avg_mastery < 40, 30, np.where(avg_mastery <= 70, 40, 20)), 35 * level_match)
+
+    # 2. Difficulty progression: one bonus vector per distinct user level
+    user_levels = np.array([DIFFICULTY_LEVELS.get(user[1], 2) for user in users], dtype=np.int64)
+    difficulty = engine.difficulty_level
+    for user_level in np.unique(user_levels):
+        points[user_levels == user_level] += (
+            20 * (difficulty == user_level) + 15 * (difficulty == user_level + 1) + 10 * (difficulty == user_level - 1)
+        )
+    scores = points.astype(np.float64)
+
+    # 3. Semantic similarity to each user's last watched video: one matrix product per chunk
+    similarity_rows = np.full(n_users, -1, dtype=np.int64)
+    similarity = None
+    if embeddings is not None:
+        known = engine.embedding_rows >= 0
+        with_vector = np.flatnonzero((last_rows >= 0) & known[np.maximum(last_rows, 0)])
+        if len(with_vector):
+            # Rows without an embedding are zero, i.e. no similarity contribution
+            similarity = embeddings[last_rows[with_vector]] @ embeddings.T
+            scores[with_vector] += similarity.astype(np.float64) * 30
+            similarity_rows[with_vector] = np.arange(len(with_vector))
+
+    # 4. Sequential ordering
+    scores += np.where(engine.order < 10, 10 - engine.order, 0)
+
+    # 5. Course consistency
+    has_last = last_rows >= 0
+    same_course = has_last[:, None] & (engine.course_codes[None, :] == engine.course_codes[np.maximum(last_rows, 0)][:, None])
+    scores += 100 * same_course
+
+    scores[partial] = PARTIAL_SCORE
+
+    def reason_code(u: int, row: int) -> int:
+        """The first reason that applies, in ScoringEngine.score's priority order"""
+        if partial[u, row]:
+            return REASON_CONTINUE
+        if scored[u, row] and avg_mastery[u, row] <= 70:
+            return REASON_OPTIMAL if avg_mastery[u, row] >= 40 else REASON_FOUNDATION
+        if level_match[u, row]:
+            return REASON_LEVEL_MATCH
+        if difficulty[row] == user_levels[u] + 1:
+            return REASON_NEXT_LEVEL
+        if similarity_rows[u] >= 0 and similarity[similarity_rows[u], row] > 0.7:
+            return REASON_RELATED
+        if same_course[u, row]:
+            return REASON_SAME_COURSE
+        return 0
+    computed_at = datetime.now(timezone.utc).isoformat()
+    docs = []
+    for u, (user_id, initial_level, user_mastery, progress) in enumerate(users):
+        last_video = engine.videos[last_rows[u]] if last_rows[u] >= 0 else None
+        top = engine.top_k(scores[u], ~completed[u], k=top_n)
+        if top:
+            items = [
+                {"video_id": engine.ids[row],
+                 "reason": engine.reason_text(row, reason_code(u, row), initial_level, progress, last_video)}
+                for row in top
+            ]
+        else:
+            items = [{"video_id": engine.ids[0], "reason": REVIEW_REASON}]
+        docs.append({
+            "user_id": user_id,
+            "initial_level": initial_level,
+            "catalog_version": catalog_version,
+            "similarity": embeddings is not None,
+            "items": items,
+            "mastery_scores": [{"topic": topic, "score": score} for topic, score in user_mastery.items()],
+            "computed_at": computed_at
+        })
+    return docs
+
+# ---------- Batch run ----------
+
+async def _iter_user_chunks(after: Optional[str], chunk_users: int) -> AsyncIterator[List[UserInput]]:
+    """Users in id order after `after`, with their mastery and progress, `chunk_users` at a time"""
+    query = {"id": {"$gt": after}} if after is not None else {}
+    chunk: List[dict] = []
+
+    async def load(users: List[dict]) -> List[UserInput]:
+        ids = [user['id'] for user in users]
+        mastery = {user_id: {} for user_id in ids}
+        progress = {user_id: {} for user_id in ids}
+        async for m in db.mastery_scores.find({"user_id": {"$in": ids}}, {"_id": 0, "user_id": 1, "topic": 1, "score": 1}):
+            mastery[m['user_id']][m['topic']] = m['score']
+        async for p in db.user_progress.find(
+            {"user_id": {"$in": ids}},
+            {"_id": 0, "user_id": 1, "video_id": 1, "completed": 1, "watch_percentage": 1, "timestamp": 1}
+        ).sort("timestamp", -1):
+            progress[p['user_id']][p['video_id']] = p
+        return [(user['id'], user.get('initial_level', 'Medium'), mastery[user['id']], progress[user['id']])
+                for user in users]
+
+    async for user in db.users.find(query, {"_id": 0, "id": 1, "initial_level": 1}).sort("id", 1):
+        chunk.append(user)
+        if len(chunk) >= chunk_users:
+            yield await load(chunk)
+            chunk = []
+    if chunk:
+        yield await load(chunk)
+
+async def _write(docs: List[dict], started_at: str) -> int:
+    """
+    Upsert results unless the user's entry was recomputed online after this
+    run started (the filter misses, the upsert hits the unique user_id
+    index and is skipped). Returns the number of entries written.
+    """
+    operations = [ReplaceOne({"user_id": doc['user_id'], "computed_at": {"$lt": started_at}}, doc, upsert=True)
+                  for doc in docs]
+    try:
+        await db.recommendations_cache.bulk_write(operations, ordered=False)
+        return len(operations)
+    except BulkWriteError as e:
+        errors = e.details.get('writeErrors', [])
+        if any(error.get('code') != 11000 for error in errors):
+            raise
+        return len(operations) - len(errors)
+
+async def run_batch_recommendations(workers: Optional[int] = None, chunk_users: Optional[int] = None,
+                                    top_n: Optional[int] = None, restart: bool = False) -> dict:
+    """
+    Precompute recommendations for every user into db.recommendations_cache.
+    Chunks of users are scored in a process pool (workers=0 scores in a
+    thread) and written in order; after each write the last user id is
+    checkpointed in db.meta, so an interrupted run resumes from there
+    unless the catalog version changed or `restart` is set.
+    """
+    workers = settings.BATCH_RECOMMENDER_WORKERS if workers is None else workers
+    chunk_users = chunk_users or settings.BATCH_RECOMMENDER_CHUNK_USERS
+    top_n = top_n or settings.RECOMMENDATION_TOP_N
+    catalog = await get_catalog()
+    if not catalog.videos:
+        raise ValueError("The catalog is empty")
+
+    checkpoint = await db.meta.find_one({"_id": CHECKPOINT_ID})
+    if (not restart and checkpoint and checkpoint.get('status') == "running"
+            and checkpoint.get('catalog_version') == catalog.version):
+        print(f"Resuming batch run {checkpoint['run_id']} after user {checkpoint['last_user_id']} "
+              f"({checkpoint['users']} users done)")
+    else:
+        checkpoint = {
+            "_id": CHECKPOINT_ID, "run_id": datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S"),
+            "status": "running", "catalog_version": catalog.version,
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "last_user_id": None, "users": 0, "written": 0, "chunks": 0
+        }
+        await db.meta.replace_one({"_id": CHECKPOINT_ID}, checkpoint, upsert=True)
+
+    loop = asyncio.get_running_loop()
+    executor: Executor
+    if workers > 0:
+        # spawn, not fork: the parent holds Motor's threads and the event loop
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(catalog.videos,)
+        )
+    else:
+        await asyncio.to_thread(_init_worker, catalog.videos)
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="batch-recommender")
+
+    started = time.perf_counter()
+    users_this_run = 0
+    pending = deque()
+
+    async def finish():
+        nonlocal users_this_run
+        last_user_id, future = pending.popleft()
+        docs = await future
+        written = await _write(docs, checkpoint['started_at'])
+        checkpoint.update(last_user_id=last_user_id, users=checkpoint['users'] + len(docs),
+                          written=checkpoint['written'] + written, chunks=checkpoint['chunks'] + 1)
+        await db.meta.update_one({"_id": CHECKPOINT_ID}, {"$set": {
+            "last_user_id": last_user_id, "users": checkpoint['users'],
+            "written": checkpoint['written'], "chunks": checkpoint['chunks']
+        }})
+        users_this_run += len(docs)
+        if checkpoint['chunks'] % 10 == 0:
+            elapsed = time.perf_counter() - started
+            print(f"Scored {checkpoint['users']} users ({users_this_run / elapsed:.0f} users/s)", flush=True)
+
+    try:
+        async for chunk in _iter_user_chunks(checkpoint['last_user_id'], chunk_users):
+            future = loop.run_in_executor(executor, _score_chunk, chunk, catalog.version, top_n)
+            pending.append((chunk[-1][0], future))
+            # Keep every worker busy while bounding results held in memory
+            if len(pending) > max(workers, 1) * 2:
+                await finish()
+        while pending:
+            await finish()
+    finally:
+        for _, future in pending:
+            future.cancel()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    elapsed = time.perf_counter() - started
+    stats = {
+        "run_id": checkpoint['run_id'],
+        "users": checkpoint['users'],
+        "written": checkpoint['written'],
+        "skipped_newer": checkpoint['users'] - checkpoint['written'],
+        "chunks": checkpoint['chunks'],
+        "seconds": round(elapsed, 3),
+        "users_per_second": round(users_this_run / elapsed, 1) if elapsed > 0 else 0.0,
+        "catalog_version": catalog.version,
+    }
+    await db.meta.update_one({"_id": CHECKPOINT_ID}, {"$set": {
+        "status": "done", "finished_at": datetime.now(timezone.utc).isoformat()
+    }})
+    print(f"Batch recommendations done: {stats}", flush=True)
+    return stats
@@ -0,0 +1,196 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+
+from .config import settings
+from .database import db
+from .embedding_store import embedding_store
+
+CATALOG_VERSION_ID = "catalog"
+
+async def get_catalog_version() -> int:
+    doc = await db.meta.find_one({"_id": CATALOG_VERSION_ID})
+    return doc.get("version", 0) if doc else 0
+
+async def bump_catalog_version() -> int:
+    """Mark the catalog as changed; every worker reloads its cache on its next check"""
+    doc = await db.meta.find_one_and_update(
+        {"_id": CATALOG_VERSION_ID},
+        {"$inc": {"version": 1}, "$set": {"updated_at": datetime.now(timezone.utc).isoformat()}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return doc["version"]
+
+def course_key(course: dict) -> tuple:
+    return (course['id'],)
+
+def video_key(video: dict) -> tuple:
+    """(course_id, order, id): the order of paginated video lists"""
+    return (video.get('course_id') or "", video.get('order', 0), video['id'])
+
+class CatalogCache:
+    """
+    Per-process copy of the course catalog (courses, videos by id, videos by
+    course sorted by order, quizzes by id and by video, keyset pagination
+    keys, total count). Hot routes read it instead of db.courses, db.videos
+    and db.quizzes, so they see one catalog version at a time. It is reloaded when the catalog version
+    document changes, observed through a change stream when the deployment
+    supports one and by polling every CATALOG_VERSION_CHECK_SECONDS otherwise.
+    """
+
+    def __init__(self, check_interval: float):
+        self.check_interval = check_interval
+        self.version: Optional[int] = None
+        self.courses: List[dict] = []
+        self.courses_by_id: Dict[str, dict] = {}
+        self.videos: List[dict] = []
+        self.videos_by_id: Dict[str, dict] = {}
+        self.videos_by_course: Dict[str, List[dict]] = {}
+        self.quizzes_by_id: Dict[str, dict] = {}
+        self.quiz_by_video: Dict[str, dict] = {}
+        # Keyset pagination: lists sorted by their key, with the keys alongside
+        self.course_keys: List[tuple] = []
+        self.videos_by_key: List[dict] = []
+        self.video_keys: List[tuple] = []
+        self.course_video_keys: Dict[str, List[tuple]] = {}
+        self.total_videos = 0
+        self.loaded_at = 0.0
+
+        self._latest_version: Optional[int] = None
+        self._last_check = 0.0
+        self._reload_task: Optional[asyncio.Task] = None
+        self._watch_task: Optional[asyncio.Task] = None
+        self._change_stream_active = False
+        self._reload_listeners: List[Callable[[int], None]] = []
+        self.stats = {"hits": 0, "misses": 0, "reloads": 0, "version_checks": 0}
+
+    async def get(self) -> "CatalogCache":
+        """Return the cache, reloading it first if the catalog version moved"""
+        await self._check_version()
+        if self.version is not None and self.version == self._latest_version:
+            self.stats["hits"] += 1
+            return self
+        self.stats["misses"] += 1
+        await self.reload()
+        return self
+
+    async def _check_version(self):
+        if self._change_stream_active and self._latest_version is not None:
+            return
+        now = time.monotonic()
+        if self._latest_version is not None and now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+        self.stats["version_checks"] += 1
+        self._latest_version = await get_catalog_version()
+
+    async def reload(self):
+        """Reload from Mongo; concurrent callers share a single reload"""
+        if self._reload_task is None or self._reload_task.done():
+            self._reload_task = asyncio.ensure_future(self._load())
+        await asyncio.shield(self._reload_task)
+
+    async def _load(self):
+        # Read the version first so a bump during the load triggers another reload
+        version = await get_catalog_version()
+        # Ingest bookkeeping is never served
+        projection = {"_id": 0, "embedding_hash": 0, "embedding_model": 0}
+        # Vectors come from the shared embedding store when it is published
+        if embedding_store.available:
+            projection["embedding"] = 0
+        courses = await db.courses.find({}, {"_id": 0}).to_list(None)
+        videos = await db.videos.find({}, projection).sort("order", 1).to_list(None)
+        quizzes = await db.quizzes.find({}, {"_id": 0}).to_list(None)
+
+        courses.sort(key=course_key)
+        videos_by_key = sorted(videos, key=video_key)
+        videos_by_course: Dict[str, List[dict]] = {}
+        for video in videos_by_key:
+            videos_by_course.setdefault(video.get('course_id'), []).append(video)
+
+        self.courses = courses
+        self.courses_by_id = {c['id']: c for c in courses}
+        self.course_keys = [course_key(c) for c in courses]
+        self.videos = videos
+        self.videos_by_id = {v['id']: v for v in videos}
+        self.videos_by_course = videos_by_course
+        self.quizzes_by_id = {q['id']: q for q in quizzes}
+        quiz_by_video: Dict[str, dict] = {}
+        for quiz in quizzes:
+            quiz_by_video.setdefault(quiz.get('video_id'), quiz)
+        self.quiz_by_video = quiz_by_video
+        self.videos_by_key = videos_by_key
+        self.video_keys = [video_key(v) for v in videos_by_key]
+        self.course_video_keys = {
+            course_id: [video_key(v) for v in course_videos] for course_id, course_videos in videos_by_course.items()
+        }
+        self.total_videos = len(videos)
+        previous_version, self.version = self.version, version
+        if self._latest_version is None or version > self._latest_version:
+            self._latest_version = version
+        self.loaded_at = time.time()
+        self.stats["reloads"] += 1
+        print(f"Catalog cache loaded: version {version} ({len(courses)} courses, {len(videos)} videos, "
+              f"{len(quizzes)} quizzes)")
+        if previous_version is not None and previous_version != version:
+            for listener in self._reload_listeners:
+                listener(version)
+
+    def add_reload_listener(self, listener: Callable[[int], None]):
+        """Call `listener(version)` whenever a new catalog version replaces the loaded one"""
+        self._reload_listeners.append(listener)
+
+    async def watch(self):
+        """Follow the version document through a change stream (replica sets only)"""
+        pipeline = [{"$match": {"documentKey._id": CATALOG_VERSION_ID}}]
+        try:
+            async with db.meta.watch(pipeline, full_document="updateLookup") as stream:
+                self._change_stream_active = True
+                print("Catalog cache: watching catalog version via change stream")
+                async for change in stream:
+                    doc = change.get("fullDocument") or {}
+                    if "version" in doc:
+                        self._latest_version = doc["version"]
+        except PyMongoError as e:
+            print(f"Catalog cache: change stream unavailable ({e}); polling every {self.check_interval}s")
+        finally:
+            self._change_stream_active = False
+
+    def start_watching(self):
+        if self._watch_task is None or self._watch_task.done():
+            self._watch_task = asyncio.create_task(self.watch())
+
+    async def stop_watching(self):
+        if self._watch_task and not self._watch_task.done():
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+
+    def snapshot(self) -> dict:
+        """Hit/miss counters and staleness indicators"""
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_ratio": self.stats["hits"] / lookups if lookups else 0.0,
+            "version": self.version,
+            "latest_known_version": self._latest_version,
+            "versions_behind": (self._latest_version or 0) - (self.version or 0),
+            "age_seconds": round(time.time() - self.loaded_at, 1) if self.loaded_at else None,
+            "seconds_since_version_check": None if self._change_stream_active or not self._last_check
+            else round(time.monotonic() - self._last_check, 1),
+            "change_stream_active": self._change_stream_active,
+            "courses": len(self.courses),
+            "videos": self.total_videos,
+            "quizzes": len(self.quizzes_by_id),
+        }
+
+catalog_cache = CatalogCache(settings.CATALOG_VERSION_CHECK_SECONDS)
+
+async def get_catalog() -> CatalogCache:
+    return await catalog_cache.get()
@@ -13,6 +13,63 @@ class Settings:
     JWT_ALGORITHM: str = 'HS256'
     JWT_EXPIRATION_HOURS: int = 72
     FIREBASE_STORAGE_BUCKET: str = os.environ.get('FIREBASE_STORAGE_BUCKET')
+    FIREBASE_PROJECT_ID: str = os.environ.get('FIREBASE_PROJECT_ID')  # defaults to the credentials' project
+    FIREBASE_AUTH_EMULATOR_HOST: str = os.environ.get('FIREBASE_AUTH_EMULATOR_HOST')
+    TOKEN_CACHE_SIZE: int = int(os.environ.get('TOKEN_CACHE_SIZE', 10000))
+    # Minimum time between certificate refetches triggered by tokens with an unknown kid
+    TOKEN_KEY_REFETCH_INTERVAL_SECONDS: float = float(os.environ.get('TOKEN_KEY_REFETCH_INTERVAL_SECONDS', 60))
+    USER_CACHE_SIZE: int = int(os.environ.get('USER_CACHE_SIZE', 10000))
+    USER_CACHE_TTL_SECONDS: float = float(os.environ.get('USER_CACHE_TTL_SECONDS', 60))
+    SBERT_MODEL_NAME: str = os.environ.get('SBERT_MODEL_NAME', 'sentence-transformers/all-MiniLM-L6-v2')
+    EMBEDDING_BATCH_SIZE: int = int(os.environ.get('EMBEDDING_BATCH_SIZE', 256))
+    EMBEDDING_WORKERS: int = int(os.environ.get('EMBEDDING_WORKERS', 2))
+    EMBEDDING_SERVICE_WORKERS: int = int(os.environ.get('EMBEDDING_SERVICE_WORKERS', 1))  # 0 = encode in-process
+    EMBEDDING_SERVICE_MAX_BATCH: int = int(os.environ.get('EMBEDDING_SERVICE_MAX_BATCH', 64))
+    EMBEDDING_SERVICE_MAX_WAIT_MS: float = float(os.environ.get('EMBEDDING_SERVICE_MAX_WAIT_MS', 5))
+    EMBEDDING_FORMAT: str = os.environ.get('EMBEDDING_FORMAT', 'float32')  # float32, float16 or int8 (stored docs)
+    # Also hold the scoring matrix in EMBEDDING_FORMAT: less memory, but every query upcasts it (slower scoring)
+    EMBEDDING_COMPACT_MATRIX: bool = os.environ.get('EMBEDDING_COMPACT_MATRIX', 'false').lower() == 'true'
+    EMBEDDING_STORE_DIR: str = os.environ.get('EMBEDDING_STORE_DIR', str(ROOT_DIR / 'data' / 'embeddings'))
+    EMBEDDING_STORE_DTYPE: str = os.environ.get('EMBEDDING_STORE_DTYPE', 'float32')  # float32 or float16
+    SIGNED_URL_REFRESH_MARGIN_SECONDS: float = float(os.environ.get('SIGNED_URL_REFRESH_MARGIN_SECONDS', 900))
+    # Responses with signed URLs revalidate at least this often (must stay below the refresh margin)
+    SIGNED_URL_ETAG_WINDOW_SECONDS: float = float(os.environ.get('SIGNED_URL_ETAG_WINDOW_SECONDS', SIGNED_URL_REFRESH_MARGIN_SECONDS / 2))
+    CATALOG_HTTP_MAX_AGE_SECONDS: int = int(os.environ.get('CATALOG_HTTP_MAX_AGE_SECONDS', 60))
+    SIGNED_URL_CACHE_SIZE: int = int(os.environ.get('SIGNED_URL_CACHE_SIZE', 50000))
+    SIGNED_URL_WORKERS: int = int(os.environ.get('SIGNED_URL_WORKERS', 8))
+    PROGRESS_BUFFER_MAX_SIZE: int = int(os.environ.get('PROGRESS_BUFFER_MAX_SIZE', 1000))
+    PROGRESS_FLUSH_INTERVAL_SECONDS: float = float(os.environ.get('PROGRESS_FLUSH_INTERVAL_SECONDS', 5))
+    PAGE_SIZE_DEFAULT: int = int(os.environ.get('PAGE_SIZE_DEFAULT', 100))
+    PAGE_SIZE_MAX: int = int(os.environ.get('PAGE_SIZE_MAX', 1000))
+    INGEST_CHUNK_SIZE: int = int(os.environ.get('INGEST_CHUNK_SIZE', 1000))
+    JOB_WORKERS: int = int(os.environ.get('JOB_WORKERS', 4))
+    JOB_MAX_ATTEMPTS: int = int(os.environ.get('JOB_MAX_ATTEMPTS', 5))
+    JOB_RETRY_BASE_SECONDS: float = float(os.environ.get('JOB_RETRY_BASE_SECONDS', 0.5))
+    JOB_QUEUE_MAX_SIZE: int = int(os.environ.get('JOB_QUEUE_MAX_SIZE', 10000))
+    JOB_DRAIN_TIMEOUT_SECONDS: float = float(os.environ.get('JOB_DRAIN_TIMEOUT_SECONDS', 10))
+    JOBS_DURABLE: bool = os.environ.get('JOBS_DURABLE', 'false').lower() == 'true'
+    JOB_LEASE_SECONDS: float = float(os.environ.get('JOB_LEASE_SECONDS', 300))
+    RECOMMENDATION_CACHE_SIZE: int = int(os.environ.get('RECOMMENDATION_CACHE_SIZE', 10000))
+    RECOMMENDATION_CACHE_TTL_SECONDS: float = float(os.environ.get('RECOMMENDATION_CACHE_TTL_SECONDS', 30))
+    RECOMMENDATION_TOP_N: int = int(os.environ.get('RECOMMENDATION_TOP_N', 10))
+    RECOMMENDATION_REFRESH_CONCURRENCY: int = int(os.environ.get('RECOMMENDATION_REFRESH_CONCURRENCY', 4))
+    BATCH_RECOMMENDER_WORKERS: int = int(os.environ.get('BATCH_RECOMMENDER_WORKERS', 2))
+    BATCH_RECOMMENDER_CHUNK_USERS: int = int(os.environ.get('BATCH_RECOMMENDER_CHUNK_USERS', 256))
+    SEARCH_LIMIT_DEFAULT: int = int(os.environ.get('SEARCH_LIMIT_DEFAULT', 20))
+    SEARCH_LIMIT_MAX: int = int(os.environ.get('SEARCH_LIMIT_MAX', 100))
+    SEARCH_MAX_QUERY_LENGTH: int = int(os.environ.get('SEARCH_MAX_QUERY_LENGTH', 256))
+    SEARCH_CANDIDATES: int = int(os.environ.get('SEARCH_CANDIDATES', 100))  # per ranking, before fusion
+    SEARCH_RRF_K: int = int(os.environ.get('SEARCH_RRF_K', 60))
+    SEARCH_EMBEDDING_CACHE_SIZE: int = int(os.environ.get('SEARCH_EMBEDDING_CACHE_SIZE', 10000))
+    SEARCH_RESULT_CACHE_SIZE: int = int(os.environ.get('SEARCH_RESULT_CACHE_SIZE', 10000))
+    SEARCH_RESULT_CACHE_TTL_SECONDS: float = float(os.environ.get('SEARCH_RESULT_CACHE_TTL_SECONDS', 300))
+    CATALOG_VERSION_CHECK_SECONDS: float = float(os.environ.get('CATALOG_VERSION_CHECK_SECONDS', 5))
+    ANN_MIN_VECTORS: int = int(os.environ.get('ANN_MIN_VECTORS', 5000))
+    ANN_NPROBE: int = int(os.environ.get('ANN_NPROBE', 8))
+    ANN_PREFILTER_CANDIDATES: int = int(os.environ.get('ANN_PREFILTER_CANDIDATES', 500))
+    METRICS_ENABLED: bool = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+    READY_REQUIRES_MODEL: bool = os.environ.get('READY_REQUIRES_MODEL', 'false').lower() == 'true'
+    INDEX_AUDIT_ON_STARTUP: bool = os.environ.get('INDEX_AUDIT_ON_STARTUP', 'true').lower() == 'true'
 
     def __init__(self):
         # Resolve absolute path for credentials
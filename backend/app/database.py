@@ -1,13 +1,16 @@
+import asyncio
 import logging
 import os
+import time
 import firebase_admin
 from firebase_admin import credentials, storage, auth
 from motor.motor_asyncio import AsyncIOMotorClient
-from sentence_transformers import SentenceTransformer
 from .config import settings
+from .metrics import mongo_command_metrics
 
-# Initialize MongoDB
-client = AsyncIOMotorClient(settings.MONGO_URL)
+# Initialize MongoDB (commands are timed through pymongo command monitoring)
+client = AsyncIOMotorClient(settings.MONGO_URL,
+                            event_listeners=[mongo_command_metrics] if settings.METRICS_ENABLED else [])
 db = client[settings.DB_NAME]
 
 # Initialize Firebase Admin
@@ -29,23 +32,43 @@ def init_firebase():
         print(f"Error initializing Firebase Admin: {e}")
 
 # Initialize SBERT model
+# Loaded in the background after startup; until then sbert_model is None and
+# recommendations fall back to scoring without embeddings.
 sbert_model = None
+model_state = {"status": "not_loaded", "import_seconds": None, "load_seconds": None, "error": None}
+_model_task = None
 
 def load_sbert_model():
     global sbert_model
     print("Loading SBERT model...")
-    sbert_model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
-    print("SBERT model loaded successfully")
+    model_state["status"] = "loading"
+    try:
+        started = time.perf_counter()
+        # Deferred: importing sentence_transformers pulls in torch
+        from sentence_transformers import SentenceTransformer
+        imported = time.perf_counter()
+        model = SentenceTransformer(settings.SBERT_MODEL_NAME)
+        loaded = time.perf_counter()
+    except Exception as e:
+        model_state.update(status="failed", error=str(e))
+        raise
+    model_state.update(status="ready", import_seconds=imported - started, load_seconds=loaded - imported, error=None)
+    sbert_model = model
+    print(f"SBERT model loaded successfully (import {imported - started:.1f}s, load {loaded - imported:.1f}s)")
+    return model
 
-async def ensure_indexes():
-    """Create indexes to prevent duplicates"""
-    print("Ensuring database indexes...")
+async def _load_sbert_model_in_background():
     try:
-        await db.courses.create_index("id", unique=True)
-        await db.videos.create_index("id", unique=True)
-        print("Database indexes ensured successfully")
+        await asyncio.to_thread(load_sbert_model)
     except Exception as e:
-        print(f"Error creating indexes: {e}")
+        print(f"Error loading SBERT model: {e}")
+
+def start_model_loading() -> asyncio.Task:
+    """Load the SBERT model in a worker thread without blocking startup"""
+    global _model_task
+    if _model_task is None:
+        _model_task = asyncio.create_task(_load_sbert_model_in_background())
+    return _model_task
 
 # Initialize services on module import or explicit call? 
 # Better to call explicit init function in main.py startup event, 
@@ -1,33 +1,56 @@
+from typing import Optional
 from fastapi import HTTPException, Depends, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from firebase_admin import auth as firebase_auth
 from .database import db
+from .token_verifier import token_verifier
+from .cache import TTLCache, SingleFlight
+from .config import settings
 
 security = HTTPBearer()
 
+# Users by firebase_uid, so authenticated requests skip the users lookups
+user_cache = TTLCache(settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL_SECONDS)
+_user_lookups = SingleFlight()
+
+def invalidate_cached_user(firebase_uid: str):
+    """Drop a cached user (called whenever a users document is modified)"""
+    user_cache.pop(firebase_uid)
+
+async def _load_user(firebase_uid: str, email: Optional[str]) -> Optional[dict]:
+    # Look up user by firebase_uid first, then by email as fallback
+    user = await db.users.find_one({"firebase_uid": firebase_uid}, {"_id": 0})
+    
+    if not user and email:
+        # Try finding by email (for users created before firebase migration)
+        user = await db.users.find_one({"email": email}, {"_id": 0})
+        if user:
+            # Update user with firebase_uid for future lookups
+            await db.users.update_one(
+                {"email": email},
+                {"$set": {"firebase_uid": firebase_uid}}
+            )
+            user["firebase_uid"] = firebase_uid
+    
+    return user
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Verify Firebase ID token and return user from database"""
     try:
-        # Verify the Firebase ID token
-        decoded_token = firebase_auth.verify_id_token(credentials.credentials)
+        # Verify the Firebase ID token (cached, and off the event loop on a miss)
+        decoded_token = await token_verifier.verify(credentials.credentials)
         firebase_uid = decoded_token.get('uid')
         email = decoded_token.get('email')
         
         if not firebase_uid:
             raise HTTPException(status_code=401, detail="Invalid token")
         
-        # Look up user by firebase_uid first, then by email as fallback
-        user = await db.users.find_one({"firebase_uid": firebase_uid}, {"_id": 0})
-        
-        if not user and email:
-            # Try finding by email (for users created before firebase migration)
-            user = await db.users.find_one({"email": email}, {"_id": 0})
+        user = user_cache.get(firebase_uid)
+        if user is None:
+            # Concurrent requests for the same uid share a single lookup
+            user = await _user_lookups.do(firebase_uid, lambda: _load_user(firebase_uid, email))
             if user:
-                # Update user with firebase_uid for future lookups
-                await db.users.update_one(
-                    {"email": email},
-                    {"$set": {"firebase_uid": firebase_uid}}
-                )
+                user_cache.set(firebase_uid, user)
         
         if not user:
             raise HTTPException(status_code=401, detail="User not found. Please register first.")
@@ -0,0 +1,234 @@
+import asyncio
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, NamedTuple, Optional
+import numpy as np
+
+from . import database
+from .config import settings
+from .metrics import timed
+
+# Model loaded once per worker process by the pool initializer
+_worker_model = None
+
+def _init_worker(model_name: str):
+    global _worker_model
+    from sentence_transformers import SentenceTransformer
+    _worker_model = SentenceTransformer(model_name)
+
+def _worker_ready() -> bool:
+    return _worker_model is not None
+
+def _encode(model, texts: List[str]) -> np.ndarray:
+    return np.asarray(model.encode(texts, batch_size=len(texts)), dtype=np.float32)
+
+def _encode_in_worker(texts: List[str]) -> np.ndarray:
+    return _encode(_worker_model, texts)
+
+def _encode_in_process(texts: List[str]) -> np.ndarray:
+    return _encode(database.sbert_model, texts)
+
+class _Request(NamedTuple):
+    texts: List[str]
+    future: asyncio.Future
+    enqueued: float
+
+class EmbeddingService:
+    """
+    Shared SBERT inference. Encode requests from every handler are queued and
+    grouped into micro-batches of up to `max_batch` texts, waiting at most
+    `max_wait` seconds for a batch to fill. Batches run in a pool of `workers`
+    processes, each with its own copy of the model, so neither the GIL nor
+    the event loop is held while encoding. With workers=0 batches run in a
+    thread against the model loaded in this process.
+    """
+
+    def __init__(self, model_name: str, workers: int, max_batch: int, max_wait: float, window: int = 1000):
+        self.model_name = model_name
+        self.workers = workers
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.state = {"status": "not_loaded", "mode": "process" if workers > 0 else "thread",
+                      "workers": workers, "load_seconds": None, "error": None}
+        self._queue: Optional[asyncio.Queue] = None
+        self._executor: Optional[Executor] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: List[asyncio.Task] = []
+        self._batches: set = set()
+        self._queue_waits = deque(maxlen=window)
+        self._batch_sizes = deque(maxlen=window)
+        self.stats = {"requests": 0, "texts": 0, "batches": 0, "errors": 0, "encode_seconds": 0.0}
+        self._started_at: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state["status"] == "ready"
+
+    def start(self):
+        """Start the batcher and load the model in the background"""
+        if self._tasks:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._started_at = time.perf_counter()
+        self._tasks = [asyncio.create_task(self._load()), asyncio.create_task(self._run())]
+
+    async def _load(self):
+        self.state["status"] = "loading"
+        started = time.perf_counter()
+        try:
+            if self.workers > 0:
+                # spawn, not fork: the parent may already hold threads and torch state
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.model_name,)
+                )
+                loop = asyncio.get_running_loop()
+                # One call per worker so every process has loaded its model
+                await asyncio.gather(*[loop.run_in_executor(self._executor, _worker_ready) for _ in range(self.workers)])
+            else:
+                await database.start_model_loading()
+                if database.sbert_model is None:
+                    raise RuntimeError(database.model_state.get("error") or "SBERT model failed to load")
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding")
+        except Exception as e:
+            self.state.update(status="failed", error=str(e))
+            print(f"Error starting embedding service: {e}")
+            return
+        self.state.update(status="ready", load_seconds=round(time.perf_counter() - started, 3))
+        print(f"Embedding service ready ({self.state['mode']}, {self.workers} workers) "
+              f"in {self.state['load_seconds']:.1f}s")
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        """Encode texts; resolves once the micro-batch containing them has run"""
+        if not self.ready:
+            raise RuntimeError("Embedding service is not ready")
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        self.stats["requests"] += 1
+        # Requests larger than a batch are split so they cannot starve small ones
+        futures = []
+        for i in range(0, len(texts), self.max_batch):
+            future = self._loop.create_future()
+            self._queue.put_nowait(_Request(list(texts[i:i + self.max_batch]), future, time.perf_counter()))
+            futures.append(future)
+        parts = await asyncio.gather(*futures)
+        return parts[0] if len(parts) == 1 else np.vstack(parts)
+
+    def encode(self, texts, batch_size: Optional[int] = None, **kwargs):
+        """
+        Blocking, SentenceTransformer-style interface for code running in worker
+        threads (e.g. engine builds). Must not be called on the event loop thread.
+        """
+        single = isinstance(texts, str)
+        future = asyncio.run_coroutine_threadsafe(self.embed([texts] if single else list(texts)), self._loop)
+        vectors = future.result()
+        return vectors[0] if single else vectors
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(max(self.workers, 1))
+        carry = None
+        while True:
+            # Wait for a free worker before collecting, so batches grow while all workers are busy
+            await slots.acquire()
+            batch = [carry or await self._queue.get()]
+            carry = None
+            size = len(batch[0].texts)
+            deadline = loop.time() + self.max_wait
+            while size < self.max_batch:
+                if self._queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        request = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    request = self._queue.get_nowait()
+                if size + len(request.texts) > self.max_batch:
+                    # Does not fit: dispatch what we have and start the next batch with it
+                    carry = request
+                    break
+                batch.append(request)
+                size += len(request.texts)
+            task = asyncio.create_task(self._run_batch(batch, slots))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _run_batch(self, batch: List[_Request], slots: asyncio.Semaphore):
+        loop = asyncio.get_running_loop()
+        dispatched = time.perf_counter()
+        texts = [text for request in batch for text in request.texts]
+        for request in batch:
+            self._queue_waits.append(dispatched - request.enqueued)
+        self._batch_sizes.append(len(texts))
+        try:
+            encode = _encode_in_worker if self.workers > 0 else _encode_in_process
+            with timed("sbert_encode"):
+                vectors = await loop.run_in_executor(self._executor, encode, texts)
+            offset = 0
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_result(vectors[offset:offset + len(request.texts)])
+                offset += len(request.texts)
+            self.stats["batches"] += 1
+            self.stats["texts"] += len(texts)
+        except Exception as e:
+            self.stats["errors"] += 1
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+        finally:
+            self.stats["encode_seconds"] += time.perf_counter() - dispatched
+            slots.release()
+
+    def snapshot(self) -> dict:
+        waits = np.array(self._queue_waits) * 1000 if self._queue_waits else np.zeros(1)
+        uptime = time.perf_counter() - self._started_at if self._started_at else 0.0
+        return {
+            **self.state,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "in_flight_batches": len(self._batches),
+            **self.stats,
+            "mean_batch_size": float(np.mean(self._batch_sizes)) if self._batch_sizes else 0.0,
+            "texts_per_second": self.stats["texts"] / uptime if uptime else 0.0,
+            "encode_texts_per_second": self.stats["texts"] / self.stats["encode_seconds"] if self.stats["encode_seconds"] else 0.0,
+            "queue_wait_ms": {
+                "p50": float(np.percentile(waits, 50)),
+                "p95": float(np.percentile(waits, 95)),
+                "max": float(waits.max()),
+            },
+        }
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._tasks = []
+        while self._queue is not None and not self._queue.empty():
+            request = self._queue.get_nowait()
+            if not request.future.done():
+                request.future.set_exception(RuntimeError("Embedding service stopped"))
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self.state["status"] = "stopped"
+
+embedding_service = EmbeddingService(
+    settings.SBERT_MODEL_NAME,
+    workers=settings.EMBEDDING_SERVICE_WORKERS,
+    max_batch=settings.EMBEDDING_SERVICE_MAX_BATCH,
+    max_wait=settings.EMBEDDING_SERVICE_MAX_WAIT_MS / 1000
+)
@@ -0,0 +1,155 @@
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+import numpy as np
+
+from .config import settings
+
+CURRENT_FILE = "CURRENT"
+MATRIX_FILE = "embeddings.npy"
+IDS_FILE = "ids.json"
+
+def dot_rows(matrix: np.ndarray, query: np.ndarray, chunk_rows: int = 4096,
+             scales: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    matrix @ query, upcasting non-float32 (float16/int8) matrices chunk by
+    chunk to bound memory. `scales` holds per-row factors of int8 matrices.
+    The upcast dominates (float16 ~10x, int8 ~2x the float32 time) whatever
+    the chunk size, so hot paths keep float32 matrices.
+    """
+    query = np.asarray(query, dtype=np.float32)
+    if matrix.dtype == np.float32:
+        out = matrix @ query
+    else:
+        out = np.empty(len(matrix), dtype=np.float32)
+        for start in range(0, len(matrix), chunk_rows):
+            out[start:start + chunk_rows] = matrix[start:start + chunk_rows].astype(np.float32) @ query
+    if scales is not None:
+        out *= scales
+    return out
+
+def _fsync_write(path: Path, data: str):
+    with open(path, "w") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+class EmbeddingStore:
+    """
+    On-disk embedding matrix that every worker opens with mmap, so N workers
+    share one copy in the page cache.
+    Layout:
+        <root>/CURRENT                   name of the active version
+        <root>/<version>/embeddings.npy  L2-normalized float32/float16 matrix
+        <root>/<version>/ids.json        video ids, one per matrix row
+    Writers publish a new version directory and swap CURRENT with os.replace;
+    readers notice the new pointer and re-open without a restart.
+    """
+
+    def __init__(self, root, check_interval: float = 2.0, keep_versions: int = 2):
+        self.root = Path(root)
+        self.check_interval = check_interval
+        self.keep_versions = keep_versions
+        self.version: Optional[str] = None
+        self.matrix: Optional[np.ndarray] = None
+        self.ids: List[str] = []
+        self.index: Dict[str, int] = {}
+        self._last_check = 0.0
+
+    # ---------- Reader ----------
+
+    def _read_pointer(self) -> Optional[str]:
+        try:
+            return (self.root / CURRENT_FILE).read_text().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def refresh(self, force: bool = False) -> bool:
+        """Re-open the store if a new version was published. Returns True on change."""
+        now = time.monotonic()
+        if not force and now - self._last_check < self.check_interval:
+            return False
+        self._last_check = now
+
+        version = self._read_pointer()
+        if version is None or version == self.version:
+            return False
+        try:
+            directory = self.root / version
+            matrix = np.load(directory / MATRIX_FILE, mmap_mode="r")
+            with open(directory / IDS_FILE) as f:
+                ids = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error opening embedding store version {version}: {e}")
+            return False
+
+        self.matrix = matrix
+        self.ids = ids
+        self.index = {video_id: row for row, video_id in enumerate(ids)}
+        self.version = version
+        print(f"Embedding store opened: version {version} ({len(ids)} vectors, {matrix.dtype})")
+        return True
+
+    @property
+    def available(self) -> bool:
+        self.refresh()
+        return self.matrix is not None and len(self.ids) > 0
+
+    def get(self, video_id: str) -> Optional[np.ndarray]:
+        self.refresh()
+        row = self.index.get(video_id)
+        return None if row is None else self.matrix[row]
+
+    # ---------- Writer ----------
+
+    def write(self, ids: List[str], vectors: np.ndarray, dtype: Optional[str] = None) -> str:
+        """Publish a new version atomically and return its name"""
+        dtype = np.dtype(dtype or settings.EMBEDDING_STORE_DTYPE)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(ids) != len(vectors):
+            raise ValueError("ids and vectors must have the same length")
+
+        # Store normalized vectors so readers can use the matrix as-is for cosine similarity
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix = (vectors / norms).astype(dtype)
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        version = f"v{int(time.time() * 1000)}-{os.getpid()}"
+        staging = self.root / f".tmp-{version}"
+        staging.mkdir()
+        with open(staging / MATRIX_FILE, "wb") as f:
+            np.save(f, matrix)
+            f.flush()
+            os.fsync(f.fileno())
+        _fsync_write(staging / IDS_FILE, json.dumps(list(ids)))
+        os.rename(staging, self.root / version)
+
+        pointer = self.root / f".{CURRENT_FILE}-{version}"
+        _fsync_write(pointer, version)
+        os.replace(pointer, self.root / CURRENT_FILE)
+
+        self._prune(version)
+        print(f"Embedding store version {version} written ({len(ids)} vectors, {dtype})")
+        return version
+
+    def _prune(self, current: str):
+        """Remove old versions, keeping the newest few for readers still mapping them"""
+        versions = sorted(
+            (p for p in self.root.iterdir() if p.is_dir() and p.name.startswith("v")),
+            key=lambda p: p.stat().st_mtime,
+            reverse=True,
+        )
+        for path in versions[self.keep_versions:]:
+            if path.name == current:
+                continue
+            try:
+                shutil.rmtree(path)
+            except OSError:
+                # Still mapped by a reader on platforms that lock mapped files
+                pass
+
+embedding_store = EmbeddingStore(settings.EMBEDDING_STORE_DIR)
@@ -0,0 +1,202 @@
+import asyncio
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional
+import numpy as np
+from bson.binary import Binary
+from pymongo import UpdateOne
+
+from . import database
+from .database import db
+from .config import settings
+from .metrics import timed
+from .embedding_store import embedding_store
+
+def video_text(video: dict) -> str:
+    """Text used to embed a video (transcript, falling back to description)"""
+    return video.get('transcript', video['description'])
+
+def content_hash(video: dict) -> str:
+    """Hash of everything that determines a video's embedding (not its stored format)"""
+    digest = hashlib.sha256()
+    digest.update(settings.SBERT_MODEL_NAME.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(video_text(video).encode('utf-8'))
+    return digest.hexdigest()
+
+# Stored embedding formats. float32 uses the generic binary subtype, the
+# compact ones user-defined subtypes so documents identify their own layout.
+EMBEDDING_FORMATS = ("float32", "float16", "int8")
+SUBTYPE_FLOAT16 = 0x80
+SUBTYPE_INT8 = 0x81  # 4-byte little-endian float32 scale, then one int8 per dimension
+FORMAT_PRECISION = {"int8": 0, "float16": 1, "float32": 2}
+
+def stored_format(value) -> str:
+    """Format of a stored embedding ("list" for the original list of floats)"""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {SUBTYPE_FLOAT16: "float16", SUBTYPE_INT8: "int8"}.get(getattr(value, 'subtype', 0), "float32")
+    return "list"
+
+def format_change(value, fmt: Optional[str] = None) -> Optional[str]:
+    """
+    How a stored embedding reaches `fmt`: None if it is already stored that
+    way, "repack" if converting the stored vector loses nothing more than
+    the format itself, "encode" if it was stored less precisely than `fmt`.
+    """
+    fmt = fmt or settings.EMBEDDING_FORMAT
+    current = stored_format(value)
+    if current == fmt:
+        return None
+    precision = FORMAT_PRECISION.get(current, FORMAT_PRECISION["float32"])
+    return "repack" if precision >= FORMAT_PRECISION[fmt] else "encode"
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+def quantize_int8(vectors: np.ndarray):
+    """Symmetric per-vector int8 quantization. Returns (int8 matrix, float32 scales)."""
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    quantized = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+def pack_embedding(vector, fmt: Optional[str] = None) -> Binary:
+    """
+    Store a vector as BSON binary: float32 as-is, or L2-normalized float16 /
+    per-vector-scaled int8 when EMBEDDING_FORMAT opts into a compact format.
+    """
+    fmt = fmt or settings.EMBEDDING_FORMAT
+    if fmt == "float32":
+        return Binary(np.asarray(vector, dtype='<f4').tobytes())
+    vector = normalize_rows(vector)
+    if fmt == "float16":
+        return Binary(vector.astype('<f2').tobytes(), SUBTYPE_FLOAT16)
+    if fmt == "int8":
+        quantized, scales = quantize_int8(vector)
+        return Binary(scales.astype('<f4').tobytes() + quantized.tobytes(), SUBTYPE_INT8)
+    raise ValueError(f"Unknown embedding format {fmt!r}, expected one of {EMBEDDING_FORMATS}")
+
+def decode_embedding(value):
+    """
+    Decode a stored embedding without converting it: (vector, scale) where the
+    vector is float32, float16 or int8 and scale is only set for int8.
+    """
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        subtype = getattr(value, 'subtype', 0)
+        if subtype == SUBTYPE_FLOAT16:
+            return np.frombuffer(value, dtype='<f2'), None
+        if subtype == SUBTYPE_INT8:
+            return np.frombuffer(value, dtype=np.int8, offset=4), float(np.frombuffer(value, dtype='<f4', count=1)[0])
+        return np.frombuffer(value, dtype='<f4'), None
+    return np.asarray(value, dtype=np.float32), None
+
+def unpack_embedding(value) -> np.ndarray:
+    """Decode an embedding stored as BSON binary (any format) or as a list of floats, as float32"""
+    vector, scale = decode_embedding(value)
+    if scale is not None:
+        return vector.astype(np.float32) * np.float32(scale)
+    return vector.astype(np.float32, copy=False)
+
+def encode_texts(model, texts: List[str], batch_size: int, workers: int) -> np.ndarray:
+    """Encode texts in large batches spread across a worker pool"""
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+
+    def encode_batch(batch):
+        with timed("sbert_encode"):
+            return np.asarray(model.encode(batch, batch_size=batch_size), dtype=np.float32)
+
+    if workers <= 1 or len(batches) <= 1:
+        results = [encode_batch(batch) for batch in batches]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(encode_batch, batches))
+    return np.vstack(results) if results else np.empty((0, 0), dtype=np.float32)
+
+async def embed_videos(video_ids: Optional[Iterable[str]] = None, force: bool = False,
+                       batch_size: Optional[int] = None, workers: Optional[int] = None, model=None) -> dict:
+    """
+    Ingest stage: encode transcripts/descriptions and persist the vectors on the
+    video documents. Videos whose content hash is unchanged are skipped, or
+    only re-packed from their stored vector when EMBEDDING_FORMAT changed.
+    """
+    if model is None:
+        model = database.sbert_model
+    if model is None:
+        raise RuntimeError("SBERT model is not loaded")
+
+    batch_size = batch_size or settings.EMBEDDING_BATCH_SIZE
+    workers = workers or settings.EMBEDDING_WORKERS
+    # Enough rows per round to keep every worker busy with a full batch
+    chunk_size = batch_size * max(workers, 1)
+
+    query = {"id": {"$in": list(video_ids)}} if video_ids is not None else {}
+    projection = {"_id": 0, "id": 1, "transcript": 1, "description": 1, "embedding_hash": 1, "embedding": 1}
+
+    stats = {"total": 0, "encoded": 0, "repacked": 0, "skipped": 0}
+    started = time.perf_counter()
+    pending = []
+    repacks: List[UpdateOne] = []
+
+    async def flush_repacks():
+        await db.videos.bulk_write(repacks, ordered=False)
+        stats["repacked"] += len(repacks)
+        repacks.clear()
+
+    async def flush():
+        texts = [video_text(v) for v, _ in pending]
+        vectors = await asyncio.to_thread(encode_texts, model, texts, batch_size, workers)
+        await db.videos.bulk_write([
+            UpdateOne({"id": video['id']}, {"$set": {
+                "embedding": pack_embedding(vector),
+                "embedding_hash": digest,
+                "embedding_model": settings.SBERT_MODEL_NAME
+            }})
+            for (video, digest), vector in zip(pending, vectors)
+        ], ordered=False)
+        stats["encoded"] += len(pending)
+        pending.clear()
+
+    async for video in db.videos.find(query, projection):
+        stats["total"] += 1
+        digest = content_hash(video)
+        change = format_change(video['embedding']) if 'embedding' in video else "encode"
+        if not force and video.get('embedding_hash') == digest and change != "encode":
+            if change is None:
+                stats["skipped"] += 1
+            else:
+                # Same content and model: convert the stored vector instead of re-encoding
+                vector = unpack_embedding(video['embedding'])
+                repacks.append(UpdateOne({"id": video['id']}, {"$set": {"embedding": pack_embedding(vector)}}))
+                if len(repacks) >= settings.INGEST_CHUNK_SIZE:
+                    await flush_repacks()
+            continue
+        pending.append((video, digest))
+        if len(pending) >= chunk_size:
+            await flush()
+
+    if pending:
+        await flush()
+    if repacks:
+        await flush_repacks()
+
+    elapsed = time.perf_counter() - started
+    stats["seconds"] = round(elapsed, 3)
+    stats["videos_per_second"] = round(stats["encoded"] / elapsed, 1) if elapsed > 0 else 0.0
+    print(f"Embedded {stats['encoded']} videos ({stats['repacked']} re-packed, {stats['skipped']} unchanged) "
+          f"in {stats['seconds']}s - {stats['videos_per_second']} videos/s")
+    return stats
+
+async def export_embedding_store() -> Optional[str]:
+    """Publish all stored video embeddings to the shared memory-mapped store"""
+    ids, vectors = [], []
+    async for video in db.videos.find({"embedding": {"$exists": True}}, {"_id": 0, "id": 1, "embedding": 1}):
+        ids.append(video['id'])
+        vectors.append(unpack_embedding(video['embedding']))
+    if not ids:
+        return None
+    return await asyncio.to_thread(embedding_store.write, ids, np.vstack(vectors))
@@ -0,0 +1,63 @@
+import hashlib
+import time
+from typing import Optional
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import ORJSONResponse
+
+from .config import settings
+from .catalog import get_catalog
+
+def url_window(now: Optional[float] = None) -> int:
+    """
+    Index of the current signed-URL validity window. Responses carrying
+    signed URLs fold it into their ETag, so a 304 never extends a client's
+    copy past the window it was served in (shorter than the URL refresh
+    margin, so revalidated URLs are always still valid).
+    """
+    return int((now or time.time()) // settings.SIGNED_URL_ETAG_WINDOW_SECONDS)
+
+def _matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+def catalog_etag(signed_urls: bool = False):
+    """
+    Dependency for read-only catalog routes: a strong ETag derived from the
+    catalog version and the request path/query. A matching If-None-Match is
+    answered with 304 before the route runs (no Mongo reads, no serialization).
+    """
+    async def dependency(request: Request, response: Response) -> str:
+        catalog = await get_catalog()
+        parts = [str(catalog.version), request.url.path, request.url.query]
+        if signed_urls:
+            window = url_window()
+            parts.append(str(window))
+            window_end = (window + 1) * settings.SIGNED_URL_ETAG_WINDOW_SECONDS
+            max_age = min(settings.CATALOG_HTTP_MAX_AGE_SECONDS, max(0, int(window_end - time.time())))
+        else:
+            max_age = settings.CATALOG_HTTP_MAX_AGE_SECONDS
+        etag = '"' + hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()[:32] + '"'
+        headers = {"ETag": etag, "Cache-Control": f"private, max-age={max_age}, must-revalidate"}
+
+        if _matches(request.headers.get("if-none-match"), etag):
+            raise HTTPException(status_code=304, headers=headers)
+        response.headers.update(headers)
+        return etag
+
+    return dependency
+
+def json_response(content, response: Optional[Response] = None) -> ORJSONResponse:
+    """
+    Serialize with orjson, skipping response_model re-validation (for content
+    projected straight from cached catalog documents). Keeps headers such as
+    the ETag that dependencies set on `response`.
+    """
+    fast = ORJSONResponse(content)
+    if response is not None:
+        fast.headers.update(response.headers)
+    return fast
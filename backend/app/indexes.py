@@ -0,0 +1,123 @@
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .database import db
+
+class IndexSpec(NamedTuple):
+    collection: str
+    keys: List[Tuple[str, int]]
+    unique: bool = False
+    sparse: bool = False
+
+class QueryShape(NamedTuple):
+    name: str
+    collection: str
+    filter: dict
+    sort: Optional[List[Tuple[str, int]]] = None
+
+# Every index the application relies on. Unique constraints back the upserts
+# that assume one document per key.
+INDEXES: List[IndexSpec] = [
+    IndexSpec("courses", [("id", 1)], unique=True),
+    IndexSpec("videos", [("id", 1)], unique=True),
+    IndexSpec("videos", [("course_id", 1), ("order", 1), ("id", 1)]),
+    IndexSpec("videos", [("order", 1)]),
+    IndexSpec("users", [("id", 1)], unique=True),
+    IndexSpec("users", [("firebase_uid", 1)], unique=True, sparse=True),
+    IndexSpec("users", [("email", 1)], unique=True),
+    IndexSpec("user_progress", [("user_id", 1), ("video_id", 1)], unique=True),
+    IndexSpec("user_progress", [("user_id", 1), ("timestamp", 1)]),
+    IndexSpec("mastery_scores", [("user_id", 1), ("topic", 1)], unique=True),
+    IndexSpec("quiz_results", [("user_id", 1)]),
+    IndexSpec("quizzes", [("id", 1)], unique=True),
+    IndexSpec("quizzes", [("video_id", 1)]),
+    IndexSpec("user_stats", [("user_id", 1)], unique=True),
+    IndexSpec("user_stats_markers", [("user_id", 1), ("kind", 1), ("marker", 1)], unique=True),
+    IndexSpec("recommendations_cache", [("user_id", 1)], unique=True),
+    IndexSpec("jobs", [("id", 1)], unique=True),
+    IndexSpec("jobs", [("status", 1), ("lease_until", 1)]),
+]
+
+# Query shapes issued by the routers and services; each must be served by an index
+QUERY_SHAPES: List[QueryShape] = [
+    QueryShape("course by id", "courses", {"id": "x"}),
+    QueryShape("video by id", "videos", {"id": "x"}),
+    QueryShape("videos of a course in order", "videos", {"course_id": "x"}, [("order", 1)]),
+    QueryShape("videos in keyset order", "videos", {}, [("course_id", 1), ("order", 1), ("id", 1)]),
+    QueryShape("catalog videos in order", "videos", {}, [("order", 1)]),
+    QueryShape("user by id", "users", {"id": "x"}),
+    QueryShape("users in id order", "users", {"id": {"$gt": "x"}}, [("id", 1)]),
+    QueryShape("user by firebase_uid", "users", {"firebase_uid": "x"}),
+    QueryShape("user by email", "users", {"email": "x"}),
+    QueryShape("progress for one video", "user_progress", {"user_id": "x", "video_id": "x"}),
+    QueryShape("progress for a set of videos", "user_progress", {"user_id": "x", "video_id": {"$in": ["x", "y"]}}),
+    QueryShape("progress of a user", "user_progress", {"user_id": "x"}),
+    QueryShape("progress of a user, latest first", "user_progress", {"user_id": "x"}, [("timestamp", -1)]),
+    QueryShape("progress of a set of users", "user_progress", {"user_id": {"$in": ["x", "y"]}}, [("timestamp", -1)]),
+    QueryShape("completed progress of a user", "user_progress", {"user_id": "x", "completed": True}),
+    QueryShape("mastery of a user", "mastery_scores", {"user_id": "x"}),
+    QueryShape("mastery page of a user", "mastery_scores", {"user_id": "x", "topic": {"$gt": "x"}}, [("topic", 1)]),
+    QueryShape("mastery of a set of users", "mastery_scores", {"user_id": {"$in": ["x", "y"]}}),
+    QueryShape("mastery for one topic", "mastery_scores", {"user_id": "x", "topic": "x"}),
+    QueryShape("quiz results of a user", "quiz_results", {"user_id": "x"}),
+    QueryShape("quiz by id", "quizzes", {"id": "x"}),
+    QueryShape("quiz for a video", "quizzes", {"video_id": "x"}),
+    QueryShape("stats of a user", "user_stats", {"user_id": "x"}),
+    QueryShape("stats marker", "user_stats_markers", {"user_id": "x", "kind": "x", "marker": "x"}),
+    QueryShape("cached recommendations of a user", "recommendations_cache", {"user_id": "x"}),
+    QueryShape("job by id", "jobs", {"id": "x"}),
+    QueryShape("expired queued jobs", "jobs", {"status": "queued", "lease_until": {"$lt": 0}}),
+]
+
+async def ensure_indexes(specs: List[IndexSpec] = INDEXES, collection_names: Optional[Dict[str, str]] = None):
+    """
+    Create every registered index. `collection_names` maps a registry
+    collection to the physical one (e.g. a staging collection).
+    """
+    print("Ensuring database indexes...")
+    failed = 0
+    for spec in specs:
+        name = (collection_names or {}).get(spec.collection, spec.collection)
+        try:
+            await db[name].create_index(spec.keys, unique=spec.unique, sparse=spec.sparse)
+        except Exception as e:
+            failed += 1
+            print(f"Error creating index {spec.keys} on {name}: {e}")
+    if failed:
+        print(f"Database indexes ensured with {failed} error(s)")
+    else:
+        print("Database indexes ensured successfully")
+
+def _plan_stages(plan: dict) -> List[str]:
+    """All stage names in an explain() plan tree"""
+    stages = [plan['stage']] if 'stage' in plan else []
+    for key in ('inputStage', 'queryPlan'):
+        if key in plan:
+            stages += _plan_stages(plan[key])
+    for child in plan.get('inputStages', []):
+        stages += _plan_stages(child)
+    return stages
+
+async def audit_query_plans(shapes: List[QueryShape] = QUERY_SHAPES) -> List[dict]:
+    """
+    Run explain() for each registered query shape.
+    Raises RuntimeError listing every shape whose winning plan is a COLLSCAN.
+    """
+    results = []
+    for shape in shapes:
+        command = {"find": shape.collection, "filter": shape.filter}
+        if shape.sort:
+            command["sort"] = dict(shape.sort)
+        explain = await db.command("explain", command, verbosity="queryPlanner")
+        stages = _plan_stages(explain.get('queryPlanner', {}).get('winningPlan', {}))
+        results.append({"name": shape.name, "collection": shape.collection, "stages": stages,
+                        "collscan": "COLLSCAN" in stages})
+
+    for result in results:
+        print(f"{'COLLSCAN' if result['collscan'] else 'ok':>8}  {result['collection']}: {result['name']} "
+              f"({' <- '.join(result['stages'])})")
+
+    scans = [r for r in results if r['collscan']]
+    if scans:
+        raise RuntimeError("Query plan audit failed, collection scans for: " +
+                           ", ".join(f"{r['collection']} ({r['name']})" for r in scans))
+    return results
@@ -0,0 +1,296 @@
+import json
+import resource
+import sys
+import time
+from pathlib import Path
+from typing import IO, Dict, Iterator, List, Optional, Tuple
+from uuid import uuid4
+from pymongo import ReplaceOne
+
+from .config import settings
+from .database import db
+from .indexes import INDEXES, ensure_indexes
+from .catalog import bump_catalog_version
+
+# In publish order: a quiz is live before its video, a video before its course
+CATALOG_COLLECTIONS = ("quizzes", "videos", "courses")
+PUBLISH_ID = "catalog_publish"
+# Fields computed after ingestion that survive a reload when the content is unchanged
+CARRIED_VIDEO_FIELDS = ("embedding", "embedding_hash", "embedding_model")
+
+def generate_quiz(video: dict) -> dict:
+    """Sample quiz for a video (1 per video)"""
+    return {
+        "id": f"quiz-{video['id']}",
+        "video_id": video['id'],
+        "questions": [
+            {
+                "question": f"What is the main topic of {video['title']}?",
+                "options": [
+                    f"{video['topics'][0]}" if video['topics'] else "General",
+                    "Cooking",
+                    "History",
+                    "Music"
+                ],
+                "correct_answer": 0
+            },
+            {
+                "question": "Which of the following is true regarding the content?",
+                "options": [
+                    "It is unrelated to the course",
+                    "It covers advanced topics only",
+                    f"It discusses {video['description']}",
+                    "None of the above"
+                ],
+                "correct_answer": 2
+            },
+            {
+                "question": "What is the difficulty level of this video?",
+                "options": [
+                    "Impossible",
+                    video['difficulty'],
+                    "Very Easy",
+                    "Expert"
+                ],
+                "correct_answer": 1
+            },
+            {
+                "question": "Which concept was mentioned?" ,
+                "options": [
+                    "Quantum Physics",
+                    "Blockchain",
+                    video['topics'][0] if video['topics'] else "General",
+                    "Augmented Reality"
+                ],
+                "correct_answer": 2
+            }
+        ]
+    }
+
+# ---------- Streaming parsers ----------
+
+def _iter_ndjson(f: IO[str]) -> Iterator[Tuple[str, dict]]:
+    """
+    One JSON object per line, tagged with "type": "course" | "video".
+    Untagged lines are videos if they have a course_id, courses otherwise.
+    """
+    for line_number, line in enumerate(f, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            doc = json.loads(line)
+        except ValueError as e:
+            raise ValueError(f"Line {line_number}: {e}") from None
+        kind = doc.pop("type", None) or ("video" if "course_id" in doc else "course")
+        yield kind, doc
+
+def _iter_json_arrays(f: IO[str], read_size: int = 1 << 16) -> Iterator[Tuple[str, object]]:
+    """
+    Incrementally parse a top-level JSON object, yielding (key, element) for
+    each element of its array values and (key, value) for other values.
+    Only one element is held in memory at a time.
+    """
+    decoder = json.JSONDecoder()
+    buf, pos, eof = "", 0, False
+
+    def fill():
+        nonlocal buf, pos, eof
+        data = f.read(read_size)
+        eof = not data
+        buf, pos = buf[pos:] + data, 0
+
+    def peek() -> str:
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n":
+                pos += 1
+            if pos < len(buf):
+                return buf[pos]
+            if eof:
+                raise ValueError("Unexpected end of JSON input")
+            fill()
+
+    def expect(char: str):
+        nonlocal pos
+        if peek() != char:
+            raise ValueError(f"Expected {char!r} at offset {pos}, found {buf[pos]!r}")
+        pos += 1
+
+    def decode():
+        nonlocal pos
+        while True:
+            peek()
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+                # A value ending exactly at the buffer end may be truncated (e.g. a number)
+                if end < len(buf) or eof:
+                    pos = end
+                    return value
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            fill()
+
+    expect("{")
+    if peek() == "}":
+        return
+    while True:
+        key = decode()
+        expect(":")
+        if peek() == "[":
+            pos += 1
+            if peek() == "]":
+                pos += 1
+            else:
+                while True:
+                    yield key, decode()
+                    if peek() == ",":
+                        pos += 1
+                        continue
+                    expect("]")
+                    break
+        else:
+            yield key, decode()
+        if peek() == ",":
+            pos += 1
+            continue
+        expect("}")
+        return
+
+def iter_catalog_records(path: Path) -> Iterator[Tuple[str, dict]]:
+    """Stream ("course" | "video", document) pairs from an NDJSON or JSON catalog file"""
+    with open(path, "r") as f:
+        if path.suffix in (".ndjson", ".jsonl"):
+            yield from _iter_ndjson(f)
+            return
+        kinds = {"courses": "course", "videos": "video"}
+        for key, value in _iter_json_arrays(f):
+            if key in kinds and isinstance(value, dict):
+                yield kinds[key], value
+
+# ---------- Ingestion ----------
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (2**20 if sys.platform == "darwin" else 2**10)
+
+async def _carry_video_fields(videos: List[dict]):
+    """Keep embeddings of videos that are already in the live catalog"""
+    projection = {"_id": 0, "id": 1, **{field: 1 for field in CARRIED_VIDEO_FIELDS}}
+    by_id = {v['id']: v for v in videos}
+    async for live in db.videos.find({"id": {"$in": list(by_id)}, "embedding_hash": {"$exists": True}}, projection):
+        video = by_id[live['id']]
+        for field in CARRIED_VIDEO_FIELDS:
+            if field in live and field not in video:
+                video[field] = live[field]
+
+async def _publish(staging: Dict[str, str]) -> int:
+    """
+    Rename each staging collection that still exists over its live one, in
+    CATALOG_COLLECTIONS order, then bump the catalog version. Safe to re-run
+    after a failure part-way through.
+    """
+    existing = set(await db.list_collection_names())
+    for name in CATALOG_COLLECTIONS:
+        if staging[name] in existing:
+            await db[staging[name]].rename(name, dropTarget=True)
+    version = await bump_catalog_version()
+    await db.meta.delete_one({"_id": PUBLISH_ID})
+    return version
+
+async def resume_catalog_publish() -> Optional[int]:
+    """Finish a publish interrupted between its renames; returns the new catalog version, if any"""
+    pending = await db.meta.find_one({"_id": PUBLISH_ID})
+    if pending is None:
+        return None
+    print(f"Resuming interrupted catalog publish {pending['run_id']}", flush=True)
+    return await _publish(pending['collections'])
+
+async def ingest_catalog(path, chunk_size: Optional[int] = None, progress_every: int = 10) -> dict:
+    """
+    Replace the catalog from a file without ever exposing a partial one.
+    Records are streamed into staging collections with bounded, idempotent
+    bulk upserts (one per chunk, quizzes generated alongside their videos),
+    then each staging collection is renamed over the live one and the
+    catalog version is bumped, so cached readers switch in one step.
+    The renames are separate operations: readers of the catalog cache (all
+    routes) never see them half done, direct reads of db.courses/videos/
+    quizzes can briefly mix runs. A publish that fails part-way is recorded
+    in db.meta and finished by the next ingest.
+    """
+    await resume_catalog_publish()
+    path = Path(path)
+    chunk_size = chunk_size or settings.INGEST_CHUNK_SIZE
+    run_id = uuid4().hex[:8]
+    staging = {name: f"{name}_staging_{run_id}" for name in CATALOG_COLLECTIONS}
+
+    await ensure_indexes([spec for spec in INDEXES if spec.collection in staging], collection_names=staging)
+
+    stats = {"courses": 0, "videos": 0, "quizzes": 0, "chunks": 0}
+    started = time.perf_counter()
+    courses: List[dict] = []
+    videos: List[dict] = []
+
+    async def write_courses():
+        await db[staging["courses"]].bulk_write(
+            [ReplaceOne({"id": c['id']}, c, upsert=True) for c in courses], ordered=False
+        )
+        stats["courses"] += len(courses)
+        courses.clear()
+
+    async def write_videos():
+        await _carry_video_fields(videos)
+        await db[staging["videos"]].bulk_write(
+            [ReplaceOne({"id": v['id']}, v, upsert=True) for v in videos], ordered=False
+        )
+        quizzes = [generate_quiz(v) for v in videos]
+        await db[staging["quizzes"]].bulk_write(
+            [ReplaceOne({"id": q['id']}, q, upsert=True) for q in quizzes], ordered=False
+        )
+        stats["videos"] += len(videos)
+        stats["quizzes"] += len(quizzes)
+        stats["chunks"] += 1
+        videos.clear()
+        if stats["chunks"] % progress_every == 0:
+            elapsed = time.perf_counter() - started
+            print(f"Ingested {stats['videos']} videos, {stats['courses']} courses "
+                  f"({stats['videos'] / elapsed:.0f} videos/s, peak RSS {_peak_rss_mb():.0f} MB)", flush=True)
+
+    try:
+        for kind, doc in iter_catalog_records(path):
+            doc.pop("_id", None)
+            if kind == "course":
+                courses.append(doc)
+                if len(courses) >= chunk_size:
+                    await write_courses()
+            elif kind == "video":
+                videos.append(doc)
+                if len(videos) >= chunk_size:
+                    await write_videos()
+        if courses:
+            await write_courses()
+        if videos:
+            await write_videos()
+        if not stats["courses"] and not stats["videos"]:
+            raise ValueError(f"No courses or videos found in {path}")
+    except Exception:
+        for name in staging.values():
+            await db.drop_collection(name)
+        raise
+
+    # Past this point the staging collections are kept until published, so a
+    # failure between renames is resumed rather than leaving the swap half done
+    await db.meta.replace_one({"_id": PUBLISH_ID}, {"_id": PUBLISH_ID, "run_id": run_id, "collections": staging},
+                              upsert=True)
+    version = await _publish(staging)
+    elapsed = time.perf_counter() - started
+    stats.update({
+        "seconds": round(elapsed, 3),
+        "videos_per_second": round(stats["videos"] / elapsed, 1) if elapsed > 0 else 0.0,
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "catalog_version": version,
+    })
+    print(f"Catalog ingested: {stats}", flush=True)
+    return stats
@@ -0,0 +1,176 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional
+from uuid import uuid4
+from pymongo import ReturnDocument
+
+from .config import settings
+from .database import db
+
+JobHandler = Callable[..., Awaitable[None]]
+
+class Job(NamedTuple):
+    id: str
+    name: str
+    payload: dict
+    attempts: int = 0
+
+class JobQueue:
+    """
+    In-process queue for side effects that can run after the response:
+    `workers` coroutines run jobs concurrently, a failing job is retried up
+    to `max_attempts` times with exponential backoff, and stop() drains the
+    queue before shutdown. With `durable`, each job is also written to
+    db.jobs before enqueue returns and deleted once it has run; a job whose
+    lease expires unfinished (its process died) is claimed by the next
+    process that starts. Delivery is at-least-once: a retry or a recovered
+    job runs its handler again, so handlers must be idempotent - e.g. key
+    writes on the ids in their payload, or register with `pass_job_id` and
+    record the job id in the same update they apply.
+    """
+
+    def __init__(self, workers: int, max_attempts: int, retry_base: float, durable: bool,
+                 lease_seconds: float, max_size: int):
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.durable = durable
+        self.lease_seconds = lease_seconds
+        self.max_size = max_size
+        self._handlers: Dict[str, JobHandler] = {}
+        self._with_job_id = set()
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self.stats = {"enqueued": 0, "succeeded": 0, "retried": 0, "failed": 0, "recovered": 0}
+
+    def handler(self, name: str, pass_job_id: bool = False):
+        """
+        Register the coroutine that runs jobs called `name` (payload keys are
+        its arguments, plus `job_id` with `pass_job_id`)
+        """
+        def register(fn: JobHandler) -> JobHandler:
+            self._handlers[name] = fn
+            if pass_job_id:
+                self._with_job_id.add(name)
+            return fn
+        return register
+
+    async def enqueue(self, name: str, **payload):
+        if name not in self._handlers:
+            raise ValueError(f"No handler registered for job {name!r}")
+        job = Job(uuid4().hex, name, payload)
+        if self.durable:
+            await db.jobs.insert_one({
+                "id": job.id, "name": name, "payload": payload, "status": "queued", "attempts": 0,
+                "lease_until": time.time() + self.lease_seconds,
+                "created_at": datetime.now(timezone.utc).isoformat()
+            })
+        if self._queue is None:
+            # Not started (e.g. a CLI): run inline so the work still happens
+            await self._run(job)
+            return
+        self.stats["enqueued"] += 1
+        await self._queue.put(job)
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        if self.durable:
+            await self._recover()
+
+    async def _recover(self):
+        """Claim durable jobs left queued by a process that stopped before running them"""
+        while True:
+            now = time.time()
+            doc = await db.jobs.find_one_and_update(
+                {"status": "queued", "lease_until": {"$lt": now}},
+                {"$set": {"lease_until": now + self.lease_seconds}},
+                projection={"_id": 0},
+                return_document=ReturnDocument.AFTER
+            )
+            if doc is None:
+                break
+            if doc['name'] not in self._handlers:
+                print(f"Skipping recovered job {doc['id']}: no handler for {doc['name']!r}")
+                continue
+            self.stats["recovered"] += 1
+            await self._queue.put(Job(doc['id'], doc['name'], doc['payload'], doc['attempts']))
+        if self.stats["recovered"]:
+            print(f"Recovered {self.stats['recovered']} queued jobs")
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Job):
+        handler = self._handlers[job.name]
+        extra = {"job_id": job.id} if job.name in self._with_job_id else {}
+        attempts = job.attempts
+        while True:
+            attempts += 1
+            try:
+                await handler(**job.payload, **extra)
+                break
+            except Exception as e:
+                if attempts >= self.max_attempts:
+                    self.stats["failed"] += 1
+                    print(f"Job {job.name} {job.id} failed after {attempts} attempts: {e}")
+                    if self.durable:
+                        await self._mark(job, {"status": "failed", "attempts": attempts, "error": str(e)})
+                    return
+                self.stats["retried"] += 1
+                if self.durable:
+                    # Keep the lease ahead of the backoff so no other process claims it
+                    await self._mark(job, {"attempts": attempts, "error": str(e),
+                                           "lease_until": time.time() + self.lease_seconds})
+                await asyncio.sleep(self.retry_base * 2 ** (attempts - 1))
+        self.stats["succeeded"] += 1
+        if self.durable:
+            try:
+                await db.jobs.delete_one({"id": job.id})
+            except Exception as e:
+                print(f"Error deleting finished job {job.id}: {e}")
+
+    async def _mark(self, job: Job, fields: dict):
+        try:
+            await db.jobs.update_one({"id": job.id}, {"$set": fields})
+        except Exception as e:
+            print(f"Error updating job {job.id}: {e}")
+
+    async def stop(self, timeout: float):
+        """Wait up to `timeout` seconds for queued jobs to finish, then stop the workers"""
+        if self._queue is not None and self._tasks:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                print(f"Job queue drain timed out with {self._queue.qsize()} jobs queued"
+                      + (" (kept in db.jobs)" if self.durable else ""))
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    def snapshot(self) -> dict:
+        return {
+            **self.stats,
+            "workers": self.workers,
+            "durable": self.durable,
+            "queued": self._queue.qsize() if self._queue else 0,
+        }
+
+job_queue = JobQueue(
+    settings.JOB_WORKERS,
+    max_attempts=settings.JOB_MAX_ATTEMPTS,
+    retry_base=settings.JOB_RETRY_BASE_SECONDS,
+    durable=settings.JOBS_DURABLE,
+    lease_seconds=settings.JOB_LEASE_SECONDS,
+    max_size=settings.JOB_QUEUE_MAX_SIZE
+)
@@ -1,19 +1,52 @@
+import time
+_started = time.perf_counter()  # cold-start clock, taken before the app's own imports
+
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from starlette.middleware.cors import CORSMiddleware
 
-from .database import load_sbert_model, init_firebase, ensure_indexes
-from .routers import auth, courses, analytics, recommendations
+from .config import settings
+from .database import init_firebase
+from .embedding_service import embedding_service
+from .indexes import ensure_indexes, audit_query_plans
+from .catalog import catalog_cache
+from .token_verifier import token_verifier
+from .progress_buffer import progress_buffer
+from .recommendation_cache import recommendation_cache
+from .jobs import job_queue
+from . import services  # registers the job handlers
+from .metrics import MetricsMiddleware
+from .routers import auth, courses, analytics, recommendations, search, health, metrics
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
+    imported = time.perf_counter()
     init_firebase()
-    load_sbert_model()
+    embedding_service.start()  # loads the model in the background; recommendations degrade until it is ready
     await ensure_indexes()
+    if settings.INDEX_AUDIT_ON_STARTUP:
+        await audit_query_plans()  # refuses to start if a hot query would scan a collection
+    catalog_cache.start_watching()
+    token_verifier.start()
+    progress_buffer.start()
+    await job_queue.start()  # also re-queues durable jobs a stopped process left behind
+    serving = time.perf_counter()
+    app.state.startup = {
+        "import_seconds": round(imported - _started, 3),
+        "startup_seconds": round(serving - imported, 3),
+        "cold_start_seconds": round(serving - _started, 3),
+    }
+    print(f"Cold start: imports {imported - _started:.2f}s, startup {serving - imported:.2f}s, "
+          f"serving after {serving - _started:.2f}s")
     yield
     # Shutdown
-    pass
+    await progress_buffer.stop()  # flush buffered progress heartbeats
+    await job_queue.stop(settings.JOB_DRAIN_TIMEOUT_SECONDS)  # finish queued side effects
+    await recommendation_cache.stop()
+    await catalog_cache.stop_watching()
+    await token_verifier.stop()
+    await embedding_service.stop()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -27,12 +60,19 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Outermost, so measured latency covers the whole middleware stack
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
 
 # Include Routers
 app.include_router(auth.router, prefix="/api")
 app.include_router(courses.router, prefix="/api")
 app.include_router(analytics.router, prefix="/api")
 app.include_router(recommendations.router, prefix="/api")
+app.include_router(search.router, prefix="/api")
+app.include_router(health.router)
+if settings.METRICS_ENABLED:
+    app.include_router(metrics.router)
 
 @app.get("/")
 async def root():
@@ -0,0 +1,176 @@
+import os
+import re
+import time
+from typing import Dict, Optional, Tuple
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from pymongo import monitoring
+
+# Spans cached reads (sub-millisecond) to model-bound and remote calls
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METHODS = frozenset(("GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"))
+UNMATCHED_ROUTE = "unmatched"
+
+# Labels are route templates (never raw paths), known methods, status codes,
+# driver command names and collection names, so series counts stay bounded
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route template and status code", ["method", "route", "status"]
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ["method", "route"],
+    buckets=LATENCY_BUCKETS
+)
+HTTP_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "HTTP requests being served by route template", ["method", "route"],
+    multiprocess_mode="livesum"
+)
+OPERATION_LATENCY = Histogram(
+    "operation_duration_seconds", "Latency of hot-path operations (verify_id_token, generate_signed_url, sbert_encode)",
+    ["operation"], buckets=LATENCY_BUCKETS
+)
+MONGO_LATENCY = Histogram(
+    "mongo_command_duration_seconds", "MongoDB command latency by command and collection", ["command", "collection"],
+    buckets=LATENCY_BUCKETS
+)
+MONGO_FAILURES = Counter(
+    "mongo_command_failures_total", "Failed MongoDB commands by command and collection", ["command", "collection"]
+)
+
+def timed(operation: str):
+    """Context manager (or decorator) recording the duration of a named operation"""
+    return OPERATION_LATENCY.labels(operation).time()
+
+# ---------- HTTP ----------
+
+class RouteTemplates:
+    """
+    Resolves a request to its route's path template (e.g.
+    /api/videos/{video_id}) with each route's compiled path regex, without
+    building the child scopes the router's own matching does.
+    """
+
+    def __init__(self):
+        self._routes = None
+        self._source = None
+
+    def _compile(self, routes):
+        self._routes = [
+            (route.path_regex, route.methods, route.path)
+            for route in routes if hasattr(route, "path_regex") and hasattr(route, "path")
+        ]
+        self._source = (id(routes), len(routes))
+
+    def resolve(self, scope) -> str:
+        routes = scope["app"].router.routes
+        if self._source != (id(routes), len(routes)):
+            self._compile(routes)
+        path, method, partial = scope["path"], scope["method"], None
+        for regex, methods, template in self._routes:
+            if regex.match(path):
+                if methods is None or method in methods:
+                    return template
+                if partial is None:
+                    partial = template  # path matched, method not allowed
+        return partial or UNMATCHED_ROUTE
+
+route_templates = RouteTemplates()
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording per-route latency, in-flight requests and
+    status counts. Plain ASGI rather than BaseHTTPMiddleware, so it adds no
+    extra task or body buffering per request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        # Labelled children per (method, route) and per status, resolved once
+        self._series: Dict[Tuple[str, str], tuple] = {}
+        self._counters: Dict[Tuple[str, str, int], object] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"] if scope["method"] in METHODS else "OTHER"
+        route = route_templates.resolve(scope)
+        series = self._series.get((method, route))
+        if series is None:
+            series = self._series[(method, route)] = (HTTP_IN_FLIGHT.labels(method, route),
+                                                      HTTP_LATENCY.labels(method, route))
+        in_flight, latency = series
+        status = 500  # unless a response starts, the request failed
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            latency.observe(time.perf_counter() - started)
+            counter = self._counters.get((method, route, status))
+            if counter is None:
+                counter = self._counters[(method, route, status)] = HTTP_REQUESTS.labels(method, route, str(status))
+            counter.inc()
+            in_flight.dec()
+
+# ---------- MongoDB ----------
+
+_STAGING_SUFFIX = re.compile(r"_staging_\w+$")
+
+def collection_label(name) -> str:
+    """Collection a command targets; per-run ingest staging names collapse to one label"""
+    if not isinstance(name, str):
+        return ""  # database-level commands (ping, aggregate: 1, ...)
+    return _STAGING_SUFFIX.sub("_staging", name)
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """
+    pymongo command monitoring: times every command the driver sends, by
+    command name and collection. Collections are only named on the started
+    event, so they are held until the matching succeeded/failed event.
+    """
+
+    def __init__(self):
+        self._pending: Dict[Tuple[object, int], Tuple[str, str]] = {}
+
+    def started(self, event):
+        name = event.command_name
+        target = event.command.get("collection") if name == "getMore" else event.command.get(name)
+        self._pending[(event.connection_id, event.request_id)] = (name, collection_label(target))
+
+    def _finish(self, event) -> Optional[Tuple[str, str]]:
+        labels = self._pending.pop((event.connection_id, event.request_id), None)
+        if labels is not None:
+            MONGO_LATENCY.labels(*labels).observe(event.duration_micros / 1e6)
+        return labels
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        labels = self._finish(event)
+        if labels is not None:
+            MONGO_FAILURES.labels(*labels).inc()
+
+mongo_command_metrics = MongoCommandMetrics()
+
+# ---------- Exposition ----------
+
+def render_metrics() -> Tuple[bytes, str]:
+    """
+    Metrics in the Prometheus text format. With several server processes,
+    set PROMETHEUS_MULTIPROC_DIR (before start-up) and every process's
+    samples are aggregated here.
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
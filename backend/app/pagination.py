@@ -0,0 +1,47 @@
+import base64
+import binascii
+import json
+from bisect import bisect_right
+from typing import Callable, List, Optional, Sequence
+
+from fastapi import HTTPException
+
+# Keyset pagination: a page is "the next `limit` items after this key", so
+# pages stay stable and cheap at any depth. Cursors are opaque to clients.
+
+def encode_cursor(key: Sequence) -> str:
+    raw = json.dumps(list(key), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str, size: int) -> tuple:
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, binascii.Error):
+        key = None
+    if not isinstance(key, list) or len(key) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return tuple(key)
+
+def slice_after(items: List, keys: List[tuple], cursor: Optional[str], limit: int) -> List:
+    """Up to limit + 1 items following the cursor, from a list sorted by `keys`"""
+    start = 0
+    if cursor and keys:
+        after = decode_cursor(cursor, len(keys[0]))
+        try:
+            start = bisect_right(keys, after)
+        except TypeError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    return items[start:start + limit + 1]
+
+def page_response(items: List, limit: int, key: Callable[[dict], Sequence]) -> dict:
+    """
+    Build {items, limit, next_cursor} from up to limit + 1 items in key order;
+    the extra item only signals that another page exists.
+    """
+    more = len(items) > limit
+    items = items[:limit]
+    return {
+        "items": items,
+        "limit": limit,
+        "next_cursor": encode_cursor(key(items[-1])) if more and items else None,
+    }
@@ -0,0 +1,128 @@
+import asyncio
+from typing import Dict, Optional
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from .config import settings
+from .database import db
+
+class ProgressBuffer:
+    """
+    Write-behind buffer for video progress heartbeats. Only the latest
+    heartbeat per (user, video) is kept; the buffer is written with one
+    bulk_write when it reaches `max_size` entries, every `flush_interval`
+    seconds, and on shutdown. Completion events bypass it.
+    Unlike the direct writes they replace, heartbeats never reset
+    `completed`: once a video is completed, re-watching it does not
+    un-complete it (the stats counters only ever count completions up).
+    A heartbeat older than the stored progress (e.g. one in flight while a
+    completion was written) is dropped rather than moving it backwards.
+    """
+
+    def __init__(self, max_size: int, flush_interval: float):
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self._pending: Dict[str, Dict[str, dict]] = {}  # user_id -> video_id -> progress doc
+        self._size = 0
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"buffered": 0, "coalesced": 0, "flushes": 0, "written": 0, "superseded": 0, "errors": 0}
+
+    def add(self, progress_doc: dict):
+        user_pending = self._pending.setdefault(progress_doc['user_id'], {})
+        if progress_doc['video_id'] in user_pending:
+            self.stats["coalesced"] += 1
+        else:
+            self._size += 1
+        user_pending[progress_doc['video_id']] = progress_doc
+        self.stats["buffered"] += 1
+        if self._size >= self.max_size:
+            asyncio.ensure_future(self.flush())
+
+    def discard(self, user_id: str, video_id: str):
+        """Forget a buffered heartbeat superseded by a direct write"""
+        user_pending = self._pending.get(user_id)
+        if user_pending and user_pending.pop(video_id, None) is not None:
+            self._size -= 1
+            if not user_pending:
+                del self._pending[user_id]
+
+    def get(self, user_id: str, video_id: str) -> Optional[dict]:
+        return self._pending.get(user_id, {}).get(video_id)
+
+    def merge_into(self, user_id: str, progress_by_video: Dict[str, dict]) -> Dict[str, dict]:
+        """Overlay buffered heartbeats on progress read from Mongo (completion is kept)"""
+        for video_id, buffered in self._pending.get(user_id, {}).items():
+            stored = progress_by_video.get(video_id)
+            merged = dict(buffered)
+            merged['completed'] = bool(stored and stored.get('completed', False))
+            progress_by_video[video_id] = merged
+        return progress_by_video
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._size:
+                return
+            pending, self._pending, self._size = self._pending, {}, 0
+            docs = [doc for user_pending in pending.values() for doc in user_pending.values()]
+            operations = [
+                UpdateOne(
+                    # A newer stored write fails the filter, and the upsert then hits the unique index
+                    {"user_id": doc['user_id'], "video_id": doc['video_id'], "timestamp": {"$lt": doc['timestamp']}},
+                    {
+                        "$set": {
+                            "user_id": doc['user_id'],
+                            "video_id": doc['video_id'],
+                            "watch_percentage": doc['watch_percentage'],
+                            "timestamp": doc['timestamp']
+                        },
+                        # A heartbeat never un-completes a video
+                        "$setOnInsert": {"completed": False}
+                    },
+                    upsert=True
+                )
+                for doc in docs
+            ]
+            failed, superseded = docs, 0
+            try:
+                await db.user_progress.bulk_write(operations, ordered=False)
+                failed = []
+            except BulkWriteError as e:
+                errors = e.details.get('writeErrors', [])
+                superseded = sum(1 for error in errors if error.get('code') == 11000)
+                failed = [docs[error['index']] for error in errors if error.get('code') != 11000]
+                if failed:
+                    print(f"Error flushing progress buffer: {len(failed)} of {len(docs)} writes failed")
+            except Exception as e:
+                print(f"Error flushing progress buffer: {e}")
+            self.stats["superseded"] += superseded
+            self.stats["written"] += len(docs) - len(failed) - superseded
+            if failed:
+                self.stats["errors"] += 1
+                # Put back whatever was not superseded while the flush was running
+                for doc in failed:
+                    if self.get(doc['user_id'], doc['video_id']) is None:
+                        self.add(doc)
+            else:
+                self.stats["flushes"] += 1
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the timer and write out everything still buffered"""
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+
+progress_buffer = ProgressBuffer(settings.PROGRESS_BUFFER_MAX_SIZE, settings.PROGRESS_FLUSH_INTERVAL_SECONDS)
@@ -0,0 +1,227 @@
+import asyncio
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set, Tuple
+
+from .config import settings
+from .database import db
+from .cache import TTLCache
+from .catalog import get_catalog, catalog_cache
+from .scoring import get_scoring_engine
+from .embedding_store import embedding_store
+from .embedding_service import embedding_service
+from .progress_buffer import progress_buffer
+
+REVIEW_REASON = "Congratulations! Review from the beginning"
+
+async def load_catalog_engine():
+    """Return (cached catalog, scoring engine built over it)"""
+    catalog = await get_catalog()
+    model = embedding_service if embedding_service.ready else None
+    engine = await get_scoring_engine(catalog, model, embedding_store)
+    return catalog, engine
+
+def rank_videos(engine, mastery_dict: Dict[str, float], initial_level: str, watched_videos: Dict[str, dict],
+                top_n: int, use_similarity: bool = True) -> List[dict]:
+    """Top-N recommendation items [{video_id, reason}] for one user over a non-empty catalog engine"""
+    # User's last watched video for semantic similarity
+    last_watched_video = None
+    if watched_videos:
+        last_progress = max(watched_videos.values(), key=lambda x: x.get('timestamp', ''))
+        row = engine.index.get(last_progress['video_id'])
+        last_watched_video = engine.videos[row] if row is not None else None
+
+    # Score every video at once against the in-memory catalog matrices
+    scores, reason_codes, candidates = engine.score(
+        mastery_dict,
+        initial_level,
+        watched_videos,
+        last_video_id=last_watched_video['id'] if last_watched_video else None,
+        use_similarity=use_similarity
+    )
+    top = engine.top_k(scores, candidates, k=top_n)
+    if not top:
+        # All videos completed - recommend from start
+        return [{"video_id": engine.videos[0]['id'], "reason": REVIEW_REASON}]
+    return [
+        {"video_id": engine.videos[row]['id'],
+         "reason": engine.reason_text(row, reason_codes[row], initial_level, watched_videos, last_watched_video)}
+        for row in top
+    ]
+
+async def compute_recommendations(user_id: str, initial_level: str, top_n: int) -> Optional[dict]:
+    """
+    Rank the catalog for one user and return the cache document:
+    {user_id, initial_level, catalog_version, similarity, items: [{video_id, reason}],
+    mastery_scores: [{topic, score}], computed_at}. None if the catalog is empty.
+    """
+    mastery_dict = {
+        m['topic']: m['score']
+        async for m in db.mastery_scores.find({"user_id": user_id}, {"_id": 0, "topic": 1, "score": 1})
+    }
+
+    # Streamed, latest first via the (user_id, timestamp) index
+    progress_cursor = db.user_progress.find({"user_id": user_id}, {"_id": 0}).sort("timestamp", -1)
+    watched_videos = progress_buffer.merge_into(user_id, {p['video_id']: p async for p in progress_cursor})
+
+    catalog, engine = await load_catalog_engine()
+    if not catalog.videos:
+        return None
+
+    use_similarity = embedding_service.ready
+    items = rank_videos(engine, mastery_dict, initial_level, watched_videos, top_n, use_similarity)
+
+    return {
+        "user_id": user_id,
+        "initial_level": initial_level,
+        "catalog_version": catalog.version,
+        "similarity": use_similarity,
+        "items": items,
+        # A list, not a dict: topics are free text and may not be valid field names
+        "mastery_scores": [{"topic": topic, "score": score} for topic, score in mastery_dict.items()],
+        "computed_at": datetime.now(timezone.utc).isoformat()
+    }
+
+class RecommendationCache:
+    """
+    Precomputed top-N next-video recommendations per user, stored in
+    db.recommendations_cache with an in-process LRU in front. Entries are
+    valid for one catalog version. Completions and quiz submissions
+    invalidate a user's entry and recompute it in the background once
+    their side effects have run (reads in between compute synchronously
+    or wait for the pending refresh rather than serve the superseded
+    answer), a catalog reload refreshes the users in the LRU, and a miss is
+    computed synchronously.
+    The LRU TTL bounds how long another worker's copy can lag an event.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, top_n: int, concurrency: int):
+        self.top_n = top_n
+        self._lru = TTLCache(maxsize, ttl=ttl)
+        self._concurrency = concurrency
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self._dirty: Set[str] = set()
+        self._stale: Set[str] = set()
+        self.stats = {"lru_hits": 0, "store_hits": 0, "computed": 0, "refreshes": 0,
+                      "catalog_refreshes": 0, "errors": 0}
+
+    async def get(self, user: dict) -> Optional[dict]:
+        user_id = user['id']
+        pending = self._refreshing.get(user_id)
+        if pending is not None:
+            await asyncio.shield(pending)
+
+        catalog = await get_catalog()
+        if user_id in self._stale:
+            doc = await self._compute(user_id, user.get('initial_level', 'Medium'))
+            self.stats["computed"] += 1
+            return doc
+        doc = self._lru.get(user_id)
+        if doc is not None and doc['catalog_version'] == catalog.version:
+            self.stats["lru_hits"] += 1
+        else:
+            doc = await db.recommendations_cache.find_one({"user_id": user_id}, {"_id": 0})
+            if doc is not None and doc['catalog_version'] == catalog.version:
+                self.stats["store_hits"] += 1
+                self._lru.set(user_id, doc)
+            else:
+                doc = await self._compute(user_id, user.get('initial_level', 'Medium'))
+                self.stats["computed"] += 1
+
+        # Computed before the model was ready: serve it, upgrade in the background
+        if doc is not None and not doc['similarity'] and embedding_service.ready:
+            self.refresh(user_id, doc['initial_level'])
+        return doc
+
+    async def next_video(self, user: dict) -> Optional[Tuple[dict, dict, dict]]:
+        """
+        (video, item, cache document) for the best cached item, resolved
+        against the catalog version the entry was ranked for. None if
+        nothing can be recommended.
+        """
+        for _ in range(2):
+            doc = await self.get(user)
+            if doc is None:
+                return None
+            catalog = await get_catalog()
+            # Pinned together: the catalog singleton may reload at the next await
+            version, videos_by_id = catalog.version, catalog.videos_by_id
+            if doc['catalog_version'] == version:
+                for item in doc['items']:
+                    video = videos_by_id.get(item['video_id'])
+                    if video is not None:
+                        return video, item, doc
+                return None
+            # The catalog reloaded after the entry was read; get() ranks against the new version
+        return None
+
+    async def _compute(self, user_id: str, initial_level: str, refresh: bool = False) -> Optional[dict]:
+        self._stale.discard(user_id)
+        doc = await compute_recommendations(user_id, initial_level, self.top_n)
+        if doc is None:
+            return None
+        if not refresh and user_id in self._refreshing:
+            # A refresh started meanwhile and will store a newer ranking
+            return doc
+        await db.recommendations_cache.replace_one({"user_id": user_id}, doc, upsert=True)
+        doc.pop("_id", None)
+        self._lru.set(user_id, doc)
+        return doc
+
+    def invalidate(self, user_id: str):
+        """Stop serving a user's entry until it is recomputed (call when a refresh will follow)"""
+        self._stale.add(user_id)
+        self._lru.pop(user_id)
+
+    def refresh(self, user_id: str, initial_level: Optional[str] = None):
+        """Recompute a user's entry in the background; events during a refresh trigger one more run"""
+        if user_id in self._refreshing:
+            self._dirty.add(user_id)
+            return
+        task = asyncio.create_task(self._refresh(user_id, initial_level))
+        self._refreshing[user_id] = task
+        task.add_done_callback(lambda _: self._refreshing.pop(user_id, None))
+
+    async def _refresh(self, user_id: str, initial_level: Optional[str]):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self._concurrency)
+        try:
+            async with self._slots:
+                while True:
+                    self._dirty.discard(user_id)
+                    if initial_level is None:
+                        user = await db.users.find_one({"id": user_id}, {"_id": 0, "initial_level": 1}) or {}
+                        initial_level = user.get('initial_level', 'Medium')
+                    await self._compute(user_id, initial_level, refresh=True)
+                    self.stats["refreshes"] += 1
+                    if user_id not in self._dirty:
+                        break
+        except Exception as e:
+            self.stats["errors"] += 1
+            # Drop the entry so the next read computes it synchronously
+            self._lru.pop(user_id)
+            print(f"Error refreshing recommendations for {user_id}: {e}")
+
+    def on_catalog_reload(self, version: int):
+        """Recompute the users this worker has served recently against the new catalog"""
+        self.stats["catalog_refreshes"] += 1
+        for doc in self._lru.values():
+            if doc['catalog_version'] != version:
+                self.refresh(doc['user_id'], doc['initial_level'])
+
+    async def stop(self):
+        tasks = list(self._refreshing.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def snapshot(self) -> dict:
+        return {**self.stats, "lru": self._lru.snapshot(), "refreshing": len(self._refreshing)}
+
+recommendation_cache = RecommendationCache(
+    settings.RECOMMENDATION_CACHE_SIZE,
+    ttl=settings.RECOMMENDATION_CACHE_TTL_SECONDS,
+    top_n=settings.RECOMMENDATION_TOP_N,
+    concurrency=settings.RECOMMENDATION_REFRESH_CONCURRENCY
+)
+catalog_cache.add_reload_listener(recommendation_cache.on_catalog_reload)
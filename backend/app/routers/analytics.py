@@ -1,33 +1,46 @@
-from typing import List
-from fastapi import APIRouter, Depends
+from typing import Optional
+from fastapi import APIRouter, Depends, Query
 
+from ..config import settings
 from ..database import db
-from ..schemas import MasteryScore
+from ..schemas import MasteryScorePage
 from ..dependencies import get_current_user
+from ..catalog import get_catalog
+from ..user_stats import get_user_stats
+from ..pagination import decode_cursor, page_response
 
 router = APIRouter(prefix="/analytics", tags=["analytics"])
 
-@router.get("/mastery", response_model=List[MasteryScore])
-async def get_mastery_scores(user = Depends(get_current_user)):
-    scores = await db.mastery_scores.find({"user_id": user['id']}, {"_id": 0}).to_list(1000)
-    return scores
+@router.get("/mastery", response_model=MasteryScorePage)
+async def get_mastery_scores(limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+                             cursor: Optional[str] = None, user = Depends(get_current_user)):
+    """A user's mastery scores by topic, keyset-paged on the (user_id, topic) index"""
+    query = {"user_id": user['id']}
+    if cursor:
+        query["topic"] = {"$gt": decode_cursor(cursor, 1)[0]}
+    scores = [score async for score in db.mastery_scores.find(query, {"_id": 0, "applied_jobs": 0}).sort("topic", 1).limit(limit + 1)]
+    return page_response(scores, limit, lambda score: (score['topic'],))
 
 @router.get("/progress")
 async def get_overall_progress(user = Depends(get_current_user)):
-    # Get all progress
-    progress_list = await db.user_progress.find({"user_id": user['id']}, {"_id": 0}).to_list(1000)
+    # Materialized counters, maintained on progress and quiz writes
+    stats = await get_user_stats(user['id'])
     
-    total_videos = await db.videos.count_documents({})
-    completed_videos = sum(1 for p in progress_list if p.get('completed', False))
+    catalog = await get_catalog()
+    total_videos = catalog.total_videos
+    completed_videos = stats.get('completed_videos', 0)
     
-    # Get quiz results
-    quiz_results = await db.quiz_results.find({"user_id": user['id']}, {"_id": 0}).to_list(1000)
-    avg_quiz_score = sum(r['score'] for r in quiz_results) / len(quiz_results) if quiz_results else 0
+    total_quizzes = stats.get('total_quizzes', 0)
+    avg_quiz_score = stats.get('quiz_score_sum', 0) / total_quizzes if total_quizzes else 0
     
     return {
         "total_videos": total_videos,
         "completed_videos": completed_videos,
         "completion_percentage": (completed_videos / total_videos * 100) if total_videos > 0 else 0,
         "average_quiz_score": avg_quiz_score,
-        "total_quizzes": len(quiz_results)
+        "total_quizzes": total_quizzes,
+        "course_completion": {
+            course_id: {"completed": completed, "total": len(catalog.videos_by_course.get(course_id, []))}
+            for course_id, completed in stats.get('course_completed', {}).items()
+        }
     }
@@ -6,7 +6,8 @@ from firebase_admin import auth as firebase_auth
 
 from ..database import db
 from ..schemas import UserProfile, UserProfileCreate
-from ..dependencies import get_current_user, security
+from ..dependencies import get_current_user, security, invalidate_cached_user
+from ..token_verifier import token_verifier
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -18,7 +19,7 @@ async def register(user_data: UserProfileCreate, credentials: HTTPAuthorizationC
     """
     try:
         # Verify the Firebase ID token
-        decoded_token = firebase_auth.verify_id_token(credentials.credentials)
+        decoded_token = await token_verifier.verify(credentials.credentials)
         firebase_uid = decoded_token.get('uid')
         email = decoded_token.get('email')
         
@@ -45,6 +46,7 @@ async def register(user_data: UserProfileCreate, credentials: HTTPAuthorizationC
                 {"email": email},
                 {"$set": {"firebase_uid": firebase_uid}}
             )
+            invalidate_cached_user(firebase_uid)
             return UserProfile(
                 id=existing_by_email['id'],
                 email=existing_by_email['email'],
@@ -65,6 +67,7 @@ async def register(user_data: UserProfileCreate, credentials: HTTPAuthorizationC
         }
         
         await db.users.insert_one(user_doc)
+        invalidate_cached_user(firebase_uid)
         
         return UserProfile(
             id=user_id,
@@ -1,55 +1,158 @@
 from datetime import datetime, timezone
-from typing import List, Optional
+from typing import Dict, List, Optional
 from uuid import uuid4
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from pymongo import ReturnDocument
 
+from ..config import settings
 from ..database import db
-from ..schemas import Course, Video, VideoProgressUpdate, Quiz, QuizSubmission, QuizResult
+from ..schemas import (
+    Course, CoursePage, Video, VideoSummary, VideoSummaryPage, VideoProgressUpdate,
+    VideoProgressBatchRequest, VideoProgressBatch, CourseProgress, Quiz, QuizSubmission, QuizResult
+)
 from ..dependencies import get_current_user
-from ..utils import get_video_url
-from ..services import update_mastery_scores_for_video
+from ..utils import get_video_urls
+from ..jobs import job_queue
+from ..catalog import get_catalog, catalog_cache, bump_catalog_version, course_key, video_key
+from ..embeddings import embed_videos, export_embedding_store
+from ..ingest import ingest_catalog
+from ..embedding_service import embedding_service
+from ..progress_buffer import progress_buffer
+from ..http_cache import catalog_etag, json_response
+from ..pagination import page_response, slice_after
+from ..recommendation_cache import recommendation_cache
 
 router = APIRouter(tags=["courses"])
 
+COURSE_FIELDS = tuple(Course.model_fields)
+VIDEO_FIELDS = tuple(Video.model_fields)
+VIDEO_SUMMARY_FIELDS = tuple(VideoSummary.model_fields)
+
+def select_fields(fields: Optional[str], allowed: tuple, default: tuple) -> tuple:
+    """Parse a `fields=a,b,c` sparse fieldset ("*" for every field); id is always included"""
+    if not fields:
+        return default
+    if fields.strip() == "*":
+        return allowed
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = sorted(set(requested) - set(allowed))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return ("id",) + tuple(dict.fromkeys(f for f in requested if f != "id"))
+
+def project(docs: List[dict], fields: tuple) -> List[dict]:
+    return [{f: doc[f] for f in fields if f in doc} for doc in docs]
+
 # ==================== Course Routes ====================
 
-@router.get("/courses", response_model=List[Course])
-async def get_courses(user = Depends(get_current_user)):
-    courses = await db.courses.find({}, {"_id": 0}).to_list(1000)
-    return courses
+@router.get("/courses", response_model=CoursePage)
+async def get_courses(response: Response, fields: Optional[str] = None,
+                      limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+                      cursor: Optional[str] = None, user = Depends(get_current_user),
+                      etag: str = Depends(catalog_etag())):
+    """Courses by id, `limit` per page; pass `next_cursor` back as `cursor` for the next page"""
+    catalog = await get_catalog()
+    page = page_response(slice_after(catalog.courses, catalog.course_keys, cursor, limit), limit, course_key)
+    page["items"] = project(page["items"], select_fields(fields, COURSE_FIELDS, COURSE_FIELDS))
+    return json_response(page, response)
 
 @router.get("/courses/{course_id}", response_model=Course)
-async def get_course(course_id: str, user = Depends(get_current_user)):
-    course = await db.courses.find_one({"id": course_id}, {"_id": 0})
+async def get_course(course_id: str, user = Depends(get_current_user), etag: str = Depends(catalog_etag())):
+    catalog = await get_catalog()
+    course = catalog.courses_by_id.get(course_id)
     if not course:
         raise HTTPException(status_code=404, detail="Course not found")
     return course
 
+@router.get("/courses/{course_id}/progress", response_model=CourseProgress)
+async def get_course_progress(course_id: str, user = Depends(get_current_user)):
+    """The user's progress on every video of a course, for the course sidebar"""
+    catalog = await get_catalog()
+    if course_id not in catalog.courses_by_id:
+        raise HTTPException(status_code=404, detail="Course not found")
+    video_ids = [v['id'] for v in catalog.videos_by_course.get(course_id, [])]
+    progress = await load_progress(user['id'], video_ids)
+    return {
+        "course_id": course_id,
+        "completed": sum(1 for p in progress.values() if p['completed']),
+        "total": len(video_ids),
+        "progress": progress
+    }
+
 # ==================== Video Routes ====================
 
-@router.get("/videos", response_model=List[Video])
-async def get_videos(course_id: Optional[str] = None, user = Depends(get_current_user)):
-    query = {"course_id": course_id} if course_id else {}
-    videos = await db.videos.find(query, {"_id": 0}).sort("order", 1).to_list(1000)
+@router.get("/videos", response_model=VideoSummaryPage)
+async def get_videos(response: Response, course_id: Optional[str] = None, fields: Optional[str] = None,
+                     limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+                     cursor: Optional[str] = None, user = Depends(get_current_user),
+                     etag: str = Depends(catalog_etag(signed_urls=True))):
+    """
+    Slim list items by default; `fields=` selects other Video fields (e.g.
+    description,topics). Paged in (course_id, order, id) order.
+    """
+    catalog = await get_catalog()
+    if course_id:
+        cached, keys = catalog.videos_by_course.get(course_id, []), catalog.course_video_keys.get(course_id, [])
+    else:
+        cached, keys = catalog.videos_by_key, catalog.video_keys
+    page = page_response(slice_after(cached, keys, cursor, limit), limit, video_key)
     
-    # Process URLs
-    for video in videos:
-        if 'url' in video:
-            video['url'] = get_video_url(video['url'])
+    # Projected copies - the cached documents are shared; only this page is signed
+    videos = page["items"] = project(page["items"], select_fields(fields, VIDEO_FIELDS, VIDEO_SUMMARY_FIELDS))
+    # Process URLs in one batch
+    with_url = [video for video in videos if 'url' in video]
+    for video, url in zip(with_url, await get_video_urls([v['url'] for v in with_url])):
+        video['url'] = url
             
-    return videos
+    return json_response(page, response)
 
 @router.get("/videos/{video_id}", response_model=Video)
-async def get_video(video_id: str, user = Depends(get_current_user)):
-    video = await db.videos.find_one({"id": video_id}, {"_id": 0})
+async def get_video(video_id: str, user = Depends(get_current_user),
+                    etag: str = Depends(catalog_etag(signed_urls=True))):
+    catalog = await get_catalog()
+    video = catalog.videos_by_id.get(video_id)
     if not video:
         raise HTTPException(status_code=404, detail="Video not found")
         
+    video = dict(video)
     if 'url' in video:
-        video['url'] = get_video_url(video['url'])
+        video['url'] = (await get_video_urls([video['url']]))[0]
         
     return video
 
+async def load_progress(user_id: str, video_ids: List[str]) -> Dict[str, dict]:
+    """
+    Progress of one user for many videos: one $in query on the (user_id,
+    video_id) index with unflushed heartbeats overlaid. Videos never watched
+    get a zero entry so callers can render every row.
+    """
+    video_ids = list(dict.fromkeys(video_ids))
+    stored = {
+        p['video_id']: p
+        async for p in db.user_progress.find(
+            {"user_id": user_id, "video_id": {"$in": video_ids}},
+            {"_id": 0, "video_id": 1, "watch_percentage": 1, "completed": 1, "timestamp": 1}
+        )
+    }
+    merged = progress_buffer.merge_into(user_id, stored)
+    progress = {}
+    for video_id in video_ids:
+        p = merged.get(video_id) or {}
+        progress[video_id] = {
+            "video_id": video_id,
+            "watch_percentage": p.get('watch_percentage', 0),
+            "completed": p.get('completed', False),
+            "timestamp": p.get('timestamp')
+        }
+    return progress
+
+@router.post("/videos/progress:batch", response_model=VideoProgressBatch)
+async def get_videos_progress(request: VideoProgressBatchRequest, user = Depends(get_current_user)):
+    """Progress for up to PAGE_SIZE_MAX videos in one request"""
+    if len(request.video_ids) > settings.PAGE_SIZE_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {settings.PAGE_SIZE_MAX} video_ids per request")
+    return {"progress": await load_progress(user['id'], request.video_ids)}
+
 @router.post("/videos/{video_id}/progress")
 async def update_video_progress(video_id: str, progress_data: VideoProgressUpdate, user = Depends(get_current_user)):
     progress_doc = {
@@ -60,17 +163,28 @@ async def update_video_progress(video_id: str, progress_data: VideoProgressUpdat
         "timestamp": datetime.now(timezone.utc).isoformat()
     }
     
-    await db.user_progress.update_one(
+    if not progress_data.completed:
+        # Heartbeats are coalesced and written in bulk
+        progress_buffer.add(progress_doc)
+        return {"success": True}
+    
+    # Completion bypasses the buffer so mastery stays correct
+    progress_buffer.discard(user['id'], video_id)
+    previous = await db.user_progress.find_one_and_update(
         {"user_id": user['id'], "video_id": video_id},
         {"$set": progress_doc},
-        upsert=True
+        projection={"_id": 0, "completed": 1},
+        upsert=True,
+        return_document=ReturnDocument.BEFORE
     )
     
-    # Update mastery scores if completed
-    if progress_data.completed:
-        video = await db.videos.find_one({"id": video_id}, {"_id": 0})
-        if video:
-            await update_mastery_scores_for_video(user['id'], video, score=80.0)  # Base score
+    # Side effects run after the response, through the job queue
+    recommendation_cache.invalidate(user['id'])
+    # Count the first completion in the user's stats
+    if not (previous and previous.get('completed', False)):
+        await job_queue.enqueue("record_completion", user_id=user['id'], video_id=video_id)
+    await job_queue.enqueue("update_mastery", user_id=user['id'], video_id=video_id, score=80.0,  # Base score
+                            initial_level=user.get('initial_level', 'Medium'))
     
     return {"success": True}
 
@@ -80,20 +194,26 @@ async def get_video_progress(video_id: str, user = Depends(get_current_user)):
         {"user_id": user['id'], "video_id": video_id},
         {"_id": 0}
     )
+    # Include a heartbeat that has not been flushed yet
+    if progress_buffer.get(user['id'], video_id):
+        progress = progress_buffer.merge_into(user['id'], {video_id: progress} if progress else {})[video_id]
     return progress if progress else {"watch_percentage": 0, "completed": False}
 
 # ==================== Quiz Routes ====================
 
 @router.get("/quizzes/{video_id}", response_model=Quiz)
-async def get_quiz(video_id: str, user = Depends(get_current_user)):
-    quiz = await db.quizzes.find_one({"video_id": video_id}, {"_id": 0})
+async def get_quiz(video_id: str, user = Depends(get_current_user), etag: str = Depends(catalog_etag())):
+    # From the catalog snapshot the ETag names, never a half-published ingest
+    catalog = await get_catalog()
+    quiz = catalog.quiz_by_video.get(video_id)
     if not quiz:
         raise HTTPException(status_code=404, detail="Quiz not found")
     return quiz
 
 @router.post("/quizzes/submit", response_model=QuizResult)
 async def submit_quiz(submission: QuizSubmission, user = Depends(get_current_user)):
-    quiz = await db.quizzes.find_one({"id": submission.quiz_id}, {"_id": 0})
+    catalog = await get_catalog()
+    quiz = catalog.quizzes_by_id.get(submission.quiz_id)
     if not quiz:
         raise HTTPException(status_code=404, detail="Quiz not found")
     
@@ -118,108 +238,61 @@ async def submit_quiz(submission: QuizSubmission, user = Depends(get_current_use
     
     await db.quiz_results.insert_one(result_doc)
     
-    # Update mastery scores based on quiz performance
-    video = await db.videos.find_one({"id": quiz['video_id']}, {"_id": 0})
-    if video:
-        # Use update_mastery_scores_for_video from services
-        await update_mastery_scores_for_video(user['id'], video, score)
+    # Stats and mastery (from quiz performance) are updated after the response
+    recommendation_cache.invalidate(user['id'])
+    await job_queue.enqueue("record_quiz", user_id=user['id'], result_id=result_id, score=score)
+    await job_queue.enqueue("update_mastery", user_id=user['id'], video_id=quiz['video_id'], score=score,
+                            initial_level=user.get('initial_level', 'Medium'))
     
     return QuizResult(**result_doc)
 
-import json
-import os
 from pathlib import Path
 
+DATA_DIR = Path(__file__).parent.parent / "data"
+
 @router.post("/init-data")
 async def initialize_data(force: bool = False):
-    """Initialize sample courses and videos with stable IDs from external JSON"""
+    """
+    Load courses and videos with stable IDs from data/initial_data.ndjson
+    (or .json), streamed into staging collections and published with one catalog version bump
+    """
     # Check if data exists
-    if force:
-        print("Forced re-initialization: clearing existing data...")
-        await db.courses.delete_many({})
-        await db.videos.delete_many({})
-        await db.quizzes.delete_many({})
-    else:
+    if not force:
         existing = await db.courses.count_documents({})
         if existing > 0:
             return {"message": "Data already initialized. Use force=true to override."}
     
-    # Load data from JSON file
-    data_path = Path(__file__).parent.parent / "data" / "initial_data.json"
-    if not data_path.exists():
+    data_path = next((p for p in (DATA_DIR / "initial_data.ndjson", DATA_DIR / "initial_data.json") if p.exists()), None)
+    if data_path is None:
         raise HTTPException(status_code=500, detail="Initial data file not found")
         
     try:
-        with open(data_path, "r") as f:
-            initial_data = json.load(f)
-            courses_data = initial_data.get("courses", [])
-            videos_data = initial_data.get("videos", [])
+        # The live catalog stays readable until the swap at the end
+        stats = await ingest_catalog(data_path)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error loading initial data: {str(e)}")
-
-    if courses_data:
-        await db.courses.insert_many(courses_data)
-    
-    if videos_data:
-        await db.videos.insert_many(videos_data)
     
-    # Generate and sample quizzes (1 per video)
-    quizzes_data = []
+    # Precompute embeddings (unchanged content carried over from the old catalog is skipped)
+    embedding_stats = None
+    if stats["videos"] and embedding_service.ready:
+        try:
+            embedding_stats = await embed_videos(model=embedding_service)
+            await export_embedding_store()
+            if embedding_stats["encoded"] or embedding_stats["repacked"]:
+                await bump_catalog_version()
+        except Exception as e:
+            print(f"Error embedding videos: {e}")
     
-    for video in videos_data:
-        quizzes_data.append({
-            "id": f"quiz-{video['id']}",
-            "video_id": video['id'],
-            "questions": [
-                {
-                    "question": f"What is the main topic of {video['title']}?",
-                    "options": [
-                        f"{video['topics'][0]}" if video['topics'] else "General",
-                        "Cooking",
-                        "History",
-                        "Music"
-                    ],
-                    "correct_answer": 0
-                },
-                {
-                    "question": "Which of the following is true regarding the content?",
-                    "options": [
-                        "It is unrelated to the course",
-                        "It covers advanced topics only",
-                        f"It discusses {video['description']}",
-                        "None of the above"
-                    ],
-                    "correct_answer": 2
-                },
-                {
-                    "question": "What is the difficulty level of this video?",
-                    "options": [
-                        "Impossible",
-                        video['difficulty'],
-                        "Very Easy",
-                        "Expert"
-                    ],
-                    "correct_answer": 1
-                },
-                {
-                    "question": "Which concept was mentioned?" ,
-                    "options": [
-                        "Quantum Physics",
-                        "Blockchain",
-                        video['topics'][0] if video['topics'] else "General",
-                        "Augmented Reality"
-                    ],
-                    "correct_answer": 2
-                }
-            ]
-        })
-        
-    if quizzes_data:
-        await db.quizzes.insert_many(quizzes_data)
+    await catalog_cache.reload()
     
     return {"message": "Data initialized successfully", "counts": {
-        "courses": len(courses_data),
-        "videos": len(videos_data),
-        "quizzes": len(quizzes_data)
-    }}
+        "courses": stats["courses"],
+        "videos": stats["videos"],
+        "quizzes": stats["quizzes"]
+    }, "ingest": stats, "embeddings": embedding_stats}
+
 
+@router.get("/catalog/stats")
+async def get_catalog_stats(user = Depends(get_current_user)):
+    """Catalog cache hit/miss and staleness counters for this worker"""
+    return catalog_cache.snapshot()
@@ -0,0 +1,25 @@
+from fastapi import APIRouter, Request, Response
+
+from ..config import settings
+from ..embedding_service import embedding_service
+from ..jobs import job_queue
+
+router = APIRouter(prefix="/health", tags=["health"])
+
+@router.get("/live")
+async def liveness():
+    """The process is up and the event loop is responsive"""
+    return {"status": "alive"}
+
+@router.get("/ready")
+async def readiness(request: Request, response: Response):
+    """
+    Ready once startup has finished. The SBERT model loads in the background;
+    it only gates readiness when READY_REQUIRES_MODEL is set.
+    """
+    startup = getattr(request.app.state, "startup", None)
+    ready = startup is not None and (embedding_service.ready or not settings.READY_REQUIRES_MODEL)
+    if not ready:
+        response.status_code = 503
+    return {"status": "ready" if ready else "starting", "startup": startup, "model": embedding_service.snapshot(),
+            "jobs": job_queue.snapshot()}
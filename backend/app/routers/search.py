@@ -0,0 +1,43 @@
+from fastapi import APIRouter, Depends, Query
+
+from ..config import settings
+from ..schemas import SearchResults, VideoSummary
+from ..dependencies import get_current_user
+from ..utils import get_video_urls
+from ..http_cache import json_response
+from ..search import search_service
+
+router = APIRouter(tags=["search"])
+
+VIDEO_SUMMARY_FIELDS = tuple(VideoSummary.model_fields)
+
+@router.get("/search", response_model=SearchResults)
+async def search_videos(q: str = Query(..., min_length=1, max_length=settings.SEARCH_MAX_QUERY_LENGTH),
+                        limit: int = Query(settings.SEARCH_LIMIT_DEFAULT, ge=1, le=settings.SEARCH_LIMIT_MAX),
+                        user = Depends(get_current_user)):
+    """
+    Videos matching `q`, best first: keyword (BM25) and semantic
+    (transcript embedding) rankings merged by reciprocal-rank fusion
+    """
+    videos, hits, semantic = await search_service.search(q)
+    hits = hits[:limit]
+
+    items = []
+    for hit in hits:
+        video = videos[hit.row]
+        items.append({
+            "video": {f: video[f] for f in VIDEO_SUMMARY_FIELDS if f in video},
+            "score": hit.score,
+            "keyword_rank": hit.keyword_rank,
+            "semantic_rank": hit.semantic_rank,
+        })
+    with_url = [item["video"] for item in items if 'url' in item["video"]]
+    for video, url in zip(with_url, await get_video_urls([v['url'] for v in with_url])):
+        video['url'] = url
+
+    return json_response({"query": q, "semantic": semantic, "items": items})
+
+@router.get("/search/stats")
+async def get_search_stats(user = Depends(get_current_user)):
+    """Search cache and index counters for this worker"""
+    return search_service.snapshot()
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, ConfigDict, EmailStr
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 class UserRegister(BaseModel):
     email: EmailStr
@@ -50,6 +50,26 @@ class Video(BaseModel):
     transcript: str
     order: int
 
+class VideoSummary(BaseModel):
+    """Default /videos list item; other Video fields are opt-in via `fields=`"""
+    model_config = ConfigDict(extra="ignore")
+    id: str
+    course_id: str
+    title: str
+    url: str
+    duration: int  # seconds
+    order: int
+
+class CoursePage(BaseModel):
+    items: List[Course]
+    limit: int
+    next_cursor: Optional[str] = None
+
+class VideoSummaryPage(BaseModel):
+    items: List[VideoSummary]
+    limit: int
+    next_cursor: Optional[str] = None
+
 class VideoProgress(BaseModel):
     user_id: str
     video_id: str
@@ -61,6 +81,23 @@ class VideoProgressUpdate(BaseModel):
     watch_percentage: float
     completed: bool
 
+class VideoProgressState(BaseModel):
+    video_id: str
+    watch_percentage: float
+    completed: bool
+    timestamp: Optional[str] = None  # None if never watched
+
+class VideoProgressBatchRequest(BaseModel):
+    video_ids: List[str]
+
+class VideoProgressBatch(BaseModel):
+    progress: Dict[str, VideoProgressState]  # by video_id
+
+class CourseProgress(VideoProgressBatch):
+    course_id: str
+    completed: int
+    total: int
+
 class QuizQuestion(BaseModel):
     question: str
     options: List[str]
@@ -92,7 +129,27 @@ class MasteryScore(BaseModel):
     score: float  # 0-100
     updated_at: str
 
+class MasteryScorePage(BaseModel):
+    items: List[MasteryScore]
+    limit: int
+    next_cursor: Optional[str] = None
+
 class NextVideoRecommendation(BaseModel):
     video: Video
     reason: str
     mastery_scores: dict
+
+class SimilarVideo(BaseModel):
+    video: Video
+    similarity: float
+
+class SearchResult(BaseModel):
+    video: VideoSummary
+    score: float  # reciprocal-rank fusion score
+    keyword_rank: Optional[int] = None
+    semantic_rank: Optional[int] = None
+
+class SearchResults(BaseModel):
+    query: str
+    semantic: bool  # False while the embedding model is loading (keyword matches only)
+    items: List[SearchResult]
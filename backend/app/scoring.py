@@ -0,0 +1,352 @@
+import asyncio
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+from .embeddings import video_text, unpack_embedding, quantize_int8
+from .embedding_store import dot_rows
+from .ann import IVFIndex
+from .config import settings
+
+DIFFICULTY_LEVELS = {'Easy': 1, 'Medium': 2, 'Hard': 3}
+
+# Reason codes, in the priority order the recommendation reasons are picked
+REASON_OPTIMAL = 1
+REASON_FOUNDATION = 2
+REASON_LEVEL_MATCH = 3
+REASON_NEXT_LEVEL = 4
+REASON_RELATED = 5
+REASON_SAME_COURSE = 6
+REASON_CONTINUE = 7
+
+PARTIAL_SCORE = 1000.0
+
+class ScoringEngine:
+    """
+    Catalog held in memory as precomputed arrays so that every candidate
+    video is scored at once instead of one at a time.
+    - embeddings: L2-normalized embedding matrix, shared via mmap when the
+      embedding store covers the catalog; embedding_rows maps videos to its rows.
+      Otherwise it is decoded to float32 once, or with EMBEDDING_COMPACT_MATRIX
+      held in EMBEDDING_FORMAT, with per-row embedding_scales for int8
+    - topic_rows/topic_cols: video x topic incidence matrix in coordinate form
+    - difficulty, order and course vectors
+    With ann=False no ANN index is built (batch scoring uses exact similarity).
+    """
+
+    def __init__(self, videos: List[dict], model=None, store=None, ann: bool = True):
+        self.videos = videos
+        self.size = len(videos)
+        self.ids = [v['id'] for v in videos]
+        self.index = {video_id: row for row, video_id in enumerate(self.ids)}
+
+        # Video x topic incidence matrix (duplicated topics count twice, like the loop did)
+        self.topics: List[str] = []
+        self.topic_index: Dict[str, int] = {}
+        rows, cols = [], []
+        for row, video in enumerate(videos):
+            for topic in video.get('topics', []):
+                col = self.topic_index.setdefault(topic, len(self.topics))
+                if col == len(self.topics):
+                    self.topics.append(topic)
+                rows.append(row)
+                cols.append(col)
+        self.topic_rows = np.array(rows, dtype=np.int64)
+        self.topic_cols = np.array(cols, dtype=np.int64)
+        self.topic_counts = np.bincount(self.topic_rows, minlength=self.size)
+        self.first_topic = [v['topics'][0] if v.get('topics') else None for v in videos]
+
+        # Difficulty, order and course vectors
+        self.difficulty = np.array([v.get('difficulty') for v in videos], dtype=object)
+        self.difficulty_level = np.array(
+            [DIFFICULTY_LEVELS.get(v.get('difficulty'), 2) for v in videos], dtype=np.int64
+        )
+        self.order = np.array([v.get('order', 0) for v in videos], dtype=np.float64)
+        self.course_ids: List[str] = []
+        course_index: Dict[str, int] = {}
+        codes = []
+        for video in videos:
+            course_id = video.get('course_id')
+            if course_id not in course_index:
+                course_index[course_id] = len(self.course_ids)
+                self.course_ids.append(course_id)
+            codes.append(course_index[course_id])
+        self.course_codes = np.array(codes, dtype=np.int64)
+
+        self.embeddings, self.embedding_scales, self.embedding_rows = self._build_embeddings(model, store)
+
+        # Approximate nearest-neighbour index, only worth building for large catalogs
+        self.ann = None
+        self.catalog_rows = None
+        if self.embeddings is not None:
+            known = self.embedding_rows >= 0
+            self.catalog_rows = np.full(len(self.embeddings), -1, dtype=np.int64)
+            self.catalog_rows[self.embedding_rows[known]] = np.flatnonzero(known)
+            if ann and known.sum() >= settings.ANN_MIN_VECTORS:
+                self.ann = IVFIndex(self.embeddings, ids=self.embedding_rows[known], scales=self.embedding_scales)
+
+    def _build_embeddings(self, model, store):
+        """
+        Returns (matrix, scales, rows): a normalized embedding matrix, its int8
+        row scales (None for float matrices) and, per catalog video, its row in
+        that matrix (-1 when unknown). When the shared store covers the whole
+        catalog its memory-mapped matrix is used as-is.
+        """
+        no_rows = np.full(self.size, -1, dtype=np.int64)
+        if not self.size:
+            return None, None, no_rows
+
+        if store is not None and store.available:
+            store_rows = np.array([store.index.get(video_id, -1) for video_id in self.ids], dtype=np.int64)
+            if (store_rows >= 0).all():
+                return store.matrix, None, store_rows
+        else:
+            store = None
+
+        vectors: List[Optional[np.ndarray]] = [None] * self.size
+        missing = []
+        for row, video in enumerate(self.videos):
+            stored = store.get(video['id']) if store is not None else None
+            if stored is not None:
+                vectors[row] = np.asarray(stored, dtype=np.float32)
+            elif 'embedding' in video:
+                vectors[row] = unpack_embedding(video['embedding'])
+            else:
+                missing.append(row)
+
+        if missing and model is not None:
+            try:
+                encoded = model.encode([video_text(self.videos[row]) for row in missing])
+                for row, vector in zip(missing, encoded):
+                    vectors[row] = np.asarray(vector, dtype=np.float32)
+            except Exception as e:
+                print(f"Error encoding catalog embeddings: {e}")
+
+        dim = next((len(v) for v in vectors if v is not None), 0)
+        if not dim:
+            return None, None, no_rows
+
+        fmt = settings.EMBEDDING_FORMAT if settings.EMBEDDING_COMPACT_MATRIX else "float32"
+        matrix = np.zeros((self.size, dim), dtype={"float16": np.float16, "int8": np.int8}.get(fmt, np.float32))
+        scales = np.ones(self.size, dtype=np.float32) if fmt == "int8" else None
+        rows = no_rows
+        for row, vector in enumerate(vectors):
+            if vector is not None and len(vector) == dim:
+                norm = np.linalg.norm(vector)
+                if norm > 0:
+                    if scales is not None:
+                        quantized, scale = quantize_int8(vector / norm)
+                        matrix[row], scales[row] = quantized[0], scale[0]
+                    else:
+                        matrix[row] = vector / norm
+                    rows[row] = row
+        return matrix, scales, rows
+
+    def embedding_vector(self, matrix_row: int) -> np.ndarray:
+        """One row of the embedding matrix as float32"""
+        vector = np.asarray(self.embeddings[matrix_row], dtype=np.float32)
+        if self.embedding_scales is not None:
+            vector = vector * self.embedding_scales[matrix_row]
+        return vector
+
+    def _row_scales(self, matrix_rows=None) -> Optional[np.ndarray]:
+        if self.embedding_scales is None:
+            return None
+        return self.embedding_scales if matrix_rows is None else self.embedding_scales[matrix_rows]
+
+    def similarity_to(self, row: int, rows: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        """
+        Cosine similarity of every video to the video at `row` (NaN when unknown).
+        With a `rows` mask only those videos are scored.
+        """
+        if self.embeddings is None or self.embedding_rows[row] < 0:
+            return None
+        query = self.embedding_vector(self.embedding_rows[row])
+        known = self.embedding_rows >= 0
+        similarity = np.full(self.size, np.nan, dtype=np.float32)
+        if rows is None:
+            all_similarity = dot_rows(self.embeddings, query, scales=self._row_scales())
+            similarity[known] = all_similarity[self.embedding_rows[known]]
+        else:
+            targets = np.flatnonzero(rows & known)
+            matrix_rows = self.embedding_rows[targets]
+            similarity[targets] = dot_rows(self.embeddings[matrix_rows], query, scales=self._row_scales(matrix_rows))
+        return similarity
+
+    def nearest(self, row: int, k: int, nprobe: Optional[int] = None) -> List[Tuple[int, float]]:
+        """The k videos most similar to the video at `row`, as (row, similarity), best first"""
+        if self.embeddings is None or self.embedding_rows[row] < 0 or k <= 0:
+            return []
+        results = self.nearest_vector(self.embedding_vector(self.embedding_rows[row]), k + 1, nprobe)
+        return [(r, sim) for r, sim in results if r != row][:k]
+
+    def nearest_vector(self, query: np.ndarray, k: int, nprobe: Optional[int] = None) -> List[Tuple[int, float]]:
+        """The k videos most similar to an L2-normalized query vector, as (row, similarity), best first"""
+        if self.embeddings is None or k <= 0:
+            return []
+        if self.ann is not None:
+            matrix_rows, sims = self.ann.search(query, k, nprobe or settings.ANN_NPROBE)
+            results = [(int(self.catalog_rows[m]), float(sim)) for m, sim in zip(matrix_rows, sims)]
+            return [(r, sim) for r, sim in results if r >= 0]
+
+        known = np.flatnonzero(self.catalog_rows >= 0)
+        sims = dot_rows(self.embeddings, query, scales=self._row_scales())[known]
+        rows = self.catalog_rows[known]
+        if k < len(rows):
+            part = np.argpartition(-sims, k - 1)[:k]
+            # Keep every row tied with the k-th similarity so ties stay in catalog order
+            keep = np.flatnonzero(sims >= sims[part].min())
+            rows, sims = rows[keep], sims[keep]
+        order = np.lexsort((rows, -sims))[:k]
+        return [(int(rows[i]), float(sims[i])) for i in order]
+
+    def _prefilter(self, last_row: int, partial: np.ndarray, open_rows: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Candidate pool for large catalogs: ANN neighbours of the last watched
+        video, its course and partially watched videos. None when the pool
+        holds no open candidate, so the caller scores the whole catalog.
+        """
+        pool = self.course_codes == self.course_codes[last_row]
+        pool |= partial
+        neighbours = self.nearest(last_row, settings.ANN_PREFILTER_CANDIDATES)
+        pool[[r for r, _ in neighbours]] = True
+        return pool if (pool & open_rows).any() else None
+
+    def score(self, mastery: Dict[str, float], initial_level, watched: Dict[str, dict],
+              last_video_id: Optional[str] = None, use_similarity: bool = True):
+        """
+        Score every video for one user.
+        Returns (scores, reason_codes, candidate_mask) arrays aligned with self.videos.
+        """
+        n = self.size
+        scores = np.zeros(n, dtype=np.float64)
+        reasons = np.zeros(n, dtype=np.int64)
+
+        completed = np.zeros(n, dtype=bool)
+        partial = np.zeros(n, dtype=bool)
+        for video_id, progress in watched.items():
+            row = self.index.get(video_id)
+            if row is None:
+                continue
+            if progress.get('completed', False):
+                completed[row] = True
+            else:
+                partial[row] = True
+
+        def add_reason(mask, code):
+            # Only the first reason that applies to a video is kept
+            reasons[(reasons == 0) & mask] = code
+
+        # 1. Mastery-based scoring (40% weight)
+        has_topics = self.topic_counts > 0
+        if mastery:
+            topic_mastery = np.array([mastery.get(t, 0) for t in self.topics], dtype=np.float64)
+            totals = np.bincount(self.topic_rows, weights=topic_mastery[self.topic_cols], minlength=n)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                avg_mastery = np.where(has_topics, totals / np.maximum(self.topic_counts, 1), 0.0)
+            optimal = has_topics & (avg_mastery >= 40) & (avg_mastery <= 70)
+            foundation = has_topics & (avg_mastery < 40)
+            above = has_topics & ~optimal & ~foundation
+            scores += 40 * optimal + 30 * foundation + 20 * above
+            add_reason(optimal, REASON_OPTIMAL)
+            add_reason(foundation, REASON_FOUNDATION)
+            no_mastery_branch = ~has_topics
+        else:
+            no_mastery_branch = np.ones(n, dtype=bool)
+
+        # No mastery data yet - prioritize content at the user's level
+        level_match = no_mastery_branch & (self.difficulty == initial_level)
+        scores += 35 * level_match
+        add_reason(level_match, REASON_LEVEL_MATCH)
+
+        # 2. Difficulty progression (20% weight)
+        user_level = DIFFICULTY_LEVELS.get(initial_level, 2)
+        next_level = self.difficulty_level == user_level + 1
+        scores += 20 * (self.difficulty_level == user_level)
+        scores += 15 * next_level
+        scores += 10 * (self.difficulty_level == user_level - 1)
+        add_reason(next_level, REASON_NEXT_LEVEL)
+
+        last_row = self.index.get(last_video_id) if last_video_id else None
+
+        # 3. Semantic similarity (30% weight)
+        pool = None
+        if last_row is not None and use_similarity:
+            if self.ann is not None:
+                pool = self._prefilter(last_row, partial, ~completed)
+            similarity = self.similarity_to(last_row, pool)
+            if similarity is not None:
+                known = ~np.isnan(similarity)
+                scores += np.where(known, similarity, 0).astype(np.float64) * 30
+                with np.errstate(invalid='ignore'):
+                    add_reason(known & (similarity > 0.7), REASON_RELATED)
+
+        # 4. Sequential ordering (10% weight)
+        early = self.order < 10
+        scores += np.where(early, 10 - self.order, 0)
+
+        # 5. Course consistency (High priority)
+        if last_row is not None:
+            same_course = self.course_codes == self.course_codes[last_row]
+            scores += 100 * same_course
+            add_reason(same_course, REASON_SAME_COURSE)
+
+        # Partially watched videos always come first
+        scores[partial] = PARTIAL_SCORE
+        reasons[partial] = REASON_CONTINUE
+
+        candidates = ~completed if pool is None else ~completed & pool
+        return scores, reasons, candidates
+
+    def top_k(self, scores: np.ndarray, candidates: np.ndarray, k: int = 1) -> List[int]:
+        """
+        Rows of the k best candidates, highest score first.
+        Ties keep catalog order, matching a stable sort over the whole catalog.
+        """
+        rows = np.flatnonzero(candidates)
+        if not len(rows) or k <= 0:
+            return []
+        candidate_scores = scores[rows]
+        if k < len(rows):
+            part = np.argpartition(-candidate_scores, k - 1)[:k]
+            # Keep every row tied with the k-th score so tie-breaking stays exact
+            keep = np.flatnonzero(candidate_scores >= candidate_scores[part].min())
+            rows, candidate_scores = rows[keep], candidate_scores[keep]
+        ranked = np.lexsort((rows, -candidate_scores))[:k]
+        return rows[ranked].tolist()
+
+    def reason_text(self, row: int, code: int, initial_level, watched: Dict[str, dict],
+                    last_video: Optional[dict] = None) -> str:
+        video = self.videos[row]
+        if code == REASON_CONTINUE:
+            return f"Continue watching '{video['title']}' ({watched[video['id']]['watch_percentage']:.0f}% completed)"
+        if code == REASON_OPTIMAL:
+            return f"Optimal challenge level for {self.first_topic[row]}"
+        if code == REASON_FOUNDATION:
+            return f"Build foundation in {self.first_topic[row]}"
+        if code == REASON_LEVEL_MATCH:
+            return f"Matches your {initial_level} level"
+        if code == REASON_NEXT_LEVEL:
+            return "Next difficulty level"
+        if code == REASON_RELATED and last_video:
+            return f"Related to '{last_video['title']}'"
+        if code == REASON_SAME_COURSE and last_video:
+            return f"Continue in '{last_video.get('course_id', 'this course')}'"
+        return f"Learn {video['title']}"
+
+# Engine cache, rebuilt when the catalog version, model or embedding store changes
+_engine: Optional[ScoringEngine] = None
+_engine_key = None
+_engine_lock = asyncio.Lock()
+
+async def get_scoring_engine(catalog, model=None, store=None) -> ScoringEngine:
+    """Return the engine for the cached catalog, building it off the event loop if needed"""
+    global _engine, _engine_key
+    if store is not None:
+        store.refresh()
+    key = (catalog.version, model is not None, store.version if store is not None else None)
+    if _engine is None or _engine_key != key:
+        async with _engine_lock:
+            if _engine is None or _engine_key != key:
+                _engine = await asyncio.to_thread(ScoringEngine, catalog.videos, model, store)
+                _engine_key = key
+    return _engine
@@ -0,0 +1,219 @@
+import asyncio
+import re
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import numpy as np
+
+from .config import settings
+from .cache import TTLCache, SingleFlight
+from .embeddings import normalize_rows
+from .embedding_service import embedding_service
+from .catalog import catalog_cache
+from .recommendation_cache import load_catalog_engine
+
+TOKEN_PATTERN = re.compile(r"\w+")
+# Frequent words whose postings would cover most of the catalog for little ranking value
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have in is it its of on or so that the this to was we were "
+    "what when which will with you your".split()
+)
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+def normalize_query(query: str) -> str:
+    """Cache key for a query: lowercased, whitespace collapsed"""
+    return " ".join(query.lower().split())
+
+def searchable_text(video: dict) -> str:
+    return " ".join([video.get('title', ''), " ".join(video.get('topics', [])),
+                     video.get('description', ''), video.get('transcript', '')])
+
+def _ranked(rows: np.ndarray, scores: np.ndarray, k: int) -> np.ndarray:
+    """The k best rows, highest score first, ties in catalog order"""
+    if k < len(rows):
+        part = np.argpartition(-scores, k - 1)[:k]
+        keep = np.flatnonzero(scores >= scores[part].min())
+        rows, scores = rows[keep], scores[keep]
+    return rows[np.lexsort((rows, -scores))[:k]]
+
+class KeywordIndex:
+    """
+    In-process BM25 inverted index over video titles, topics, descriptions
+    and transcripts. Postings are laid out contiguously per term (rows of
+    the videos containing it, ascending) next to their BM25 term-frequency
+    factors, which are precomputed at build time, so a query only scales
+    each posting list by its idf and adds it to a score vector.
+    """
+
+    def __init__(self, videos: List[dict], k1: float = 1.2, b: float = 0.75):
+        self.size = len(videos)
+        self.terms: Dict[str, int] = {}
+        doc_terms, doc_freqs = [], []
+        lengths = np.zeros(self.size, dtype=np.float32)
+        for row, video in enumerate(videos):
+            counts = Counter(TOKEN_PATTERN.findall(searchable_text(video).lower()))
+            for stopword in STOPWORDS.intersection(counts):
+                del counts[stopword]
+            lengths[row] = sum(counts.values())
+            doc_terms.append(np.fromiter((self.terms.setdefault(t, len(self.terms)) for t in counts),
+                                         dtype=np.int64, count=len(counts)))
+            doc_freqs.append(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+
+        term_ids = np.concatenate(doc_terms) if doc_terms else np.empty(0, dtype=np.int64)
+        freqs = np.concatenate(doc_freqs) if doc_freqs else np.empty(0, dtype=np.float32)
+        doc_rows = np.repeat(np.arange(self.size, dtype=np.int32), [len(t) for t in doc_terms])
+        # Stable, so rows stay ascending within each posting list
+        order = np.argsort(term_ids, kind="stable")
+        self.rows = doc_rows[order]
+        doc_freq = np.bincount(term_ids, minlength=len(self.terms))
+        self.offsets = np.concatenate(([0], np.cumsum(doc_freq)))
+
+        average = lengths.mean() if self.size else 0.0
+        norms = k1 * (1 - b + b * lengths / average) if average > 0 else np.full(self.size, k1, dtype=np.float32)
+        tf = freqs[order]
+        self.weights = (tf * (k1 + 1) / (tf + norms[self.rows])).astype(np.float32)
+        self.idf = np.log1p((self.size - doc_freq + 0.5) / (doc_freq + 0.5)).astype(np.float32)
+
+    def search(self, query: str, k: int) -> np.ndarray:
+        """Rows of the k best BM25 matches, best first"""
+        term_ids = {self.terms[t] for t in tokenize(query) if t in self.terms}
+        if not term_ids or k <= 0:
+            return np.empty(0, dtype=np.int64)
+        scores = np.zeros(self.size, dtype=np.float32)
+        for term in term_ids:
+            start, end = self.offsets[term], self.offsets[term + 1]
+            scores[self.rows[start:end]] += self.idf[term] * self.weights[start:end]
+        matched = np.flatnonzero(scores)
+        return _ranked(matched, scores[matched], k)
+
+def reciprocal_rank_fusion(rankings: List[List[int]], k: int) -> List[Tuple[int, float, List[Optional[int]]]]:
+    """
+    Merge rankings by RRF: each row scores sum(1 / (k + rank)) over the
+    rankings it appears in (ranks from 1). Returns (row, score, rank in each
+    ranking or None), best first, ties in catalog order.
+    """
+    fused: Dict[int, float] = {}
+    ranks: Dict[int, List[Optional[int]]] = {}
+    for i, ranking in enumerate(rankings):
+        for rank, row in enumerate(ranking, 1):
+            fused[row] = fused.get(row, 0.0) + 1.0 / (k + rank)
+            ranks.setdefault(row, [None] * len(rankings))[i] = rank
+    return [(row, fused[row], ranks[row]) for row in sorted(fused, key=lambda row: (-fused[row], row))]
+
+class SearchHit(NamedTuple):
+    row: int
+    score: float
+    keyword_rank: Optional[int]
+    semantic_rank: Optional[int]
+
+class SearchService:
+    """
+    Hybrid video search: BM25 over the catalog text and embedding
+    similarity of the query to the transcript embeddings the scoring engine
+    already holds (through its ANN index on large catalogs), merged by
+    reciprocal-rank fusion. Query embeddings are kept in an LRU (they never
+    change for a model) and fused results in a TTL'd LRU keyed by catalog
+    version. Until the model is ready, search is keyword-only.
+    """
+
+    def __init__(self, candidates: int, rrf_k: int, embedding_cache_size: int,
+                 result_cache_size: int, result_ttl: float):
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+        self._index: Optional[KeywordIndex] = None
+        self._index_version: Optional[int] = None
+        self._index_lock = asyncio.Lock()
+        self._rebuild: Optional[asyncio.Task] = None
+        self._embeddings = TTLCache(embedding_cache_size)
+        self._results = TTLCache(result_cache_size, ttl=result_ttl)
+        self._embedding_flight = SingleFlight()
+        self.stats = {"queries": 0, "keyword_only": 0, "embedding_errors": 0}
+
+    async def keyword_index(self, version: int, videos: List[dict]) -> KeywordIndex:
+        """The BM25 index for a catalog version, built off the event loop when the version changes"""
+        if self._index_version != version:
+            async with self._index_lock:
+                if self._index_version != version:
+                    self._index = await asyncio.to_thread(KeywordIndex, videos)
+                    self._index_version = version
+        return self._index
+
+    async def query_vector(self, query: str) -> Optional[np.ndarray]:
+        """Normalized embedding of a (normalized) query, None if it cannot be encoded"""
+        vector = self._embeddings.get(query)
+        if vector is not None:
+            return vector
+        try:
+            encoded = await self._embedding_flight.do(query, lambda: embedding_service.embed([query]))
+        except Exception as e:
+            self.stats["embedding_errors"] += 1
+            print(f"Error embedding search query: {e}")
+            return None
+        vector = normalize_rows(encoded[0])
+        self._embeddings.set(query, vector)
+        return vector
+
+    async def search(self, query: str) -> Tuple[List[dict], List[SearchHit], bool]:
+        """(catalog videos the hit rows refer to, fused hits best first, whether embedding similarity was used)"""
+        query = normalize_query(query)
+        catalog, engine = await load_catalog_engine()
+        # The engine's video list and this version stay consistent even if the catalog reloads meanwhile
+        version, videos = catalog.version, engine.videos
+        semantic = embedding_service.ready and engine.embeddings is not None
+        self.stats["queries"] += 1
+        if not semantic:
+            self.stats["keyword_only"] += 1
+
+        if not query:
+            return videos, [], semantic
+        key = (version, semantic, query)
+        hits = self._results.get(key)
+        if hits is not None:
+            return videos, hits, semantic
+
+        index = await self.keyword_index(version, videos)
+        keyword = index.search(query, self.candidates).tolist()
+        similar = []
+        if semantic:
+            vector = await self.query_vector(query)
+            if vector is None:
+                semantic = False
+            else:
+                similar = [row for row, _ in engine.nearest_vector(vector, self.candidates)]
+
+        fused = reciprocal_rank_fusion([keyword, similar], self.rrf_k)
+        hits = [SearchHit(row, score, *ranks) for row, score, ranks in fused]
+        if key[1] == semantic:
+            # A keyword-only fallback after an encoding error is not cached as the hybrid result
+            self._results.set(key, hits)
+        return videos, hits, semantic
+
+    def on_catalog_reload(self, version: int):
+        """Rebuild the BM25 index for the new catalog in the background, if this worker has served searches"""
+        if self._index is not None and (self._rebuild is None or self._rebuild.done()):
+            self._rebuild = asyncio.create_task(self._prebuild(version, catalog_cache.videos))
+
+    async def _prebuild(self, version: int, videos: List[dict]):
+        try:
+            await self.keyword_index(version, videos)
+        except Exception as e:
+            print(f"Error building search index: {e}")
+
+    def snapshot(self) -> dict:
+        return {
+            **self.stats,
+            "index_version": self._index_version,
+            "terms": len(self._index.terms) if self._index is not None else 0,
+            "embedding_cache": self._embeddings.snapshot(),
+            "result_cache": self._results.snapshot(),
+        }
+
+search_service = SearchService(
+    settings.SEARCH_CANDIDATES,
+    rrf_k=settings.SEARCH_RRF_K,
+    embedding_cache_size=settings.SEARCH_EMBEDDING_CACHE_SIZE,
+    result_cache_size=settings.SEARCH_RESULT_CACHE_SIZE,
+    result_ttl=settings.SEARCH_RESULT_CACHE_TTL_SECONDS
+)
+catalog_cache.add_reload_listener(search_service.on_catalog_reload)
@@ -1,28 +1,94 @@
 from datetime import datetime, timezone
+from typing import Iterable, List, Optional, Tuple
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
 from .database import db
+from .jobs import job_queue
+from .catalog import get_catalog
+from .user_stats import record_completion, record_quiz
+from .recommendation_cache import recommendation_cache
 
-async def update_mastery_scores_for_video(user_id: str, video: dict, score: float):
-    """Update mastery scores for all topics in a video"""
-    for topic in video.get('topics', []):
-        # Get current mastery
-        current = await db.mastery_scores.find_one(
-            {"user_id": user_id, "topic": topic},
-            {"_id": 0}
-        )
-        
-        if current:
+# Ids of the latest jobs applied to a mastery document; replays come soon after the first run
+APPLIED_JOBS_KEPT = 20
+
+def _mastery_update(user_id: str, topic: str, score: float, updated_at: str,
+                    job_id: Optional[str] = None) -> UpdateOne:
+    """
+    Upsert for one topic; the weighted average is computed by the server in
+    the same update. With a job_id, an update already applied by that job
+    leaves the document unchanged.
+    """
+    fields = {
+        "user_id": {"$literal": user_id},
+        "topic": {"$literal": topic},
+        "score": {"$cond": [
+            {"$eq": [{"$type": "$score"}, "missing"]},
+            # Start at 80% of quiz score
+            score * 0.8,
             # Weighted average: 70% old, 30% new
-            new_score = (current['score'] * 0.7) + (score * 0.3)
-        else:
-            new_score = score * 0.8  # Start at 80% of quiz score
-        
-        await db.mastery_scores.update_one(
-            {"user_id": user_id, "topic": topic},
-            {"$set": {
-                "user_id": user_id,
-                "topic": topic,
-                "score": new_score,
-                "updated_at": datetime.now(timezone.utc).isoformat()
-            }},
-            upsert=True
-        )
+            {"$add": [{"$multiply": ["$score", 0.7]}, score * 0.3]}
+        ]},
+        "updated_at": {"$literal": updated_at}
+    }
+    if job_id is not None:
+        applied_jobs = {"$ifNull": ["$applied_jobs", []]}
+        applied = {"$in": [{"$literal": job_id}, applied_jobs]}
+        fields["applied_jobs"] = {"$slice": [{"$concatArrays": [applied_jobs, [{"$literal": job_id}]]},
+                                             -APPLIED_JOBS_KEPT]}
+        for name in ("score", "updated_at", "applied_jobs"):
+            fields[name] = {"$cond": [applied, f"${name}", fields[name]]}
+    return UpdateOne({"user_id": user_id, "topic": topic}, [{"$set": fields}], upsert=True)
+
+async def _apply_mastery_updates(operations: List[UpdateOne]):
+    if not operations:
+        return
+    try:
+        # Ordered, so repeated topics are applied one after another like sequential updates
+        await db.mastery_scores.bulk_write(operations, ordered=True)
+    except BulkWriteError as e:
+        errors = e.details.get('writeErrors', [])
+        if not errors or errors[0].get('code') != 11000:
+            raise
+        # Lost an upsert race for a new topic: the document exists now, so
+        # re-running the remaining operations applies them as updates
+        await db.mastery_scores.bulk_write(operations[errors[0]['index']:], ordered=True)
+
+async def update_mastery_scores_for_video(user_id: str, video: dict, score: float, job_id: Optional[str] = None):
+    """Update mastery scores for all topics in a video (one atomic round trip), once per job_id"""
+    updated_at = datetime.now(timezone.utc).isoformat()
+    await _apply_mastery_updates([
+        _mastery_update(user_id, topic, score, updated_at, job_id)
+        for topic in video.get('topics', [])
+    ])
+
+async def update_mastery_scores_for_videos(user_id: str, results: Iterable[Tuple[dict, float]]):
+    """Apply several (video, score) results in order with a single bulk_write, e.g. for batch replays"""
+    updated_at = datetime.now(timezone.utc).isoformat()
+    await _apply_mastery_updates([
+        _mastery_update(user_id, topic, score, updated_at)
+        for video, score in results
+        for topic in video.get('topics', [])
+    ])
+
+# ---------- Post-write side effects, run by the job queue ----------
+# One job per effect, so a retry never repeats an effect that already succeeded.
+# Each handler is idempotent: stats count a video or quiz result once, and
+# mastery records the job id with the update it applies.
+
+@job_queue.handler("record_completion")
+async def record_completion_job(user_id: str, video_id: str):
+    catalog = await get_catalog()
+    await record_completion(user_id, video_id, catalog.videos_by_id.get(video_id))
+
+@job_queue.handler("record_quiz")
+async def record_quiz_job(user_id: str, result_id: str, score: float):
+    await record_quiz(user_id, result_id, score)
+
+@job_queue.handler("update_mastery", pass_job_id=True)
+async def update_mastery_job(job_id: str, user_id: str, video_id: str, score: float, initial_level: str):
+    """Mastery for the video's topics, then the user's recommendations that depend on it"""
+    catalog = await get_catalog()
+    video = catalog.videos_by_id.get(video_id)
+    if video:
+        await update_mastery_scores_for_video(user_id, video, score, job_id)
+    recommendation_cache.refresh(user_id, initial_level)
@@ -0,0 +1,183 @@
+import asyncio
+import hashlib
+import re
+import threading
+import time
+from typing import Dict, Optional
+import firebase_admin
+import jwt
+import requests
+from cryptography.x509 import load_pem_x509_certificate
+from firebase_admin import auth as firebase_auth
+
+from .cache import TTLCache
+from .metrics import timed
+from .config import settings
+
+ID_TOKEN_CERT_URI = 'https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com'
+ID_TOKEN_ISSUER_PREFIX = 'https://securetoken.google.com/'
+
+class StaticKeySet:
+    """Fixed {kid: public key} set - a local stand-in for Google's certificates"""
+
+    def __init__(self, keys: Dict[str, object]):
+        self.keys = dict(keys)
+
+    def get(self, kid: str):
+        return self.keys.get(kid)
+
+    def fetch(self):
+        pass
+
+    async def run_refresh(self):
+        pass
+
+class GooglePublicKeys:
+    """
+    Google's ID token signing certificates, fetched ahead of time and
+    refreshed in the background before their Cache-Control max-age runs out,
+    so verification never waits on an HTTP round trip.
+    """
+
+    def __init__(self, url: str = ID_TOKEN_CERT_URI, timeout: float = 10.0):
+        self.url = url
+        self.timeout = timeout
+        self.keys: Dict[str, object] = {}
+        self.expires_at = 0.0
+
+    def get(self, kid: str):
+        return self.keys.get(kid)
+
+    def fetch(self):
+        """Download and parse the current certificates (blocking)"""
+        response = requests.get(self.url, timeout=self.timeout)
+        response.raise_for_status()
+        certs = response.json()
+        self.keys = {
+            kid: load_pem_x509_certificate(pem.encode('utf-8')).public_key()
+            for kid, pem in certs.items()
+        }
+        match = re.search(r'max-age=(\d+)', response.headers.get('Cache-Control', ''))
+        self.expires_at = time.time() + (int(match.group(1)) if match else 3600)
+
+    async def run_refresh(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.fetch)
+                # Refresh well before Google rotates the keys
+                delay = max(60.0, (self.expires_at - time.time()) * 0.8)
+            except Exception as e:
+                print(f"Error fetching Firebase public keys: {e}")
+                delay = 30.0
+            await asyncio.sleep(delay)
+
+class TokenVerifier:
+    """
+    Verifies Firebase ID tokens off the event loop and keeps already-verified
+    tokens in a bounded cache keyed by token hash until their `exp`.
+    A token with an unknown `kid` refetches the key set at most once per
+    `refetch_interval`; concurrent requests wait for the same fetch, and
+    within the interval unknown `kid`s are rejected without fetching.
+    """
+
+    def __init__(self, key_set, project_id: Optional[str] = None, cache_size: int = 10000,
+                 refetch_interval: float = 60.0):
+        self.key_set = key_set
+        self._project_id = project_id
+        self.cache = TTLCache(cache_size)
+        self.refetch_interval = refetch_interval
+        self._fetch_lock = threading.Lock()
+        self._last_fetch = float("-inf")
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    @property
+    def project_id(self) -> Optional[str]:
+        if self._project_id is None:
+            try:
+                self._project_id = firebase_admin.get_app().project_id
+            except ValueError:
+                return None
+        return self._project_id
+
+    async def verify(self, token: str) -> dict:
+        key = hashlib.sha256(token.encode('utf-8')).hexdigest()
+        claims = self.cache.get(key)
+        if claims is not None:
+            return claims
+        with timed("verify_id_token"):
+            claims = await asyncio.to_thread(self._verify_sync, token)
+        self.cache.set(key, claims, expires_at=claims['exp'])
+        return claims
+
+    def _verify_sync(self, token: str) -> dict:
+        # The Auth emulator issues unsigned tokens; let firebase_admin handle them
+        if self.key_set is None or self.project_id is None or settings.FIREBASE_AUTH_EMULATOR_HOST:
+            return firebase_auth.verify_id_token(token)
+
+        try:
+            header = jwt.get_unverified_header(token)
+        except jwt.InvalidTokenError as e:
+            raise firebase_auth.InvalidIdTokenError(str(e), cause=e)
+        kid = header.get('kid')
+        if header.get('alg') != 'RS256' or not kid:
+            raise firebase_auth.InvalidIdTokenError('Firebase ID token must be RS256-signed with a "kid" header')
+
+        public_key = self.key_set.get(kid)
+        if public_key is None:
+            # Keys may have rotated since the last background refresh
+            self._refetch_keys()
+            public_key = self.key_set.get(kid)
+            if public_key is None:
+                raise firebase_auth.InvalidIdTokenError(f'Firebase ID token has an unknown "kid": {kid}')
+
+        try:
+            claims = jwt.decode(
+                token,
+                public_key,
+                algorithms=['RS256'],
+                audience=self.project_id,
+                issuer=ID_TOKEN_ISSUER_PREFIX + self.project_id,
+                options={'require': ['exp', 'iat', 'sub']},
+            )
+        except jwt.ExpiredSignatureError as e:
+            raise firebase_auth.ExpiredIdTokenError(str(e), cause=e)
+        except jwt.InvalidTokenError as e:
+            raise firebase_auth.InvalidIdTokenError(str(e), cause=e)
+
+        subject = claims.get('sub')
+        if not isinstance(subject, str) or not subject or len(subject) > 128:
+            raise firebase_auth.InvalidIdTokenError('Firebase ID token has an invalid "sub" claim')
+        claims['uid'] = subject
+        return claims
+
+    def _refetch_keys(self):
+        """Refetch the key set unless a fetch started within the last refetch_interval (blocking)"""
+        # Callers arriving during a fetch wait for it here, then fall inside the interval
+        with self._fetch_lock:
+            if time.monotonic() - self._last_fetch < self.refetch_interval:
+                return
+            self._last_fetch = time.monotonic()
+            try:
+                self.key_set.fetch()
+            except Exception as e:
+                raise firebase_auth.CertificateFetchError(str(e), cause=e)
+
+    def start(self):
+        """Prefetch public keys and keep them fresh in the background"""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self.key_set.run_refresh())
+
+    async def stop(self):
+        if self._refresh_task and not self._refresh_task.done():
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+
+token_verifier = TokenVerifier(
+    GooglePublicKeys(),
+    project_id=settings.FIREBASE_PROJECT_ID,
+    cache_size=settings.TOKEN_CACHE_SIZE,
+    refetch_interval=settings.TOKEN_KEY_REFETCH_INTERVAL_SECONDS,
+)
@@ -0,0 +1,173 @@
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from pymongo import ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from .database import db
+
+# Materialized per-user counters behind /analytics/progress, a fixed-size document:
+# {user_id, completed_videos, total_quizzes, quiz_score_sum, course_completed: {course_id: n}, version}
+# Each counted completion and quiz result also has a marker in
+# user_stats_markers, {user_id, kind: "video" | "quiz", marker: id}, unique
+# per key, so it counts once however often its job runs and whether or not
+# a rebuild already counted it. `version` changes on every write, so a
+# rebuild never overwrites an increment that landed after it read the history.
+
+KIND_VIDEO = "video"
+KIND_QUIZ = "quiz"
+REBUILD_ATTEMPTS = 3
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+async def _increment(user_id: str, kind: str, marker: str, inc: dict) -> bool:
+    """Apply `inc` if `marker` has not been counted yet; True if it was applied"""
+    try:
+        await db.user_stats_markers.insert_one({"user_id": user_id, "kind": kind, "marker": marker})
+    except DuplicateKeyError:
+        return False
+    try:
+        await db.user_stats.update_one(
+            {"user_id": user_id},
+            {"$inc": {**inc, "version": 1}, "$set": {"updated_at": _now()}},
+            upsert=True
+        )
+    except Exception:
+        # Let a retry of the job count it
+        await db.user_stats_markers.delete_one({"user_id": user_id, "kind": kind, "marker": marker})
+        raise
+    return True
+
+async def record_completion(user_id: str, video_id: str, video: Optional[dict]):
+    """Count a video the user has completed, once"""
+    inc = {"completed_videos": 1}
+    if video and video.get('course_id'):
+        inc[f"course_completed.{video['course_id']}"] = 1
+    return await _increment(user_id, KIND_VIDEO, video_id, inc)
+
+async def record_quiz(user_id: str, result_id: str, score: float):
+    """Count a quiz result, once"""
+    return await _increment(user_id, KIND_QUIZ, result_id, {"total_quizzes": 1, "quiz_score_sum": score})
+
+async def rebuild_user_stats(user_id: Optional[str] = None, attempt: int = 1) -> int:
+    """
+    Recompute stats documents from user_progress and quiz_results with
+    aggregation pipelines (one user, or everyone when user_id is None).
+    A document counted into since its version was read is rebuilt again.
+    Returns the number of documents written.
+    """
+    match = {"user_id": user_id} if user_id else {}
+    # Versions before reading the history; each replace only applies if its version is unchanged
+    versions = {doc['user_id']: doc.get('version')
+                async for doc in db.user_stats.find(match, {"_id": 0, "user_id": 1, "version": 1})}
+
+    completion_pipeline = [
+        {"$match": {**match, "completed": True}},
+        {"$lookup": {"from": "videos", "localField": "video_id", "foreignField": "id", "as": "video"}},
+        {"$group": {
+            "_id": {"user_id": "$user_id", "course_id": {"$arrayElemAt": ["$video.course_id", 0]}},
+            "completed": {"$sum": 1},
+            "video_ids": {"$push": "$video_id"}
+        }},
+        {"$group": {
+            "_id": "$_id.user_id",
+            "completed_videos": {"$sum": "$completed"},
+            "courses": {"$push": {"course_id": "$_id.course_id", "completed": "$completed"}},
+            "video_ids": {"$push": "$video_ids"}
+        }}
+    ]
+    quiz_pipeline = [
+        {"$match": match},
+        {"$group": {"_id": "$user_id", "total_quizzes": {"$sum": 1}, "quiz_score_sum": {"$sum": "$score"},
+                    "result_ids": {"$push": "$id"}}}
+    ]
+
+    stats: Dict[str, dict] = {}
+
+    def stats_for(uid: str) -> dict:
+        return stats.setdefault(uid, {
+            "user_id": uid,
+            "completed_videos": 0,
+            "total_quizzes": 0,
+            "quiz_score_sum": 0,
+            "course_completed": {},
+            "rebuilt": True,
+        })
+
+    markers: List[UpdateOne] = []
+
+    def mark(uid: str, kind: str, ids: List[str]):
+        marker_keys = ({"user_id": uid, "kind": kind, "marker": marker} for marker in ids)
+        markers.extend(UpdateOne(key, {"$setOnInsert": key}, upsert=True) for key in marker_keys)
+
+    async for row in db.user_progress.aggregate(completion_pipeline):
+        doc = stats_for(row['_id'])
+        doc['completed_videos'] = row['completed_videos']
+        doc['course_completed'] = {c['course_id']: c['completed'] for c in row['courses'] if c.get('course_id')}
+        mark(row['_id'], KIND_VIDEO, [video_id for video_ids in row['video_ids'] for video_id in video_ids])
+
+    async for row in db.quiz_results.aggregate(quiz_pipeline):
+        doc = stats_for(row['_id'])
+        doc['total_quizzes'] = row['total_quizzes']
+        doc['quiz_score_sum'] = row['quiz_score_sum']
+        mark(row['_id'], KIND_QUIZ, row['result_ids'])
+
+    if user_id:
+        # Users without any history still get a document so they are not rebuilt again
+        stats_for(user_id)
+
+    # Everything counted here is marked before the counters are written, so
+    # its pending job (if any) does not count it again
+    for start in range(0, len(markers), 1000):
+        try:
+            await db.user_stats_markers.bulk_write(markers[start:start + 1000], ordered=False)
+        except BulkWriteError as e:
+            # Concurrent upserts of the same marker; it exists either way
+            if any(error.get('code') != 11000 for error in e.details.get('writeErrors', [])):
+                raise
+
+    now = _now()
+    operations: List[ReplaceOne] = []
+    batch_users: List[str] = []
+    conflicts: List[str] = []
+    written = 0
+
+    async def write():
+        nonlocal written
+        try:
+            await db.user_stats.bulk_write(operations, ordered=False)
+            written += len(operations)
+        except BulkWriteError as e:
+            # A changed version no longer matches, so the upsert collides with the existing document
+            errors = e.details.get('writeErrors', [])
+            if any(error.get('code') != 11000 for error in errors):
+                raise
+            conflicts.extend(batch_users[error['index']] for error in errors)
+            written += len(operations) - len(errors)
+
+    for doc in stats.values():
+        version = versions.get(doc['user_id'])
+        doc['updated_at'] = now
+        doc['version'] = (version or 0) + 1
+        operations.append(ReplaceOne({"user_id": doc['user_id'], "version": version}, doc, upsert=True))
+        batch_users.append(doc['user_id'])
+        if len(operations) >= 1000:
+            await write()
+            operations, batch_users = [], []
+    if operations:
+        await write()
+
+    for uid in conflicts:
+        if attempt < REBUILD_ATTEMPTS:
+            written += await rebuild_user_stats(uid, attempt + 1)
+        else:
+            print(f"Gave up rebuilding stats for {uid} after {attempt} conflicting writes")
+    return written
+
+async def get_user_stats(user_id: str) -> dict:
+    """Single indexed read; documents not yet built from history are rebuilt first"""
+    stats = await db.user_stats.find_one({"user_id": user_id}, {"_id": 0})
+    if not stats or not stats.get('rebuilt'):
+        await rebuild_user_stats(user_id)
+        stats = await db.user_stats.find_one({"user_id": user_id}, {"_id": 0})
+    return stats or {}
@@ -1,45 +1,147 @@
+import asyncio
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone, timedelta
-from typing import Optional
+from typing import List, Optional, Tuple
 import jwt
 import bcrypt
 from firebase_admin import storage
 from .config import settings
+from .cache import TTLCache
+from .metrics import timed
 
-def get_video_url(url_or_path: str) -> str:
-    """
-    Transforms a stored video path into a usable URL.
-    - If it's already a full URL (http/https), returns it as is.
-    - If it's a gs:// URI, extracts the path.
-    - If it's a storage path, generates a signed URL.
-    """
-    if not url_or_path:
-        return ""
-    
+SIGNED_URL_LIFETIME = timedelta(hours=1)
+
+class FirebaseUrlSigner:
+    """Signs blob paths in the default Firebase Storage bucket"""
+
+    def sign(self, blob_path: str, expiration: timedelta) -> str:
+        bucket = storage.bucket()
+        blob = bucket.blob(blob_path)
+        return blob.generate_signed_url(expiration=expiration)
+
+class LocalUrlSigner:
+    """Fake signer for tests and benchmarks: no network, optional simulated latency"""
+
+    def __init__(self, base_url: str = "http://localhost:9199/storage", latency: float = 0.0):
+        self.base_url = base_url
+        self.latency = latency
+        self.calls = 0
+
+    def sign(self, blob_path: str, expiration: timedelta) -> str:
+        if self.latency:
+            time.sleep(self.latency)
+        self.calls += 1
+        expires = int(time.time() + expiration.total_seconds())
+        signature = hashlib.sha256(f"{blob_path}:{expires}".encode('utf-8')).hexdigest()[:32]
+        return f"{self.base_url}/{blob_path}?Expires={expires}&Signature={signature}"
+
+def _blob_path(url_or_path: str) -> Optional[str]:
+    """Storage path to sign, or None when the value should be returned as is"""
     if url_or_path.startswith(('http://', 'https://')):
-        return url_or_path
+        return None
     
     # Handle gs:// format
-    blob_path = url_or_path
     if url_or_path.startswith('gs://'):
         # Format: gs://bucket-name/path/to/file
-        try:
-            parts = url_or_path.replace('gs://', '').split('/', 1)
-            if len(parts) == 2:
-                # We ignore the bucket part if we are using the default bucket
-                blob_path = parts[1]
-            else:
-                return url_or_path
-        except Exception:
-            pass
-            
+        parts = url_or_path.replace('gs://', '').split('/', 1)
+        if len(parts) != 2:
+            return None
+        # We ignore the bucket part if we are using the default bucket
+        return parts[1]
+    
     # Assume it's a path in Firebase Storage
-    try:
-        bucket = storage.bucket()
-        blob = bucket.blob(blob_path)
-        return blob.generate_signed_url(expiration=timedelta(hours=1))
-    except Exception as e:
-        print(f"Error generating signed URL for {url_or_path}: {e}")
-        return url_or_path
+    return url_or_path
+
+class SignedUrlCache:
+    """
+    Reuses a signed URL per blob path until `refresh_margin` before it expires.
+    Misses in a batch are signed concurrently in a thread pool, off the event loop;
+    the cache itself is only touched by the calling thread.
+    """
+
+    def __init__(self, signer, lifetime: timedelta, refresh_margin: float, maxsize: int, workers: int):
+        self.signer = signer
+        self.lifetime = lifetime
+        self.refresh_margin = refresh_margin
+        self.cache = TTLCache(maxsize)
+        self.workers = workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="url-signer")
+        return self._executor
+
+    def _sign(self, blob_path: str) -> Tuple[Optional[str], float]:
+        """(signed URL or None on error, when to stop reusing it) - safe to run on any thread"""
+        signed_at = time.time()
+        try:
+            with timed("generate_signed_url"):
+                url = self.signer.sign(blob_path, self.lifetime)
+        except Exception as e:
+            print(f"Error generating signed URL for {blob_path}: {e}")
+            return None, signed_at
+        return url, signed_at + self.lifetime.total_seconds() - self.refresh_margin
+
+    def _store(self, blob_path: str, url: Optional[str], expires_at: float) -> Optional[str]:
+        if url is not None:
+            self.cache.set(blob_path, url, expires_at=expires_at)
+        return url
+
+    def get(self, url_or_path: str) -> str:
+        """Signed URL for one value (blocking on a miss)"""
+        if not url_or_path:
+            return ""
+        blob_path = _blob_path(url_or_path)
+        if blob_path is None:
+            return url_or_path
+        return self.cache.get(blob_path) or self._store(blob_path, *self._sign(blob_path)) or url_or_path
+
+    async def get_many(self, urls_or_paths: List[str]) -> List[str]:
+        """Signed URLs for a batch, signing the distinct misses concurrently"""
+        paths = [_blob_path(u) if u else None for u in urls_or_paths]
+        resolved = {p: self.cache.get(p) for p in set(paths) if p is not None}
+        missing = [p for p, url in resolved.items() if url is None]
+        if missing:
+            loop = asyncio.get_running_loop()
+            signed = await asyncio.gather(*[
+                loop.run_in_executor(self.executor, self._sign, p) for p in missing
+            ])
+            # Cached here on the event loop; TTLCache is not thread-safe
+            resolved.update((p, self._store(p, url, expires_at)) for p, (url, expires_at) in zip(missing, signed))
+        return [
+            (resolved.get(p) or u) if p is not None else (u or "")
+            for u, p in zip(urls_or_paths, paths)
+        ]
+
+signed_urls = SignedUrlCache(
+    FirebaseUrlSigner(),
+    lifetime=SIGNED_URL_LIFETIME,
+    refresh_margin=settings.SIGNED_URL_REFRESH_MARGIN_SECONDS,
+    maxsize=settings.SIGNED_URL_CACHE_SIZE,
+    workers=settings.SIGNED_URL_WORKERS,
+)
+
+def set_url_signer(signer):
+    """Swap the signing backend (e.g. LocalUrlSigner in tests and benchmarks)"""
+    signed_urls.signer = signer
+    signed_urls.cache.clear()
+
+def get_video_url(url_or_path: str) -> str:
+    """
+    Transforms a stored video path into a usable URL.
+    - If it's already a full URL (http/https), returns it as is.
+    - If it's a gs:// URI, extracts the path.
+    - If it's a storage path, returns a cached or freshly signed URL.
+    """
+    return signed_urls.get(url_or_path)
+
+async def get_video_urls(urls_or_paths: List[str]) -> List[str]:
+    """Batch version of get_video_url that signs cache misses off the event loop"""
+    return await signed_urls.get_many(urls_or_paths)
 
 def hash_password(password: str) -> str:
     return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
@@ -0,0 +1,29 @@
+import argparse
+import asyncio
+import os
+import sys
+
+# Setup path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.indexes import ensure_indexes, audit_query_plans
+
+async def run(create: bool):
+    if create:
+        await ensure_indexes()
+    await audit_query_plans()
+
+def main():
+    parser = argparse.ArgumentParser(description="Check with explain() that every registered query shape uses an index")
+    parser.add_argument("--no-create", action="store_true", help="Only audit, do not create missing indexes first")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(run(create=not args.no_create))
+    except RuntimeError as e:
+        print(e, flush=True)
+        sys.exit(1)
+    print("All query shapes are served by an index", flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+import argparse
+import asyncio
+import os
+import sys
+
+# Setup path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.config import settings
+from app.batch_recommender import run_batch_recommendations
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute next-video recommendations for every user")
+    parser.add_argument("--workers", type=int, default=settings.BATCH_RECOMMENDER_WORKERS,
+                        help="Scoring processes (0 scores in a thread of this process)")
+    parser.add_argument("--chunk-users", type=int, default=settings.BATCH_RECOMMENDER_CHUNK_USERS)
+    parser.add_argument("--top-n", type=int, default=settings.RECOMMENDATION_TOP_N)
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint of an interrupted run")
+    args = parser.parse_args()
+
+    stats = asyncio.run(run_batch_recommendations(
+        workers=args.workers, chunk_users=args.chunk_users, top_n=args.top_n, restart=args.restart
+    ))
+    print(f"Done: {stats['users']} users ({stats['written']} written, {stats['skipped_newer']} newer online) "
+          f"in {stats['seconds']}s ({stats['users_per_second']} users/s)", flush=True)
+
+if __name__ == "__main__":
+    main()
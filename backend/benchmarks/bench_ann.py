@@ -0,0 +1,106 @@
+"""
+Recall@k and latency of the IVF index against exact search, swept over
+nprobe. Queries are held out of the index (drawn from the same clusters),
+and the default --spread of 1.5 makes the clusters overlap, so neighbours
+are not trivially in the query's own list.
+
+    python benchmarks/bench_ann.py --sizes 10000 100000 1000000
+
+Results (1 CPU, 384-dim float32, 100 queries, k=10, --spread 1.5):
+
+       n   lists  build    exact p50/p95      nprobe  ivf p50/p95     recall@10
+     10k    100    0.7s    0.75 / 1.02ms         1   0.09 / 0.18ms    0.456
+                                                 4   0.17 / 0.26ms    0.922
+                                                 8   0.22 / 0.39ms    0.997
+                                                16   0.52 / 0.85ms    1.000
+    100k    316    4.4s   18.3 / 23.4ms          1   0.34 / 0.54ms    0.851
+                                                 2   0.42 / 0.74ms    0.995
+                                                 4   0.78 / 1.16ms    1.000
+                                                 8   1.16 / 1.88ms    1.000
+      1M   1000   19.2s    208 / 238ms           1   0.68 / 1.23ms    0.824
+                                                 4   2.11 / 3.03ms    0.857
+                                                 8   3.93 / 5.05ms    0.870
+                                                16   9.17 / 11.4ms    0.879
+                                                32   30.8 / 36.5ms    0.889
+
+At 1M recall levels off below 0.9: about 13% of the true neighbours sit in
+lists ranked beyond the 32nd centroid, because k-means trains 1000 lists
+on a 50k sample (50 points per list) and scatters each cluster across
+several lists. Larger `sample_size` or fewer `n_lists` trade build time for
+recall there.
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+# Setup path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.ann import IVFIndex, exact_search
+
+def synthetic_embeddings(n: int, dim: int, clusters: int, dtype, rng, spread: float = 0.6) -> np.ndarray:
+    """
+    Clustered unit vectors, closer to real sentence embeddings than uniform
+    noise. `spread` scales the within-cluster noise against the centers; at
+    1.0 and above clusters overlap heavily.
+    """
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    vectors = np.empty((n, dim), dtype=dtype)
+    chunk = 100000
+    for start in range(0, n, chunk):
+        size = min(chunk, n - start)
+        block = centers[rng.integers(0, clusters, size)] + spread * rng.normal(size=(size, dim)).astype(np.float32)
+        block /= np.linalg.norm(block, axis=1, keepdims=True)
+        vectors[start:start + size] = block
+    return vectors
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q) * 1000)
+
+def run(n: int, args, rng):
+    # Queries are held out of the index: drawn from the same clusters, never catalog points
+    data = synthetic_embeddings(n + args.queries, args.dim, max(16, n // 500), np.dtype(args.dtype), rng, args.spread)
+    vectors, queries = data[:n], data[n:].astype(np.float32)
+
+    started = time.perf_counter()
+    index = IVFIndex(vectors)
+    build_seconds = time.perf_counter() - started
+
+    exact_times, truths = [], []
+    for query in queries:
+        started = time.perf_counter()
+        truth, _ = exact_search(vectors, query, args.k)
+        exact_times.append(time.perf_counter() - started)
+        truths.append(set(truth.tolist()))
+    print(f"{n:>9} vectors | lists {index.n_lists:>5} | build {build_seconds:7.2f}s | "
+          f"exact p50 {percentile_ms(exact_times, 50):8.2f}ms p95 {percentile_ms(exact_times, 95):8.2f}ms", flush=True)
+
+    for nprobe in args.nprobe:
+        ann_times, recalls = [], []
+        for query, truth in zip(queries, truths):
+            started = time.perf_counter()
+            found, _ = index.search(query, args.k, nprobe)
+            ann_times.append(time.perf_counter() - started)
+            recalls.append(len(truth & set(found.tolist())) / args.k)
+        print(f"{'':>9}   nprobe {nprobe:>4} | ivf p50 {percentile_ms(ann_times, 50):7.2f}ms "
+              f"p95 {percentile_ms(ann_times, 95):7.2f}ms | recall@{args.k} {np.mean(recalls):.3f}", flush=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the IVF index against exact search")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--dtype", default="float32", choices=["float32", "float16"])
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--spread", type=float, default=1.5, help="Within-cluster noise (higher = less separable)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    for n in args.sizes:
+        run(n, args, rng)
+
+if __name__ == "__main__":
+    main()
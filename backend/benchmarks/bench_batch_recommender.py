@@ -0,0 +1,95 @@
+"""
+Batch recommender scoring vs. the per-user engine path on a synthetic
+catalog and user base: users/s for each, and how often the top-N lists
+(videos and reasons) agree. Ties broken by float rounding in the
+similarity product can differ.
+
+    python benchmarks/bench_batch_recommender.py --videos 5000 --users 2000 --chunk-users 256
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+# Setup path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.scoring import ScoringEngine
+from app.batch_recommender import score_users, catalog_embeddings
+from bench_ann import synthetic_embeddings
+
+LEVELS = ["Easy", "Medium", "Hard"]
+
+def synthetic_catalog(n: int, dim: int, topics: int, rng):
+    vectors = synthetic_embeddings(n, dim, max(16, n // 200), np.float32, rng)
+    return [{
+        "id": f"v{i:06d}",
+        "course_id": f"c{i // 20:05d}",
+        "title": f"Video {i}",
+        "difficulty": LEVELS[rng.integers(3)],
+        "topics": [f"t{t}" for t in rng.choice(topics, rng.integers(1, 4), replace=False)],
+        "order": i % 20 + 1,
+        "embedding": vectors[i].tolist(),
+    } for i in range(n)]
+
+def synthetic_users(n: int, videos, topics: int, rng):
+    users = []
+    for u in range(n):
+        mastery = {f"t{t}": float(rng.uniform(0, 100)) for t in rng.choice(topics, rng.integers(0, 12), replace=False)}
+        progress = {}
+        for row in rng.choice(len(videos), rng.integers(0, 30), replace=False):
+            video_id = videos[row]['id']
+            progress[video_id] = {"video_id": video_id, "completed": bool(rng.random() < 0.7),
+                                  "watch_percentage": float(rng.uniform(0, 100)),
+                                  "timestamp": f"2024-01-01T00:{rng.integers(60):02d}:{rng.integers(60):02d}"}
+        users.append((f"u{u:07d}", LEVELS[rng.integers(3)], mastery, progress))
+    return users
+
+def per_user(engine, users, top_n):
+    results = []
+    for user_id, level, mastery, progress in users:
+        last = max(progress.values(), key=lambda x: x.get('timestamp', '')) if progress else None
+        last_video = engine.videos[engine.index[last['video_id']]] if last else None
+        scores, reasons, candidates = engine.score(mastery, level, progress,
+                                                   last_video_id=last['video_id'] if last else None)
+        results.append([(engine.ids[row], engine.reason_text(row, reasons[row], level, progress, last_video))
+                        for row in engine.top_k(scores, candidates, k=top_n)])
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batch recommendation scoring")
+    parser.add_argument("--videos", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--topics", type=int, default=300)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--chunk-users", type=int, default=256)
+    parser.add_argument("--top-n", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    videos = synthetic_catalog(args.videos, args.dim, args.topics, rng)
+    users = synthetic_users(args.users, videos, args.topics, rng)
+    engine = ScoringEngine(videos, ann=False)
+    embeddings = catalog_embeddings(engine)
+    print(f"{args.videos} videos, {len(engine.topics)} topics, {args.users} users, top-{args.top_n}")
+
+    started = time.perf_counter()
+    reference = per_user(engine, users, args.top_n)
+    per_user_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    batch = []
+    for start in range(0, len(users), args.chunk_users):
+        docs = score_users(engine, embeddings, users[start:start + args.chunk_users], 1, args.top_n)
+        batch.extend([(item['video_id'], item['reason']) for item in doc['items']] for doc in docs)
+    batch_seconds = time.perf_counter() - started
+
+    agree = np.mean([a == b for a, b in zip(reference, batch)])
+    top1 = np.mean([a[:1] == b[:1] for a, b in zip(reference, batch)])
+    print(f"  per-user engine.score: {per_user_seconds:7.2f}s ({args.users / per_user_seconds:8.0f} users/s)")
+    print(f"  batch (1 process):     {batch_seconds:7.2f}s ({args.users / batch_seconds:8.0f} users/s)")
+    print(f"  identical top-{args.top_n}: {agree:.4f}, identical top-1: {top1:.4f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Cold-start cost: importing the app vs. the SBERT import + model load that
+used to block startup, each measured in a fresh interpreter. With --serve it
+also starts uvicorn and polls /health/live and /health/ready.
+
+    python benchmarks/bench_cold_start.py
+    python benchmarks/bench_cold_start.py --serve --port 8099
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_APP = """
+import time
+started = time.perf_counter()
+import app.main
+print(time.perf_counter() - started)
+"""
+
+LOAD_MODEL = """
+import time
+started = time.perf_counter()
+from app.database import load_sbert_model
+load_sbert_model()
+print(time.perf_counter() - started)
+"""
+
+def time_in_subprocess(code: str) -> float:
+    result = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else "subprocess failed")
+    return float(result.stdout.strip().splitlines()[-1])
+
+def wait_for(url: str, timeout: float) -> float:
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        try:
+            with urllib.request.urlopen(url, timeout=1):
+                return time.perf_counter() - started
+        except (urllib.error.URLError, ConnectionError, OSError):
+            time.sleep(0.05)
+    raise TimeoutError(url)
+
+def serve(port: int, timeout: float):
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port)],
+        cwd=BACKEND_DIR, env={**os.environ, "READY_REQUIRES_MODEL": "true"},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        live = wait_for(f"http://127.0.0.1:{port}/health/live", timeout)
+        print(f"  /health/live after:          {live:8.2f} s")
+        wait_for(f"http://127.0.0.1:{port}/health/ready", timeout)
+        print(f"  /health/ready (model) after: {time.perf_counter() - started:8.2f} s")
+    finally:
+        server.terminate()
+        server.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark application cold start")
+    parser.add_argument("--serve", action="store_true", help="Also start uvicorn and poll the health endpoints")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--timeout", type=float, default=300)
+    args = parser.parse_args()
+
+    app_import = time_in_subprocess(IMPORT_APP)
+    print(f"  import app.main:             {app_import:8.2f} s")
+    try:
+        model_load = time_in_subprocess(LOAD_MODEL)
+        print(f"  SBERT import + load:         {model_load:8.2f} s  (previously blocked startup)")
+    except RuntimeError as e:
+        print(f"  SBERT import + load:         unavailable ({e})")
+
+    if args.serve:
+        serve(args.port, args.timeout)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Stored embedding formats (float32 / float16 / int8): bytes per document,
+resident matrix memory, decode time from BSON binary, scoring time and
+ranking agreement with float32. Compact formats are scored both as a
+compact matrix (EMBEDDING_COMPACT_MATRIX) and decoded to a float32 matrix
+once (the default).
+
+    python benchmarks/bench_embedding_formats.py --vectors 50000 --queries 200
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import bson
+
+# Setup path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.embeddings import EMBEDDING_FORMATS, pack_embedding, decode_embedding, normalize_rows
+from app.embedding_store import dot_rows
+from app.ann import exact_search
+from bench_ann import synthetic_embeddings
+
+def decode_matrix(docs, dim: int, fmt: str):
+    """What the engine does with stored documents: frombuffer each row into a matrix of the stored type"""
+    matrix = np.empty((len(docs), dim), dtype={"float16": np.float16, "int8": np.int8}.get(fmt, np.float32))
+    scales = np.empty(len(docs), dtype=np.float32) if fmt == "int8" else None
+    for row, doc in enumerate(docs):
+        vector, scale = decode_embedding(doc)
+        matrix[row] = vector
+        if scales is not None:
+            scales[row] = scale
+    return matrix, scales
+
+def top_k(matrix, scales, query, k):
+    scores = dot_rows(matrix, query, scales=scales)
+    top = np.argpartition(-scores, k)[:k]
+    return top[np.argsort(-scores[top])]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark compact embedding formats")
+    parser.add_argument("--vectors", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = normalize_rows(synthetic_embeddings(args.vectors, args.dim, max(16, args.vectors // 500), np.float32, rng))
+    queries = vectors[rng.choice(args.vectors, args.queries, replace=False)]
+    reference = [exact_search(vectors, query, args.k)[0] for query in queries]
+    print(f"{args.vectors} vectors x {args.dim} dims, {args.queries} queries, top-{args.k}")
+    print(f"  {'format':15} {'bytes/doc':>10} {'matrix MB':>10} {'decode s':>9} {'score ms':>9} "
+          f"{'recall@k':>9} {'top-1':>7}")
+    # "list" is the original storage: a list of Python floats in each video document
+    for fmt in ("list",) + EMBEDDING_FORMATS:
+        if fmt == "list":
+            docs = [vector.tolist() for vector in vectors]
+        else:
+            docs = [pack_embedding(vector, fmt) for vector in vectors]
+        doc_bytes = len(bson.encode({"embedding": docs[0]}))
+
+        started = time.perf_counter()
+        matrix, scales = decode_matrix(docs, args.dim, fmt)
+        decode_seconds = time.perf_counter() - started
+        variants = [(fmt if matrix.dtype == np.float32 else f"{fmt}/compact", matrix, scales, decode_seconds)]
+        if matrix.dtype != np.float32:
+            started = time.perf_counter()
+            working = matrix.astype(np.float32)
+            if scales is not None:
+                working *= scales[:, None]
+            variants.append((f"{fmt}/f32", working, None, decode_seconds + time.perf_counter() - started))
+
+        for label, matrix, scales, seconds in variants:
+            memory = matrix.nbytes + (scales.nbytes if scales is not None else 0)
+            started = time.perf_counter()
+            results = [top_k(matrix, scales, query, args.k) for query in queries]
+            score_ms = (time.perf_counter() - started) / args.queries * 1000
+
+            recall = np.mean([len(set(r) & set(e)) / args.k for r, e in zip(results, reference)])
+            top1 = np.mean([r[0] == e[0] for r, e in zip(results, reference)])
+            print(f"  {label:15} {doc_bytes:10d} {memory / 2**20:10.1f} {seconds:9.2f} {score_ms:9.2f} "
+                  f"{recall:9.4f} {top1:7.3f}")
+
+if __name__ == "__main__":
+    main()
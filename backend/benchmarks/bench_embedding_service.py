@@ -0,0 +1,85 @@
+"""
+On-the-fly encoding: one model.encode call per request (the old behaviour)
+vs. the dynamic-batching embedding service, for concurrent single-text
+requests.
+
+    python benchmarks/bench_embedding_service.py --requests 2000 --concurrency 64 --workers 2
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# Setup path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import settings
+from app.embedding_service import EmbeddingService
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the dynamic-batching embedding service")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64, help="Requests in flight at once")
+    parser.add_argument("--workers", type=int, default=settings.EMBEDDING_SERVICE_WORKERS)
+    parser.add_argument("--max-batch", type=int, default=settings.EMBEDDING_SERVICE_MAX_BATCH)
+    parser.add_argument("--max-wait-ms", type=float, default=settings.EMBEDDING_SERVICE_MAX_WAIT_MS)
+    args = parser.parse_args()
+
+    texts = [f"lecture {i} on topic {i % 97} covering worked examples" for i in range(args.requests)]
+
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(settings.SBERT_MODEL_NAME)
+    model.encode(texts[:1])
+
+    async def unbatched():
+        # Old path: each handler calls encode itself, serialized on one thread
+        lock = asyncio.Lock()
+
+        async def one(text):
+            async with lock:
+                model.encode([text])
+
+        started = time.perf_counter()
+        await run_concurrently(one)
+        return time.perf_counter() - started
+
+    async def run_concurrently(fn):
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def limited(text):
+            async with semaphore:
+                await fn(text)
+
+        await asyncio.gather(*[limited(text) for text in texts])
+
+    async def batched():
+        service = EmbeddingService(settings.SBERT_MODEL_NAME, args.workers, args.max_batch, args.max_wait_ms / 1000)
+        service.start()
+        while not service.ready:
+            if service.state["status"] == "failed":
+                raise RuntimeError(service.state["error"])
+            await asyncio.sleep(0.05)
+
+        async def one(text):
+            await service.embed([text])
+
+        started = time.perf_counter()
+        await run_concurrently(one)
+        elapsed = time.perf_counter() - started
+        snapshot = service.snapshot()
+        await service.stop()
+        return elapsed, snapshot
+
+    serial = asyncio.run(unbatched())
+    batch, snapshot = asyncio.run(batched())
+
+    print(f"{args.requests} single-text requests, {args.concurrency} in flight, "
+          f"{args.workers} workers, max batch {args.max_batch}, max wait {args.max_wait_ms}ms")
+    print(f"  one encode per request: {serial:8.2f} s  {args.requests / serial:9.1f} texts/s")
+    print(f"  embedding service:      {batch:8.2f} s  {args.requests / batch:9.1f} texts/s")
+    print(f"  mean batch size {snapshot['mean_batch_size']:.1f}, queue wait p50 {snapshot['queue_wait_ms']['p50']:.1f}ms "
+          f"p95 {snapshot['queue_wait_ms']['p95']:.1f}ms max {snapshot['queue_wait_ms']['max']:.1f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Streaming catalog ingestion: writes a synthetic NDJSON or JSON catalog file
+and ingests it through the staging-and-swap path (needs MongoDB).
+
+    python benchmarks/bench_ingest.py --videos 100000 --format ndjson
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+
+# Setup path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.ingest import ingest_catalog
+
+def synthetic_catalog(videos: int, per_course: int):
+    for c in range(0, videos, per_course):
+        course_id = f"bench-course-{c // per_course}"
+        yield "course", {"id": course_id, "title": f"Course {c // per_course}", "description": "Synthetic course",
+                         "difficulty": "Medium", "topics": [f"topic-{c % 50}"], "thumbnail": "",
+                         "video_count": min(per_course, videos - c)}
+        for i in range(c, min(c + per_course, videos)):
+            yield "video", {"id": f"bench-video-{i}", "course_id": course_id, "title": f"Video {i}",
+                            "description": f"Lecture {i} with worked examples", "url": "", "duration": 600,
+                            "difficulty": ["Easy", "Medium", "Hard"][i % 3], "topics": [f"topic-{i % 50}"],
+                            "transcript": f"Transcript of lecture {i} " * 20, "order": i - c}
+
+def write_file(path: str, videos: int, per_course: int, fmt: str):
+    with open(path, "w") as f:
+        if fmt == "ndjson":
+            for kind, doc in synthetic_catalog(videos, per_course):
+                f.write(json.dumps({"type": kind, **doc}) + "\n")
+            return
+        # {"courses": [...], "videos": [...]} written without building it in memory
+        f.write('{"courses": [')
+        first = True
+        for kind, doc in synthetic_catalog(videos, per_course):
+            if kind == "course":
+                f.write(("" if first else ",") + json.dumps(doc))
+                first = False
+        f.write('], "videos": [')
+        first = True
+        for kind, doc in synthetic_catalog(videos, per_course):
+            if kind == "video":
+                f.write(("" if first else ",") + json.dumps(doc))
+                first = False
+        f.write("]}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark streaming catalog ingestion")
+    parser.add_argument("--videos", type=int, default=100000)
+    parser.add_argument("--per-course", type=int, default=50)
+    parser.add_argument("--format", choices=["ndjson", "json"], default="ndjson")
+    parser.add_argument("--chunk-size", type=int, default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, f"catalog.{args.format}")
+        write_file(path, args.videos, args.per_course, args.format)
+        print(f"{args.videos} videos, {os.path.getsize(path) / 2**20:.1f} MB {args.format} file", flush=True)
+        stats = asyncio.run(ingest_catalog(path, chunk_size=args.chunk_size))
+
+    print(f"  {stats['videos']} videos / {stats['courses']} courses / {stats['quizzes']} quizzes in {stats['seconds']}s")
+    print(f"  {stats['videos_per_second']} videos/s, peak RSS {stats['peak_rss_mb']} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Overhead of the Prometheus instrumentation itself: the request middleware
+(route-template lookup, in-flight gauge, latency histogram, status
+counter) around the app's router, a named operation timer and the Mongo
+command listener, each per call against the same work uninstrumented.
+
+    python benchmarks/bench_metrics.py --requests 20000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+# Setup path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.main import app
+from app.metrics import MetricsMiddleware, MongoCommandMetrics, route_templates, timed
+
+def http_scope(method: str, path: str) -> dict:
+    return {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method, "path": path,
+            "raw_path": path.encode(), "root_path": "", "scheme": "http", "query_string": b"", "headers": [],
+            "client": ("127.0.0.1", 1234), "server": ("testserver", 80), "app": app}
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+async def send(message):
+    pass
+
+async def per_request(asgi, method: str, path: str, n: int) -> float:
+    for _ in range(min(n, 500)):  # warm-up
+        await asgi(http_scope(method, path), receive, send)
+    started = time.perf_counter()
+    for _ in range(n):
+        await asgi(http_scope(method, path), receive, send)
+    return (time.perf_counter() - started) / n
+
+def per_call(fn, n: int) -> float:
+    started = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - started) / n
+
+async def bench_requests(n: int):
+    # The app's full middleware stack, with and without the metrics middleware
+    instrumented = app.build_middleware_stack()
+    app.user_middleware = [m for m in app.user_middleware if m.cls is not MetricsMiddleware]
+    plain = app.build_middleware_stack()
+    cases = [("GET", "/health/live", "first routes"), ("GET", "/", "last route"),
+             ("GET", "/no/such/path", "404, full scan")]
+    print(f"Request middleware ({len(app.router.routes)} routes, {n} requests each):")
+    for method, path, note in cases:
+        base = await per_request(plain, method, path, n)
+        with_metrics = await per_request(instrumented, method, path, n)
+        lookup = per_call(lambda: route_templates.resolve(http_scope(method, path)), n)
+        print(f"  {method} {path:<14} ({note:<15}) plain {base * 1e6:7.1f}us  instrumented {with_metrics * 1e6:7.1f}us  "
+              f"overhead {(with_metrics - base) * 1e6:6.1f}us ({(with_metrics - base) / base:6.1%}), "
+              f"of which route lookup {lookup * 1e6:5.1f}us", flush=True)
+
+def bench_timer(n: int):
+    def bare():
+        pass
+
+    def timed_call():
+        with timed("benchmark"):
+            pass
+
+    base = per_call(bare, n)
+    print(f"Operation timer: {(per_call(timed_call, n) - base) * 1e6:.2f}us per timed call")
+
+def bench_mongo_listener(n: int):
+    listener = MongoCommandMetrics()
+    started = SimpleNamespace(command_name="find", command={"find": "videos", "filter": {}},
+                              connection_id=("localhost", 27017), request_id=1)
+    succeeded = SimpleNamespace(command_name="find", duration_micros=850,
+                                connection_id=("localhost", 27017), request_id=1)
+
+    def command():
+        listener.started(started)
+        listener.succeeded(succeeded)
+
+    print(f"Mongo command listener: {per_call(command, n) * 1e6:.2f}us per command (started + succeeded)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the overhead of the Prometheus instrumentation")
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--calls", type=int, default=200000)
+    args = parser.parse_args()
+
+    asyncio.run(bench_requests(args.requests))
+    bench_timer(args.calls)
+    bench_mongo_listener(args.calls)
+
+if __name__ == "__main__":
+    main()
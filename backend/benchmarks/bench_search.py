@@ -0,0 +1,122 @@
+"""
+Hybrid search latency on a synthetic catalog: BM25 over Zipf-distributed
+transcripts, embedding similarity over a published embedding store (ANN
+above ANN_MIN_VECTORS) and reciprocal-rank fusion, per uncached query, plus
+the cost of a result-cache hit. Query encoding is not included (hot queries
+are served from the embedding LRU; cold ones wait for one SBERT batch).
+
+    python benchmarks/bench_search.py --videos 100000 --queries 500
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+# Setup path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.cache import TTLCache
+from app.embedding_store import EmbeddingStore
+from app.embeddings import normalize_rows
+from app.scoring import ScoringEngine
+from app.search import KeywordIndex, reciprocal_rank_fusion
+from bench_ann import synthetic_embeddings
+
+TARGET_P95_MS = 50.0
+
+def zipf_words(vocabulary: int, size: int, rng, exponent: float = 1.07) -> np.ndarray:
+    weights = 1.0 / np.arange(1, vocabulary + 1) ** exponent
+    return rng.choice(vocabulary, size, p=weights / weights.sum())
+
+def synthetic_catalog(n: int, vocabulary: int, words: int, rng):
+    lengths = rng.integers(words // 2, words * 3 // 2, n)
+    tokens = zipf_words(vocabulary, int(lengths.sum()) + 8 * n, rng)
+    videos, pos = [], 0
+    for i, length in enumerate(lengths):
+        title = " ".join(f"w{t}" for t in tokens[pos:pos + 4])
+        description = " ".join(f"w{t}" for t in tokens[pos + 4:pos + 8])
+        transcript = " ".join(f"w{t}" for t in tokens[pos + 8:pos + 8 + length])
+        pos += 8 + length
+        videos.append({"id": f"v{i:06d}", "course_id": f"c{i // 20:05d}", "title": title,
+                       "description": description, "transcript": transcript, "topics": [f"w{tokens[pos - 1]}"],
+                       "difficulty": "Easy", "order": i % 20 + 1})
+    return videos
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q) * 1000)
+
+def report(name: str, samples):
+    print(f"  {name:<14} p50 {percentile_ms(samples, 50):7.2f}ms  p95 {percentile_ms(samples, 95):7.2f}ms  "
+          f"p99 {percentile_ms(samples, 99):7.2f}ms", flush=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hybrid keyword + semantic search")
+    parser.add_argument("--videos", type=int, default=100000)
+    parser.add_argument("--vocabulary", type=int, default=50000)
+    parser.add_argument("--words", type=int, default=150, help="mean transcript length in words")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--candidates", type=int, default=100)
+    parser.add_argument("--rrf-k", type=int, default=60)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    videos = synthetic_catalog(args.videos, args.vocabulary, args.words, rng)
+    vectors = synthetic_embeddings(args.videos, args.dim, max(16, args.videos // 500), np.float32, rng)
+
+    with tempfile.TemporaryDirectory() as root:
+        store = EmbeddingStore(root)
+        store.write([v['id'] for v in videos], vectors)
+        store.refresh(force=True)
+
+        started = time.perf_counter()
+        index = KeywordIndex(videos)
+        keyword_build = time.perf_counter() - started
+        started = time.perf_counter()
+        engine = ScoringEngine(videos, store=store)
+        engine_build = time.perf_counter() - started
+        print(f"{args.videos} videos, {len(index.terms)} terms, {len(index.rows)} postings | "
+              f"BM25 build {keyword_build:.2f}s | engine build {engine_build:.2f}s "
+              f"({'IVF ' + str(engine.ann.n_lists) + ' lists' if engine.ann else 'exact'})")
+
+        # 1-3 word queries from the transcript distribution; query vectors near a random video
+        queries = [" ".join(f"w{t}" for t in zipf_words(args.vocabulary, rng.integers(1, 4), rng))
+                   for _ in range(args.queries)]
+        query_vectors = normalize_rows(vectors[rng.choice(args.videos, args.queries)]
+                                       + 0.3 * rng.normal(size=(args.queries, args.dim)).astype(np.float32))
+
+        keyword_times, semantic_times, fusion_times, total_times = [], [], [], []
+        cache = TTLCache(len(queries), ttl=300)
+        for query, vector in zip(queries, query_vectors):
+            started = time.perf_counter()
+            keyword = index.search(query, args.candidates).tolist()
+            after_keyword = time.perf_counter()
+            similar = [row for row, _ in engine.nearest_vector(vector, args.candidates)]
+            after_semantic = time.perf_counter()
+            fused = reciprocal_rank_fusion([keyword, similar], args.rrf_k)
+            finished = time.perf_counter()
+            cache.set(query, fused)
+            keyword_times.append(after_keyword - started)
+            semantic_times.append(after_semantic - after_keyword)
+            fusion_times.append(finished - after_semantic)
+            total_times.append(finished - started)
+
+        hit_times = []
+        for query in queries:
+            started = time.perf_counter()
+            cache.get(query)
+            hit_times.append(time.perf_counter() - started)
+
+    print(f"{args.queries} queries, {args.candidates} candidates per ranking, RRF k={args.rrf_k}")
+    report("keyword", keyword_times)
+    report("semantic", semantic_times)
+    report("fusion", fusion_times)
+    report("uncached total", total_times)
+    report("cache hit", hit_times)
+    p95 = percentile_ms(total_times, 95)
+    print(f"uncached p95 {p95:.2f}ms vs target {TARGET_P95_MS:.0f}ms: {'OK' if p95 < TARGET_P95_MS else 'OVER'}")
+
+if __name__ == "__main__":
+    main()
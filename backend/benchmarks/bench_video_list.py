@@ -0,0 +1,67 @@
+"""
+/videos payload size and serialization latency for one large course: the
+old full representation (response_model=List[Video] validation + JSON) vs.
+the slim default and a sparse fieldset serialized with orjson.
+
+    python benchmarks/bench_video_list.py --videos 1000 --transcript-words 1500
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import List
+
+# Setup path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+import orjson
+
+from app.schemas import Video
+from app.routers.courses import VIDEO_SUMMARY_FIELDS, project, select_fields, VIDEO_FIELDS
+
+def timed(fn, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = fn()
+        best = min(best, time.perf_counter() - started)
+    return body, best
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark slim /videos list serialization")
+    parser.add_argument("--videos", type=int, default=1000)
+    parser.add_argument("--transcript-words", type=int, default=1500)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    videos = [{
+        "id": f"video-{i}", "course_id": "course-1", "title": f"Lecture {i}",
+        "description": f"Lecture {i} covers the worked examples of week {i // 10}",
+        "url": f"https://storage.example.com/videos/course-1/video-{i}.mp4?X-Goog-Signature=" + "a" * 512,
+        "duration": 600 + i, "difficulty": "Medium", "topics": ["algebra", "functions"],
+        "transcript": " ".join(["word"] * args.transcript_words), "order": i,
+    } for i in range(args.videos)]
+    adapter = TypeAdapter(List[Video])
+
+    def full():
+        # What FastAPI did for response_model=List[Video]
+        return json.dumps(jsonable_encoder(adapter.validate_python(videos))).encode("utf-8")
+
+    def slim():
+        return orjson.dumps(project(videos, VIDEO_SUMMARY_FIELDS))
+
+    list_page_fields = select_fields("title,order,difficulty,description,duration,topics", VIDEO_FIELDS, VIDEO_SUMMARY_FIELDS)
+
+    def list_page():
+        return orjson.dumps(project(videos, list_page_fields))
+
+    print(f"{args.videos} videos, {args.transcript_words}-word transcripts")
+    for name, fn in (("full Video + pydantic", full), ("slim default + orjson", slim), ("list page fields", list_page)):
+        body, seconds = timed(fn, args.repeat)
+        print(f"  {name:24} {len(body) / 1024:10.1f} KB {seconds * 1000:9.2f} ms")
+
+if __name__ == "__main__":
+    main()
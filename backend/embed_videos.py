@@ -0,0 +1,38 @@
+import argparse
+import asyncio
+import os
+import sys
+
+# Setup path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.config import settings
+from app.database import load_sbert_model
+from app.embeddings import embed_videos, export_embedding_store
+from app.catalog import bump_catalog_version
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute and store SBERT embeddings for all videos")
+    parser.add_argument("--batch-size", type=int, default=settings.EMBEDDING_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=settings.EMBEDDING_WORKERS)
+    parser.add_argument("--force", action="store_true", help="Re-encode videos even if their content is unchanged")
+    parser.add_argument("--no-store", action="store_true", help="Skip publishing the shared memory-mapped store")
+    args = parser.parse_args()
+
+    print(f"Embedding videos (batch size {args.batch_size}, {args.workers} workers)...", flush=True)
+    load_sbert_model()
+
+    async def run():
+        stats = await embed_videos(force=args.force, batch_size=args.batch_size, workers=args.workers)
+        if not args.no_store:
+            await export_embedding_store()
+        if stats["encoded"] or stats["repacked"]:
+            # Running workers rebuild their scoring engines with the new vectors
+            await bump_catalog_version()
+        return stats
+
+    stats = asyncio.run(run())
+    print(f"Done: {stats}", flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+import argparse
+import asyncio
+import os
+import sys
+
+# Setup path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.config import settings
+from app.ingest import ingest_catalog
+from app.database import load_sbert_model
+from app.embeddings import embed_videos, export_embedding_store
+from app.catalog import bump_catalog_version
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream a catalog file (NDJSON or JSON) into MongoDB and swap it in atomically")
+    parser.add_argument("path", help="NDJSON (.ndjson/.jsonl, one course or video per line) or JSON ({courses, videos}) file")
+    parser.add_argument("--chunk-size", type=int, default=settings.INGEST_CHUNK_SIZE)
+    parser.add_argument("--embed", action="store_true", help="Encode new or changed videos after the swap")
+    args = parser.parse_args()
+
+    if args.embed:
+        load_sbert_model()
+
+    async def run():
+        stats = await ingest_catalog(args.path, chunk_size=args.chunk_size)
+        if args.embed:
+            embedding_stats = await embed_videos()
+            await export_embedding_store()
+            if embedding_stats["encoded"] or embedding_stats["repacked"]:
+                await bump_catalog_version()
+        return stats
+
+    stats = asyncio.run(run())
+    print(f"Done: {stats['videos']} videos, {stats['courses']} courses, {stats['quizzes']} quizzes "
+          f"in {stats['seconds']}s ({stats['videos_per_second']} videos/s, peak RSS {stats['peak_rss_mb']} MB)", flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# Setup path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.user_stats import rebuild_user_stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the materialized user_stats documents from history")
+    parser.add_argument("--user-id", help="Rebuild a single user instead of everyone")
+    args = parser.parse_args()
+
+    print("Rebuilding user stats...", flush=True)
+    started = time.perf_counter()
+    written = asyncio.run(rebuild_user_stats(args.user_id))
+    print(f"Wrote {written} user_stats documents in {time.perf_counter() - started:.1f}s", flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import random
+
+import numpy as np
+import pytest
+
+from app.batch_recommender import catalog_embeddings, score_users
+from app.recommendation_cache import REVIEW_REASON, rank_videos
+from app.scoring import ScoringEngine
+
+TOPICS = ["algebra", "geometry", "calculus", "statistics", "logic", "probability"]
+LEVELS = ["Easy", "Medium", "Hard"]
+TOP_N = 5
+DIM = 16
+
+def legacy_recommendations(videos, mastery_dict, watched_videos, initial_level, top_n, use_similarity):
+    """The per-video loop the scoring engine replaced, ranking every candidate instead of only the best"""
+    last_watched_video = None
+    if watched_videos:
+        sorted_progress = sorted(watched_videos.values(), key=lambda x: x.get('timestamp', ''), reverse=True)
+        last_watched_video = next((v for v in videos if v['id'] == sorted_progress[0]['video_id']), None)
+
+    candidate_videos = []
+    for video in videos:
+        video_id = video['id']
+        if video_id in watched_videos and watched_videos[video_id].get('completed', False):
+            continue
+        if video_id in watched_videos and not watched_videos[video_id].get('completed', False):
+            candidate_videos.append({
+                'video': video,
+                'score': 1000,
+                'reason': f"Continue watching '{video['title']}' ({watched_videos[video_id]['watch_percentage']:.0f}% completed)"
+            })
+            continue
+
+        score = 0
+        reasons = []
+
+        video_topics = video.get('topics', [])
+        if video_topics and mastery_dict:
+            topic_scores = [mastery_dict.get(topic, 0) for topic in video_topics]
+            avg_mastery = sum(topic_scores) / len(topic_scores) if topic_scores else 0
+            if 40 <= avg_mastery <= 70:
+                score += 40
+                reasons.append(f"Optimal challenge level for {video_topics[0]}")
+            elif avg_mastery < 40:
+                score += 30
+                reasons.append(f"Build foundation in {video_topics[0]}")
+            else:
+                score += 20
+        else:
+            if video['difficulty'] == initial_level:
+                score += 35
+                reasons.append(f"Matches your {initial_level} level")
+
+        difficulty_map = {'Easy': 1, 'Medium': 2, 'Hard': 3}
+        user_level = difficulty_map.get(initial_level, 2)
+        video_level = difficulty_map.get(video['difficulty'], 2)
+        if video_level == user_level:
+            score += 20
+        elif video_level == user_level + 1:
+            score += 15
+            reasons.append("Next difficulty level")
+        elif video_level == user_level - 1:
+            score += 10
+
+        if last_watched_video and use_similarity:
+            video_embedding = np.array(video['embedding'])
+            last_embedding = np.array(last_watched_video['embedding'])
+            similarity = np.dot(video_embedding, last_embedding) / (
+                np.linalg.norm(video_embedding) * np.linalg.norm(last_embedding)
+            )
+            score += float(similarity) * 30
+            if similarity > 0.7:
+                reasons.append(f"Related to '{last_watched_video['title']}'")
+
+        if video.get('order', 0) < 10:
+            score += 10 - video.get('order', 0)
+
+        if last_watched_video and video['course_id'] == last_watched_video['course_id']:
+            score += 100
+            reasons.append(f"Continue in '{last_watched_video.get('course_id', 'this course')}'")
+
+        candidate_videos.append({
+            'video': video,
+            'score': score,
+            'reason': reasons[0] if reasons else f"Learn {video['title']}"
+        })
+
+    if not candidate_videos:
+        return [{"video_id": videos[0]['id'], "reason": REVIEW_REASON}]
+    candidate_videos.sort(key=lambda x: x['score'], reverse=True)
+    return [{"video_id": c['video']['id'], "reason": c['reason']} for c in candidate_videos[:top_n]]
+
+def random_catalog(rng: random.Random, n_videos: int):
+    """Videos sorted by order (as the catalog serves them), with embeddings clustered by first topic"""
+    centers = {topic: np.array([rng.gauss(0, 1) for _ in range(DIM)]) for topic in TOPICS}
+    videos = []
+    for i in range(n_videos):
+        topics = rng.sample(TOPICS, rng.randint(0, 3))
+        center = centers[topics[0]] if topics else np.zeros(DIM)
+        embedding = center + np.array([rng.gauss(0, 0.4) for _ in range(DIM)])
+        videos.append({
+            "id": f"v{i}",
+            "title": f"Video {i}",
+            "course_id": f"c{rng.randint(0, 3)}",
+            # Small order range so many videos tie on score
+            "order": rng.randint(0, 12),
+            "difficulty": rng.choice(LEVELS),
+            "topics": topics,
+            "embedding": embedding.tolist(),
+        })
+    videos.sort(key=lambda v: v['order'])
+    return videos
+
+def random_user(rng: random.Random, videos):
+    """(initial_level, mastery, progress by video id), sometimes without mastery or progress"""
+    initial_level = rng.choice(LEVELS)
+    mastery = {}
+    if rng.random() < 0.8:
+        # Scores on band edges (40, 70) as well as inside them
+        mastery = {topic: rng.choice([0, 25, 40, 55, 70, 85, 100]) for topic in rng.sample(TOPICS, rng.randint(1, 4))}
+    progress = {}
+    if rng.random() < 0.8:
+        for stamp, video in enumerate(rng.sample(videos, rng.randint(1, len(videos) // 2))):
+            completed = rng.random() < 0.7
+            progress[video['id']] = {
+                "video_id": video['id'],
+                "completed": completed,
+                "watch_percentage": 100.0 if completed else rng.uniform(1, 95),
+                "timestamp": f"2026-01-01T00:{stamp:02d}:00",
+            }
+    return initial_level, mastery, progress
+
+@pytest.mark.parametrize("seed", range(40))
+@pytest.mark.parametrize("use_similarity", [True, False])
+def test_engine_matches_legacy_loop(seed, use_similarity):
+    rng = random.Random(seed)
+    videos = random_catalog(rng, rng.randint(3, 40))
+    engine = ScoringEngine(videos, ann=False)
+    for _ in range(5):
+        initial_level, mastery, progress = random_user(rng, videos)
+        expected = legacy_recommendations(videos, mastery, progress, initial_level, TOP_N, use_similarity)
+        assert rank_videos(engine, mastery, initial_level, progress, TOP_N, use_similarity) == expected
+
+def test_engine_matches_legacy_loop_when_everything_is_completed():
+    rng = random.Random(0)
+    videos = random_catalog(rng, 6)
+    progress = {v['id']: {"video_id": v['id'], "completed": True, "watch_percentage": 100.0,
+                          "timestamp": f"2026-01-01T00:{i:02d}:00"} for i, v in enumerate(videos)}
+    engine = ScoringEngine(videos, ann=False)
+    expected = legacy_recommendations(videos, {}, progress, "Easy", TOP_N, True)
+    assert rank_videos(engine, {}, "Easy", progress, TOP_N) == expected == [
+        {"video_id": videos[0]['id'], "reason": REVIEW_REASON}
+    ]
+
+@pytest.mark.parametrize("seed", range(40))
+def test_batch_scorer_matches_online_engine(seed):
+    rng = random.Random(seed)
+    videos = random_catalog(rng, rng.randint(3, 40))
+    engine = ScoringEngine(videos, ann=False)
+    users = [(f"u{u}", *random_user(rng, videos)) for u in range(8)]
+    docs = score_users(engine, catalog_embeddings(engine), users, catalog_version=1, top_n=TOP_N)
+    assert [doc['user_id'] for doc in docs] == [user[0] for user in users]
+    for doc, (_, initial_level, mastery, progress) in zip(docs, users):
+        assert doc['items'] == rank_videos(engine, mastery, initial_level, progress, TOP_N)
@@ -0,0 +1,159 @@
+import asyncio
+import hashlib
+import threading
+import time
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from firebase_admin import auth as firebase_auth
+
+from app.config import settings
+from app.token_verifier import ID_TOKEN_ISSUER_PREFIX, StaticKeySet, TokenVerifier
+
+PROJECT_ID = "test-project"
+KID = "key-1"
+PRIVATE_KEY = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+OTHER_KEY = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+@pytest.fixture(autouse=True)
+def no_emulator(monkeypatch):
+    monkeypatch.setattr(settings, "FIREBASE_AUTH_EMULATOR_HOST", None)
+
+def sign(kid: str = KID, key=PRIVATE_KEY, lifetime: float = 3600, **claims) -> str:
+    now = int(time.time())
+    payload = {
+        "iss": ID_TOKEN_ISSUER_PREFIX + PROJECT_ID,
+        "aud": PROJECT_ID,
+        "sub": "user-1",
+        "iat": now,
+        "exp": now + lifetime,
+        **claims,
+    }
+    return jwt.encode(payload, key, algorithm="RS256", headers={"kid": kid})
+
+class CountingKeySet(StaticKeySet):
+    """Key set recording fetches; `rotated` keys appear on the first fetch"""
+
+    def __init__(self, keys, rotated=None, delay: float = 0.0):
+        super().__init__(keys)
+        self.rotated = rotated or {}
+        self.delay = delay
+        self.fetches = 0
+
+    def fetch(self):
+        self.fetches += 1
+        time.sleep(self.delay)
+        self.keys.update(self.rotated)
+
+def make_verifier(key_set=None, **kwargs) -> TokenVerifier:
+    key_set = key_set or StaticKeySet({KID: PRIVATE_KEY.public_key()})
+    return TokenVerifier(key_set, project_id=PROJECT_ID, **kwargs)
+
+def counting_verify_sync(verifier: TokenVerifier) -> list:
+    calls = []
+    verify_sync = verifier._verify_sync
+
+    def counted(token):
+        calls.append(token)
+        return verify_sync(token)
+
+    verifier._verify_sync = counted
+    return calls
+
+def test_verifies_signed_token():
+    claims = asyncio.run(make_verifier().verify(sign()))
+    assert claims["uid"] == "user-1"
+    assert claims["aud"] == PROJECT_ID
+
+def test_cache_hit_skips_verification():
+    verifier = make_verifier()
+    calls = counting_verify_sync(verifier)
+    token = sign()
+
+    async def verify_twice():
+        return await verifier.verify(token), await verifier.verify(token)
+
+    first, second = asyncio.run(verify_twice())
+    assert second is first
+    assert len(calls) == 1
+    assert verifier.cache.snapshot()["hits"] == 1
+
+def test_cache_entry_expires_at_exp(monkeypatch):
+    verifier = make_verifier()
+    calls = counting_verify_sync(verifier)
+    token = sign(lifetime=60)
+    claims = asyncio.run(verifier.verify(token))
+
+    real_time = time.time
+    monkeypatch.setattr(time, "time", lambda: claims["exp"] + 0.001)
+    assert verifier.cache.get(hashlib.sha256(token.encode()).hexdigest()) is None
+    monkeypatch.setattr(time, "time", real_time)
+
+    # Past its exp the token is no longer served from the cache
+    asyncio.run(verifier.verify(token))
+    assert len(calls) == 2
+
+def test_expired_token_rejected():
+    verifier = make_verifier()
+    with pytest.raises(firebase_auth.ExpiredIdTokenError):
+        asyncio.run(verifier.verify(sign(iat=int(time.time()) - 7200, lifetime=-3600)))
+    assert len(verifier.cache) == 0
+
+@pytest.mark.parametrize("claims", [
+    {"aud": "other-project"},
+    {"iss": ID_TOKEN_ISSUER_PREFIX + "other-project"},
+    {"sub": ""},
+])
+def test_wrong_claims_rejected(claims):
+    verifier = make_verifier()
+    with pytest.raises(firebase_auth.InvalidIdTokenError):
+        asyncio.run(verifier.verify(sign(**claims)))
+    assert len(verifier.cache) == 0
+
+def test_wrong_signature_rejected():
+    with pytest.raises(firebase_auth.InvalidIdTokenError):
+        asyncio.run(make_verifier().verify(sign(key=OTHER_KEY)))
+
+def test_unknown_kid_rejected():
+    key_set = CountingKeySet({KID: PRIVATE_KEY.public_key()})
+    with pytest.raises(firebase_auth.InvalidIdTokenError, match="unknown"):
+        asyncio.run(make_verifier(key_set).verify(sign(kid="forged")))
+    assert key_set.fetches == 1
+
+def test_unknown_kid_found_after_rotation():
+    key_set = CountingKeySet({}, rotated={KID: PRIVATE_KEY.public_key()})
+    claims = asyncio.run(make_verifier(key_set).verify(sign()))
+    assert claims["uid"] == "user-1"
+    assert key_set.fetches == 1
+
+def test_unknown_kid_refetch_throttled():
+    key_set = CountingKeySet({KID: PRIVATE_KEY.public_key()})
+    verifier = make_verifier(key_set, refetch_interval=60)
+    for i in range(5):
+        with pytest.raises(firebase_auth.InvalidIdTokenError):
+            verifier._verify_sync(sign(kid=f"forged-{i}"))
+    assert key_set.fetches == 1
+
+    # Past the interval, an unknown kid may refetch again
+    verifier._last_fetch -= 60
+    with pytest.raises(firebase_auth.InvalidIdTokenError):
+        verifier._verify_sync(sign(kid="forged"))
+    assert key_set.fetches == 2
+
+def test_concurrent_unknown_kids_share_one_fetch():
+    key_set = CountingKeySet({}, rotated={KID: PRIVATE_KEY.public_key()}, delay=0.2)
+    verifier = make_verifier(key_set)
+    token = sign()
+    results = []
+
+    def verify():
+        results.append(verifier._verify_sync(token)["uid"])
+
+    threads = [threading.Thread(target=verify) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["user-1"] * 8
+    assert key_set.fetches == 1
@@ -1,6 +1,7 @@
 import React, { useEffect, useState } from 'react';
 import { useAuth } from '@/context/AuthContext';
 import axios from 'axios';
+import { fetchAllPages } from '@/services/api';
 import { Navbar } from '@/components/Navbar';
 import { Card, CardContent, CardHeader, CardTitle, CardDescription } from '@/components/ui/card';
 import { Progress } from '@/components/ui/progress';
@@ -39,11 +40,11 @@ const AnalyticsPage = () => {
 
   const fetchAnalytics = async () => {
     try {
-      const [masteryRes, progressRes] = await Promise.all([
-        axios.get(`${API}/analytics/mastery`, getAxiosConfig()),
+      const [mastery, progressRes] = await Promise.all([
+        fetchAllPages(axios, `${API}/analytics/mastery`, getAxiosConfig()),
         axios.get(`${API}/analytics/progress`, getAxiosConfig())
       ]);
-      setMasteryScores(masteryRes.data);
+      setMasteryScores(mastery);
       setProgress(progressRes.data);
     } catch (error) {
       console.error('Failed to fetch analytics:', error);
@@ -6,15 +6,19 @@ import { Navbar } from '@/components/Navbar';
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card';
 import { Button } from '@/components/ui/button';
 import { Badge } from '@/components/ui/badge';
-import { Play, Clock, ArrowLeft } from 'lucide-react';
+import { Play, Clock, ArrowLeft, CheckCircle2 } from 'lucide-react';
 import { motion } from 'framer-motion';
 import { toast } from 'sonner';
 
+// Only what the video cards render (the API returns a slim list by default)
+const VIDEO_LIST_FIELDS = ['title', 'order', 'difficulty', 'description', 'duration', 'topics'];
+
 const CourseDetailPage = () => {
   const { courseId } = useParams();
   const navigate = useNavigate();
   const [course, setCourse] = useState(null);
   const [videos, setVideos] = useState([]);
+  const [courseProgress, setCourseProgress] = useState(null);
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
@@ -23,12 +27,15 @@ const CourseDetailPage = () => {
 
   const fetchCourseData = async () => {
     try {
-      const [courseData, videosData] = await Promise.all([
+      // Progress for every video in one request instead of one per video
+      const [courseData, videosData, progressData] = await Promise.all([
         courseService.getCourseById(courseId),
-        courseService.getVideos(courseId)
+        courseService.getVideos(courseId, VIDEO_LIST_FIELDS),
+        courseService.getCourseProgress(courseId)
       ]);
       setCourse(courseData);
       setVideos(videosData);
+      setCourseProgress(progressData);
     } catch (error) {
       console.error('Failed to fetch course data:', error);
       toast.error('Failed to load course');
@@ -116,6 +123,11 @@ const CourseDetailPage = () => {
                   <span className="text-sm text-muted-foreground">
                     {course.video_count} videos
                   </span>
+                  {courseProgress && (
+                    <span className="text-sm text-muted-foreground" data-testid="course-progress">
+                      · {courseProgress.completed}/{courseProgress.total} completed
+                    </span>
+                  )}
                 </div>
                 <h1 className="text-3xl font-heading font-bold tracking-tight-more mb-3">
                   {course.title}
@@ -169,6 +181,16 @@ const CourseDetailPage = () => {
                           <Badge variant="outline" className="text-xs">
                             {video.difficulty}
                           </Badge>
+                          {courseProgress?.progress[video.id]?.completed ? (
+                            <Badge className="text-xs gap-1 bg-green-500/10 text-green-700">
+                              <CheckCircle2 className="h-3 w-3" />
+                              Completed
+                            </Badge>
+                          ) : courseProgress?.progress[video.id]?.watch_percentage > 0 ? (
+                            <span className="text-xs text-muted-foreground">
+                              {Math.round(courseProgress.progress[video.id].watch_percentage)}% watched
+                            </span>
+                          ) : null}
                         </div>
                         <h3 className="text-lg font-heading font-semibold mb-2 group-hover:text-primary transition-colors">
                           {video.title}
@@ -2,11 +2,13 @@ import React, { useEffect, useState } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { useAuth } from '@/context/AuthContext';
 import axios from 'axios';
+import { fetchAllPages } from '@/services/api';
 import { Navbar } from '@/components/Navbar';
 import { Card, CardContent, CardHeader, CardTitle, CardDescription } from '@/components/ui/card';
 import { Button } from '@/components/ui/button';
 import { Badge } from '@/components/ui/badge';
-import { BookOpen, Clock } from 'lucide-react';
+import { Input } from '@/components/ui/input';
+import { BookOpen, Clock, PlayCircle, Search, X } from 'lucide-react';
 import { motion } from 'framer-motion';
 import { toast } from 'sonner';
 
@@ -18,6 +20,9 @@ const CoursesPage = () => {
   const navigate = useNavigate();
   const [courses, setCourses] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [query, setQuery] = useState('');
+  const [searchResults, setSearchResults] = useState(null);
+  const [searching, setSearching] = useState(false);
 
   useEffect(() => {
     fetchCourses();
@@ -25,8 +30,7 @@ const CoursesPage = () => {
 
   const fetchCourses = async () => {
     try {
-      const response = await axios.get(`${API}/courses`, getAxiosConfig());
-      setCourses(response.data);
+      setCourses(await fetchAllPages(axios, `${API}/courses`, getAxiosConfig()));
     } catch (error) {
       console.error('Failed to fetch courses:', error);
       toast.error('Failed to load courses');
@@ -35,6 +39,31 @@ const CoursesPage = () => {
     }
   };
 
+  const handleSearch = async (e) => {
+    e.preventDefault();
+    if (!query.trim()) {
+      setSearchResults(null);
+      return;
+    }
+    setSearching(true);
+    try {
+      const response = await axios.get(`${API}/search`, { ...getAxiosConfig(), params: { q: query.trim() } });
+      setSearchResults(response.data.items);
+    } catch (error) {
+      console.error('Search failed:', error);
+      toast.error('Search failed');
+    } finally {
+      setSearching(false);
+    }
+  };
+
+  const clearSearch = () => {
+    setQuery('');
+    setSearchResults(null);
+  };
+
+  const formatDuration = (seconds) => `${Math.floor(seconds / 60)}:${String(seconds % 60).padStart(2, '0')}`;
+
   const getDifficultyColor = (difficulty) => {
     const colors = {
       Easy: 'bg-green-500/10 text-green-700 dark:text-green-400',
@@ -81,6 +110,51 @@ const CoursesPage = () => {
           </p>
         </motion.div>
 
+        {/* Video Search */}
+        <form onSubmit={handleSearch} className="flex gap-2 mb-8 max-w-xl" data-testid="video-search-form">
+          <div className="relative flex-1">
+            <Search className="absolute left-3 top-1/2 -translate-y-1/2 h-4 w-4 text-muted-foreground" />
+            <Input
+              value={query}
+              onChange={(e) => setQuery(e.target.value)}
+              placeholder="Search videos and transcripts"
+              className="pl-9"
+              data-testid="video-search-input"
+            />
+          </div>
+          <Button type="submit" disabled={searching} data-testid="video-search-button">
+            {searching ? 'Searching...' : 'Search'}
+          </Button>
+          {searchResults && (
+            <Button type="button" variant="ghost" size="icon" onClick={clearSearch} aria-label="Clear search">
+              <X className="h-4 w-4" />
+            </Button>
+          )}
+        </form>
+
+        {searchResults && (
+          <div className="mb-12 space-y-2" data-testid="video-search-results">
+            {searchResults.map(({ video }) => (
+              <div
+                key={video.id}
+                className="flex items-center gap-3 p-3 rounded-lg border hover:bg-muted cursor-pointer transition-colors"
+                onClick={() => navigate(`/video/${video.id}`)}
+                data-testid={`search-result-${video.id}`}
+              >
+                <PlayCircle className="h-5 w-5 text-primary shrink-0" />
+                <span className="flex-1 font-medium line-clamp-1">{video.title}</span>
+                <div className="flex items-center gap-1 text-xs text-muted-foreground">
+                  <Clock className="h-3 w-3" />
+                  <span>{formatDuration(video.duration)}</span>
+                </div>
+              </div>
+            ))}
+            {searchResults.length === 0 && (
+              <p className="text-muted-foreground">No videos match your search</p>
+            )}
+          </div>
+        )}
+
         {/* Courses Grid */}
         <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-6">
           {courses.map((course, index) => (
@@ -1,4 +1,4 @@
-import api from './api';
+import api, { fetchAllPages } from './api';
 
 export const analyticsService = {
   getDashboardData: async () => {
@@ -12,8 +12,7 @@ export const analyticsService = {
       };
   },
   getMasteryScores: async () => {
-      const response = await api.get('/analytics/mastery');
-      return response.data;
+      return fetchAllPages(api, '/analytics/mastery');
   },
   getNextRecommendation: async () => {
     const response = await api.get('/recommendations/next-video');
@@ -16,4 +16,17 @@ export const setAuthToken = (token) => {
   }
 };
 
+// List endpoints return { items, limit, next_cursor }; follow the cursor to collect every item
+export const fetchAllPages = async (client, url, config = {}) => {
+  const items = [];
+  let cursor = null;
+  do {
+    const params = { ...(config.params || {}), ...(cursor ? { cursor } : {}) };
+    const response = await client.get(url, { ...config, params });
+    items.push(...response.data.items);
+    cursor = response.data.next_cursor;
+  } while (cursor);
+  return items;
+};
+
 export default api;
@@ -1,23 +1,32 @@
-import api from './api';
+import api, { fetchAllPages } from './api';
 
 export const courseService = {
   getAllCourses: async () => {
-    const response = await api.get('/courses');
-    return response.data;
+    return fetchAllPages(api, '/courses');
   },
   getCourseById: async (id) => {
     const response = await api.get(`/courses/${id}`);
     return response.data;
   },
-  getVideos: async (courseId) => {
+  // List items are slim by default; pass extra fields, e.g. ['description', 'topics']
+  getVideos: async (courseId, fields) => {
       const params = courseId ? { course_id: courseId } : {};
-      const response = await api.get('/videos', { params });
-      return response.data;
+      if (fields && fields.length) params.fields = fields.join(',');
+      return fetchAllPages(api, '/videos', { params });
   },
   getVideoById: async (id) => {
       const response = await api.get(`/videos/${id}`);
       return response.data;
   },
+  // { course_id, completed, total, progress: { [videoId]: { watch_percentage, completed } } }
+  getCourseProgress: async (courseId) => {
+      const response = await api.get(`/courses/${courseId}/progress`);
+      return response.data;
+  },
+  getVideosProgress: async (videoIds) => {
+      const response = await api.post('/videos/progress:batch', { video_ids: videoIds });
+      return response.data.progress;
+  },
   getVideoProgress: async (id) => {
       const response = await api.get(`/videos/${id}/progress`);
       return response.data;